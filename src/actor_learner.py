@@ -0,0 +1,304 @@
+"""Ape-X style actor/learner training on a single machine.
+
+Actor processes each step their own headless environments with a local copy
+of the policy and an exploration rate of their own, and ship experience to
+the learner in chunks over a multiprocessing queue. Actors keep the frame
+stacks themselves, so a chunk only holds the newest frame of every
+observation. The learner, in the launching process, stores each actor's
+experience in its own :class:`~src.replay.FrameReplayBuffer`, runs the
+gradient updates and periodically publishes its weights to a shared-memory
+copy of the network that the actors reload from.
+
+Launch with ``python src/main.py agent_training --num-actors 4``.
+"""
+
+from dataclasses import dataclass
+import os
+import queue
+import time
+from typing import Any
+
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+import torch
+import torch.multiprocessing as mp
+
+from src.flappy_env import FlappyBirdEnv
+from src.model import DQN
+from src.observation import FrameStack, materialize_batch, preprocess
+from src.replay import FrameReplayBuffer
+from src.train import TrainConfig, TrainStats, make_network, td_update
+
+
+@dataclass
+class ActorLearnerConfig(TrainConfig):
+    """Hyperparameters of actor/learner training.
+
+    ``num_envs`` is the number of environments of each actor.
+    """
+
+    num_actors: int = 4
+    num_envs: int = 1
+    chunk_size: int = 32
+    queue_size: int = 16
+    epsilon: float = 0.4
+    epsilon_alpha: float = 7.0
+    weight_sync_interval: int = 50
+
+
+def actor_epsilon(config: ActorLearnerConfig, actor: int) -> float:
+    """Returns the fixed exploration rate of an actor, as in Ape-X."""
+    if config.num_actors == 1:
+        return config.epsilon
+    exponent = 1 + config.epsilon_alpha * actor / (config.num_actors - 1)
+    return config.epsilon**exponent
+
+
+def run_actor(
+    actor: int,
+    config: ActorLearnerConfig,
+    shared_net: DQN,
+    version: Any,
+    lock: Any,
+    chunks: mp.Queue,
+    stop: Any,
+) -> None:
+    """Collects experience with the latest published weights until stopped.
+
+    Args:
+        actor: Index of the actor.
+        config: Hyperparameters.
+        shared_net: Shared-memory network the learner publishes to.
+        version: Shared counter bumped on every publish.
+        lock: Lock held while the shared weights are written or read.
+        chunks: Queue the experience chunks are put on.
+        stop: Event set by the learner to stop the actors.
+    """
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(None if config.seed is None else config.seed + actor)
+    epsilon = actor_epsilon(config, actor)
+    envs = [FlappyBirdEnv(render_mode=None) for _ in range(config.num_envs)]
+    net = make_network(config, envs[0])
+    seen = -1
+
+    _, height, width = net.input_shape
+    stack = FrameStack(config.num_envs, config.n_stack, (height, width))
+    rgb = np.empty((config.num_envs, *envs[0].observation_space.shape), np.uint8)
+    first = [env.reset(seed=int(rng.integers(2**31)))[0] for env in envs]
+    stack.push(preprocess(materialize_batch(first, rgb), config.scale))
+
+    shape = (config.chunk_size, config.num_envs)
+    chunk = {
+        "frames": np.empty((*shape, height, width), np.uint8),
+        "next_frames": np.empty((*shape, height, width), np.uint8),
+        "actions": np.empty(shape, np.int64),
+        "rewards": np.empty(shape, np.float32),
+        "dones": np.empty(shape, bool),
+    }
+    row, scores = 0, []
+
+    while not stop.is_set():
+        if version.value != seen:
+            with lock:
+                net.load_state_dict(shared_net.state_dict())
+                seen = version.value
+        obs = stack.frames
+        with torch.no_grad():
+            q_values = net(torch.from_numpy(obs).float().div_(255))
+        actions = q_values.argmax(dim=1).numpy()
+        explore = rng.random(len(actions)) < epsilon
+        actions[explore] = rng.integers(0, 2, explore.sum())
+
+        chunk["frames"][row] = obs[:, -1]
+        results = [env.step(a) for env, a in zip(envs, actions, strict=True)]
+        frames = preprocess(
+            materialize_batch([r[0] for r in results], rgb), config.scale
+        )
+        stack.push(frames)
+        chunk["next_frames"][row] = frames
+        chunk["actions"][row] = actions
+        chunk["rewards"][row] = [r[1] for r in results]
+        chunk["dones"][row] = dones = [r[2] for r in results]
+        for i in np.flatnonzero(dones):
+            scores.append(results[i][4]["score"])
+            reset_obs, _ = envs[i].reset(seed=int(rng.integers(2**31)))
+            stack.reset(i, preprocess(reset_obs.materialize()[None], config.scale)[0])
+
+        row += 1
+        if row == config.chunk_size:
+            item = (actor, {k: v.copy() for k, v in chunk.items()}, scores)
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            row, scores = 0, []
+
+    # unsent chunks are dropped rather than blocking the exit
+    chunks.cancel_join_thread()
+    for env in envs:
+        env.close()
+
+
+class ActorLearner:
+    """Learner driving a pool of local actor processes.
+
+    Attributes:
+        config: Hyperparameters.
+        net: Online network.
+        target: Target network.
+        shared_net: Shared-memory copy of the online network for the actors.
+        buffers: One replay buffer per actor.
+        stats: Progress counters.
+    """
+
+    def __init__(self, config: ActorLearnerConfig) -> None:
+        """Initialize the networks and replay buffers."""
+        self.config = config
+        torch.set_num_threads(
+            config.torch_threads or max(1, (os.cpu_count() or 1) - config.num_actors)
+        )
+        env = FlappyBirdEnv(render_mode=None)
+        self.net = make_network(config, env)
+        self.target = make_network(config, env)
+        self.shared_net = make_network(config, env)
+        env.close()
+        self.target.load_state_dict(self.net.state_dict())
+        self.shared_net.load_state_dict(self.net.state_dict())
+        self.shared_net.share_memory()
+        self.optimizer = torch.optim.Adam(
+            self.net.parameters(), lr=config.learning_rate
+        )
+
+        observation_space = spaces.Box(0, 255, self.net.input_shape, np.uint8)
+        self.buffers = [
+            FrameReplayBuffer(
+                config.buffer_size // config.num_actors,
+                observation_space,
+                spaces.Discrete(self.net.num_actions),
+                device="cpu",
+                n_envs=config.num_envs,
+                n_stack=config.n_stack,
+            )
+            for _ in range(config.num_actors)
+        ]
+        self._frame_shape = self.buffers[0].frame_shape
+        self._infos = [{} for _ in range(config.num_envs)]
+        self._rng = np.random.default_rng(config.seed)
+        self.stats = TrainStats()
+
+    def train(self) -> TrainStats:
+        """Runs the actors and the learner until ``total_steps`` transitions.
+
+        Returns:
+            The final progress counters.
+        """
+        config, stats = self.config, self.stats
+        ctx = mp.get_context("spawn")
+        version = ctx.Value("q", 0)
+        lock = ctx.Lock()
+        stop = ctx.Event()
+        chunks = ctx.Queue(maxsize=config.queue_size)
+        actors = [
+            ctx.Process(
+                target=run_actor,
+                args=(i, config, self.shared_net, version, lock, chunks, stop),
+                daemon=True,
+            )
+            for i in range(config.num_actors)
+        ]
+        for process in actors:
+            process.start()
+
+        start = time.perf_counter()
+        next_log = start + config.log_interval
+        try:
+            while stats.steps < config.total_steps:
+                can_update = (
+                    stats.steps >= config.learning_starts
+                    and stats.updates * config.train_freq < stats.steps
+                )
+                self._receive(chunks, block=not can_update)
+                if can_update:
+                    self._update(version, lock)
+                if not any(process.is_alive() for process in actors):
+                    raise RuntimeError("all actor processes exited")
+                if (now := time.perf_counter()) >= next_log:
+                    stats.elapsed = now - start
+                    next_log = now + config.log_interval
+                    print(
+                        f"steps {stats.steps} | {stats.steps_per_s:.0f} steps/s | "
+                        f"{stats.updates_per_s:.1f} updates/s | "
+                        f"mean score {stats.mean_score:.1f}"
+                    )
+        finally:
+            stop.set()
+            for process in actors:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            stats.elapsed = time.perf_counter() - start
+        return stats
+
+    def _receive(self, chunks: mp.Queue, block: bool) -> None:
+        """Moves queued experience chunks into the replay buffers."""
+        try:
+            item = chunks.get(timeout=1.0) if block else chunks.get_nowait()
+        except queue.Empty:
+            return
+        while item is not None:
+            actor, chunk, scores = item
+            buffer = self.buffers[actor]
+            n_envs = self.config.num_envs
+            for row in range(len(chunk["actions"])):
+                buffer.add_frames(
+                    chunk["frames"][row].reshape(n_envs, *self._frame_shape),
+                    chunk["next_frames"][row].reshape(n_envs, *self._frame_shape),
+                    chunk["actions"][row],
+                    chunk["rewards"][row],
+                    chunk["dones"][row],
+                    self._infos,
+                )
+            self.stats.steps += chunk["actions"].size
+            self.stats.episodes += len(scores)
+            self.stats.scores.extend(scores)
+            try:
+                item = chunks.get_nowait()
+            except queue.Empty:
+                item = None
+
+    def sample(self, batch_size: int) -> ReplayBufferSamples:
+        """Samples a minibatch across the actors' buffers by their fill."""
+        sizes = np.array([buffer.size() * buffer.n_envs for buffer in self.buffers])
+        counts = self._rng.multinomial(batch_size, sizes / sizes.sum())
+        parts = [
+            buffer.sample(int(count))
+            for buffer, count in zip(self.buffers, counts, strict=True)
+            if count
+        ]
+        return ReplayBufferSamples(
+            *(
+                None if tensors[0] is None else torch.cat(tensors)
+                for tensors in zip(*parts, strict=True)
+            )
+        )
+
+    def _update(self, version: Any, lock: Any) -> None:
+        """Runs one gradient step and publishes or syncs weights when due."""
+        config, stats = self.config, self.stats
+        td_update(
+            self.net,
+            self.target,
+            self.optimizer,
+            self.sample(config.batch_size),
+            config.gamma,
+        )
+        stats.updates += 1
+        if stats.updates % config.target_update_interval == 0:
+            self.target.load_state_dict(self.net.state_dict())
+        if stats.updates % config.weight_sync_interval == 0:
+            with lock:
+                self.shared_net.load_state_dict(self.net.state_dict())
+                version.value += 1
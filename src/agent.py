@@ -1,40 +1,137 @@
 """DQN agent training script for Flappy Bird."""
 
+import argparse
+from pathlib import Path
+from typing import Any
+
 from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList
 from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import VecEnv
 
+from src.checkpoint import (
+    AsyncCheckpointCallback,
+    latest_checkpoint,
+    restore_checkpoint,
+)
+from src.evaluation import evaluate, format_report
 from src.flappy_env import FlappyBirdEnv
+from src.inference import export_policy
+from src.replay import CompressedFrameReplayBuffer
+from src.telemetry import TelemetryCallback
 
-# Create the environment
-env = make_vec_env(FlappyBirdEnv, n_envs=1)
-
-# Initialize the DQN model
-model = DQN(
-    "CnnPolicy",
-    env,
-    verbose=1,
-    buffer_size=10000,
-    learning_starts=1000,
-    batch_size=32,
-    target_update_interval=500,
-)
+# CompressedFrameReplayBuffer stores each frame once, zlib-compressed, and
+# spills the oldest frames to disk beyond its RAM budget
+HYPERPARAMS: dict[str, Any] = {
+    "buffer_size": 100000,
+    "learning_starts": 1000,
+    "batch_size": 32,
+    "target_update_interval": 500,
+}
+
+
+def make_env(n_envs: int = 1) -> VecEnv:
+    """Creates the headless training environments."""
+    return make_vec_env(FlappyBirdEnv, n_envs=n_envs, env_kwargs={"render_mode": None})
+
+
+def make_model(env: VecEnv, seed: int | None = None, **hyperparams: Any) -> DQN:
+    """Initializes the DQN model.
+
+    Args:
+        env: Training environments.
+        seed: Seed of the model and the environments.
+        **hyperparams: Overrides of :data:`HYPERPARAMS`.
+    """
+    return DQN(
+        "CnnPolicy",
+        env,
+        verbose=1,
+        replay_buffer_class=CompressedFrameReplayBuffer,
+        replay_buffer_kwargs={"ram_budget": 1 << 30},
+        seed=seed,
+        **{**HYPERPARAMS, **hyperparams},
+    )
+
+
+def train(
+    total_timesteps: int = 100000,
+    callback: BaseCallback | None = None,
+    seed: int | None = None,
+    checkpoint_dir: str | Path | None = None,
+    checkpoint_freq: int = 50000,
+    resume: bool = False,
+    **hyperparams: Any,
+) -> DQN:
+    """Trains a DQN model.
+
+    Args:
+        total_timesteps: Environment steps to train for in total.
+        callback: Callback invoked by ``learn``, which may stop training early.
+        seed: Seed of the model and the environments.
+        checkpoint_dir: Directory for periodic checkpoints, None for none.
+        checkpoint_freq: Environment steps between checkpoints.
+        resume: Continue from the latest checkpoint in ``checkpoint_dir``.
+        **hyperparams: Overrides of :data:`HYPERPARAMS`.
+
+    Returns:
+        The trained model.
+    """
+    env = make_env()
+    latest = latest_checkpoint(checkpoint_dir) if resume and checkpoint_dir else None
+    if latest is not None:
+        model = restore_checkpoint(latest, env)
+        print(f"resuming from {latest} at step {model.num_timesteps}")
+    else:
+        model = make_model(env, seed=seed, **hyperparams)
+
+    callbacks = [callback] if callback is not None else []
+    if checkpoint_dir is not None:
+        callbacks.append(AsyncCheckpointCallback(checkpoint_dir, checkpoint_freq))
+    model.learn(
+        total_timesteps=total_timesteps - model.num_timesteps,
+        callback=CallbackList(callbacks),
+        reset_num_timesteps=latest is None,
+    )
+    env.close()
+    return model
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Train the SB3 DQN agent")
+    parser.add_argument("--timesteps", type=int, default=100000)
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--checkpoint-freq", type=int, default=50000)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the latest checkpoint in --checkpoint-dir.",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Telemetry file, CSV or a Prometheus textfile if it ends in .prom.",
+    )
+    return parser.parse_args()
 
-# Train the model
-model.learn(total_timesteps=100000)
 
-# Save the model
-model.save("dqn_flappybird")
+def main() -> None:
+    """Trains, saves and evaluates the model."""
+    args = parse_args()
+    model = train(
+        args.timesteps,
+        callback=TelemetryCallback(args.metrics) if args.metrics else None,
+        checkpoint_dir=args.checkpoint_dir,
+        checkpoint_freq=args.checkpoint_freq,
+        resume=args.resume,
+    )
+    model.save("dqn_flappybird")
 
-# Load the model
-model = DQN.load("dqn_flappybird")
+    # Evaluate the trained model over many seeds
+    export_policy("dqn_flappybird.zip", "dqn_flappybird.npz")
+    print(format_report(evaluate("dqn_flappybird.npz", episodes=100, workers=4)))
 
-# Test the trained model
-obs = env.reset()
-for _i in range(1000):
-    action, _states = model.predict(obs, deterministic=True)
-    obs, reward, done, info = env.step(action)
-    env.render()
-    if done:
-        obs = env.reset()
 
-env.close()
+if __name__ == "__main__":
+    main()
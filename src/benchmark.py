@@ -0,0 +1,134 @@
+"""Micro-benchmarks for the Flappy Bird simulation.
+
+Each benchmark runs a short warm-up, then times a fixed number of iterations
+and traces memory with :mod:`tracemalloc` to report how many bytes every
+iteration allocates on top of what it frees again.
+
+Run with ``python src/benchmark.py`` (``make bench``).
+"""
+
+import argparse
+from collections.abc import Callable
+import statistics
+import time
+import tracemalloc
+
+from src.flappy_env import FlappyBirdEnv
+
+BenchmarkFn = Callable[[FlappyBirdEnv], Callable[[], object]]
+
+
+def _bench_step(env: FlappyBirdEnv) -> Callable[[], object]:
+    """Steps the environment without materializing observations."""
+    actions = iter(range(1 << 62))
+
+    def run() -> None:
+        _, _, done, _, _ = env.step(next(actions) % 7 == 0)
+        if done:
+            env.reset()
+
+    return run
+
+
+def _bench_step_obs(env: FlappyBirdEnv) -> Callable[[], object]:
+    """Steps the environment and materializes every observation."""
+    step = _bench_step(env)
+
+    def run() -> None:
+        step()
+        env._get_observation().materialize()
+
+    return run
+
+
+def _bench_collide(env: FlappyBirdEnv) -> Callable[[], object]:
+    """Checks the player against the floor and every pipe."""
+    return lambda: env.player.collided(env.pipes, env.floor)
+
+
+BENCHMARKS: dict[str, BenchmarkFn] = {
+    "step": _bench_step,
+    "step_obs": _bench_step_obs,
+    "collide": _bench_collide,
+}
+
+
+def run_benchmark(
+    env: FlappyBirdEnv, fn: BenchmarkFn, iterations: int, warmup: int = 100
+) -> dict[str, float]:
+    """Runs one benchmark and returns its timing and allocation statistics.
+
+    Args:
+        env: Environment to benchmark against, reset before running.
+        fn: Benchmark factory returning the function to time.
+        iterations: Number of timed iterations.
+        warmup: Number of untimed iterations run first.
+
+    Returns:
+        Mean, median and p99 time per iteration in microseconds, and the
+        bytes allocated per iteration while tracing.
+    """
+    env.reset()
+    run = fn(env)
+    for _ in range(warmup):
+        run()
+
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1e6)
+
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "mean_us": statistics.fmean(times),
+        "p50_us": times[len(times) // 2],
+        "p99_us": times[int(len(times) * 0.99)],
+        "alloc_bytes": allocated / iterations,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Flappy Bird benchmarks")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        default=list(BENCHMARKS),
+        help=f"Benchmarks to run ({', '.join(BENCHMARKS)}), all of them by default.",
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    return args
+
+
+def main() -> None:
+    """Runs the selected benchmarks and prints a result table."""
+    args = parse_args()
+    env = FlappyBirdEnv(render_mode=None)
+
+    print(f"{'benchmark':<12}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'B/iter':>10}")
+    for name in args.names:
+        stats = run_benchmark(env, BENCHMARKS[name], args.iterations)
+        print(
+            f"{name:<12}{stats['mean_us']:>10.1f}{stats['p50_us']:>10.1f}"
+            f"{stats['p99_us']:>10.1f}{stats['alloc_bytes']:>10.0f}"
+        )
+    env.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Non-blocking checkpoints and resumable training for the SB3 agent.
+
+:class:`AsyncCheckpointCallback` snapshots training by forking: the child
+process sees a copy-on-write image of the model, its optimizer and the replay
+buffer at the moment of the fork and writes them to disk while training
+carries on in the parent. A checkpoint directory holds::
+
+    model.zip           SB3 model, including optimizer state and counters
+    replay_buffer.pkl   replay buffer
+    training_state.pkl  env game states, RNGs and sprites, Monitor episode
+                        state, global RNGs and the exploration RNG
+
+Directories are written under a temporary name and renamed when complete, so
+:func:`latest_checkpoint` never picks up a partial one and :func:`restore_checkpoint`
+continues exactly where the snapshot was taken.
+"""
+
+import os
+from pathlib import Path
+import pickle
+import random
+import shutil
+import sys
+import traceback
+from typing import Any
+
+import numpy as np
+from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import DummyVecEnv, VecEnv
+import torch
+
+from src.state import GameState, capture_state, restore_state
+
+
+def _dummy_vec_env(env: VecEnv) -> DummyVecEnv:
+    """Returns the DummyVecEnv below the VecEnv wrappers of a model."""
+    while not isinstance(env, DummyVecEnv):
+        if not hasattr(env, "venv"):
+            raise TypeError(f"checkpoints need a DummyVecEnv, got {type(env)}")
+        env = env.venv
+    return env
+
+
+def _training_state(model: DQN) -> dict[str, Any]:
+    """Returns the state the SB3 model files do not cover."""
+    envs = _dummy_vec_env(model.get_env()).envs
+    return {
+        # the env RNG draws the course seeds of unseeded resets
+        "games": [
+            (capture_state(env.unwrapped).to_bytes(), env.unwrapped.rng.getstate())
+            for env in envs
+        ],
+        "sprites": [env.unwrapped.config.images.variant for env in envs],
+        "monitors": [
+            (list(env.rewards), env.needs_reset) if isinstance(env, Monitor) else None
+            for env in envs
+        ],
+        "rng": {
+            "random": random.getstate(),
+            "numpy": np.random.get_state(),
+            "torch": torch.get_rng_state(),
+            # epsilon-greedy actions are sampled from the action space
+            "action_space": model.action_space.np_random.bit_generator.state,
+        },
+    }
+
+
+def write_checkpoint(model: DQN, directory: str | Path) -> Path:
+    """Writes a complete checkpoint of a model into ``directory``.
+
+    Returns:
+        The checkpoint directory.
+    """
+    directory = Path(directory)
+    tmp = directory.with_name(f".{directory.name}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    model.save(tmp / "model.zip")
+    model.save_replay_buffer(tmp / "replay_buffer.pkl")
+    with (tmp / "training_state.pkl").open("wb") as file:
+        pickle.dump(_training_state(model), file)
+    tmp.rename(directory)
+    return directory
+
+
+def latest_checkpoint(root: str | Path) -> Path | None:
+    """Returns the newest complete checkpoint under ``root``, if any."""
+    checkpoints = sorted(Path(root).glob("step-*"))
+    return checkpoints[-1] if checkpoints else None
+
+
+def restore_checkpoint(checkpoint: str | Path, env: VecEnv) -> DQN:
+    """Restores a model and its training state from a checkpoint.
+
+    The environments are put back into the games they were playing, so
+    ``model.learn(..., reset_num_timesteps=False)`` continues the run
+    without resetting them.
+
+    Args:
+        checkpoint: Checkpoint directory.
+        env: Fresh environments of the same kind as the checkpointed ones.
+
+    Returns:
+        The restored model.
+    """
+    checkpoint = Path(checkpoint)
+    model = DQN.load(checkpoint / "model.zip", env=env, force_reset=False)
+    model.load_replay_buffer(checkpoint / "replay_buffer.pkl")
+    with (checkpoint / "training_state.pkl").open("rb") as file:
+        state = pickle.load(file)
+
+    vec_env = _dummy_vec_env(model.get_env())
+    for env, sprites in zip(vec_env.envs, state["sprites"], strict=True):
+        env.unwrapped.config.images.load_variant(*sprites)
+    vec_env.reset()  # creates the game entities that are then overwritten
+    for env, (game, rng), monitor in zip(
+        vec_env.envs, state["games"], state["monitors"], strict=True
+    ):
+        restore_state(env.unwrapped, GameState.from_bytes(game))
+        env.unwrapped.rng.setstate(rng)
+        if monitor is not None:
+            env.rewards, env.needs_reset = list(monitor[0]), monitor[1]
+    random.setstate(state["rng"]["random"])
+    np.random.set_state(state["rng"]["numpy"])
+    torch.set_rng_state(state["rng"]["torch"])
+    model.action_space.np_random.bit_generator.state = state["rng"]["action_space"]
+    return model
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """Periodically checkpoints training from a forked child process.
+
+    Forking takes about as long as copying the page tables, after which the
+    parent continues training while the child writes. At most one child runs
+    at a time; a checkpoint that comes due while the previous one is still
+    being written is taken as soon as that one finishes. On platforms without
+    ``fork`` checkpoints are written synchronously.
+
+    Attributes:
+        root: Directory the ``step-*`` checkpoints are written to.
+        save_freq: Environment steps between checkpoints.
+        keep: Number of most recent checkpoints kept.
+    """
+
+    def __init__(
+        self, root: str | Path, save_freq: int = 50_000, keep: int = 2, verbose: int = 0
+    ) -> None:
+        """Initialize the callback."""
+        super().__init__(verbose)
+        self.root = Path(root)
+        self.save_freq = save_freq
+        self.keep = keep
+        self._child: int | None = None
+        self._last_saved = 0
+
+    def _on_training_start(self) -> None:
+        """Creates the checkpoint directory."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._last_saved = self.num_timesteps
+
+    def _on_step(self) -> bool:
+        """Starts a checkpoint when one is due and no other is being written."""
+        if self._child is not None and not self._reap(block=False):
+            return True
+        if self.num_timesteps - self._last_saved >= self.save_freq:
+            self._checkpoint()
+        return True
+
+    def _on_training_end(self) -> None:
+        """Writes a final checkpoint and waits for it."""
+        self._reap(block=True)
+        if self.num_timesteps > self._last_saved:
+            self._checkpoint()
+        self._reap(block=True)
+
+    def _checkpoint(self) -> None:
+        """Forks a child writing the current state."""
+        directory = self.root / f"step-{self.num_timesteps:012d}"
+        self._last_saved = self.num_timesteps
+        if not hasattr(os, "fork"):
+            write_checkpoint(self.model, directory)
+            self._prune()
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:  # child: write and leave without running any cleanup
+            code = 0
+            try:
+                write_checkpoint(self.model, directory)
+            except BaseException:  # noqa: BLE001 - reported via the exit code
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self._child = pid
+
+    def _reap(self, block: bool) -> bool:
+        """Collects the child if it finished; returns True if none is running."""
+        if self._child is None:
+            return True
+        pid, status = os.waitpid(self._child, 0 if block else os.WNOHANG)
+        if pid == 0:
+            return False
+        self._child = None
+        if os.waitstatus_to_exitcode(status) != 0:
+            print("checkpoint failed, see the traceback above", file=sys.stderr)
+        self._prune()
+        return True
+
+    def _prune(self) -> None:
+        """Deletes all but the ``keep`` most recent checkpoints."""
+        for old in sorted(self.root.glob("step-*"))[: -self.keep]:
+            shutil.rmtree(old, ignore_errors=True)
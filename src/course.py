@@ -0,0 +1,79 @@
+"""Seeded pipe courses, generated once and shared between environments.
+
+A course is the sequence of gap heights of the pipes of one episode, the only
+random part of the game. :class:`Course` draws them from its seed in chunks
+of ``chunk_size`` as the pipes spawn, and keeps every chunk as a read-only
+NumPy array, so a pipe spawn is a table lookup and a course is only ever
+generated once per process: :func:`get_course` hands every environment
+reset with the same seed the same instance.
+
+Gap heights are drawn exactly as :class:`random.Random` seeded with the
+course seed would draw them one by one, so seeded episodes are the same as
+before courses were tabulated. :meth:`Course.table` exposes the heights for
+vectorized simulations and benchmarks that replay a course outside of the
+environment.
+"""
+
+import random
+import threading
+
+import numpy as np
+
+from src.utils.utils import memoize
+
+CHUNK_SIZE = 256
+
+
+class Course:
+    """Gap heights of the pipes of one seeded course.
+
+    Attributes:
+        seed: Seed the heights are drawn from.
+        low: Lowest gap height.
+        high: Gap heights are below this.
+        chunk_size: Heights generated at a time.
+    """
+
+    def __init__(
+        self, seed: int, low: int, high: int, chunk_size: int = CHUNK_SIZE
+    ) -> None:
+        """Initialize the course; heights are generated on first access."""
+        self.seed = seed
+        self.low = low
+        self.high = high
+        self.chunk_size = chunk_size
+        self._rng = random.Random(seed)
+        self._chunks: list[np.ndarray] = []
+        self._lock = threading.Lock()  # courses are shared by env threads
+
+    def __getitem__(self, index: int) -> int:
+        """Returns the gap height of the ``index``-th pipe pair."""
+        chunk, offset = divmod(index, self.chunk_size)
+        if chunk >= len(self._chunks):
+            self._extend(chunk + 1)
+        return int(self._chunks[chunk][offset])
+
+    def _extend(self, n_chunks: int) -> None:
+        """Generates chunks until there are ``n_chunks`` of them."""
+        with self._lock:
+            span = self.high - self.low
+            while len(self._chunks) < n_chunks:
+                gaps = np.fromiter(
+                    (self._rng.randrange(0, span) for _ in range(self.chunk_size)),
+                    dtype=np.int16,
+                    count=self.chunk_size,
+                )
+                gaps += self.low
+                gaps.flags.writeable = False
+                self._chunks.append(gaps)
+
+    def table(self, n: int) -> np.ndarray:
+        """Returns the gap heights of the first ``n`` pipe pairs."""
+        self._extend(-(-n // self.chunk_size))
+        return np.concatenate(self._chunks)[:n] if n else np.zeros(0, np.int16)
+
+
+@memoize(maxsize=256)
+def get_course(seed: int, low: int, high: int) -> Course:
+    """Returns the shared course of a seed and range of gap heights."""
+    return Course(seed, low, high)
@@ -0,0 +1,413 @@
+"""Sharded, memory-mapped transition datasets for offline RL.
+
+Transitions ``(obs, action, reward, terminated)`` are written by
+:class:`TransitionWriter` into shards of ``.npy`` files. Rows are staged in
+memory and copied into the memory-mapped shards in bulk by a background
+thread, so collection never waits on disk. Each environment writes its own
+stream of shards, keeping consecutive steps of an episode in consecutive rows,
+and keeps a small ``index-<stream>.json`` listing its shards and their row
+counts. Every row also records whether it starts an episode, so rows whose
+successor belongs to another episode, after a truncation or a reset, are
+never paired with that successor.
+
+:class:`TransitionDataset` reads those indexes and samples minibatches
+straight from the memory maps, so only the sampled rows are paged in. Layout::
+
+    root/
+        index-00000.json
+        s00000-00000/obs.npy action.npy reward.npy terminated.npy
+                     episode_start.npy
+        s00000-00001/...
+"""
+
+import json
+from pathlib import Path
+import queue
+import threading
+from typing import Any
+
+import gymnasium as gym
+import numpy as np
+
+from src.observation import LazyObservation
+
+FIELDS = ("obs", "action", "reward", "terminated")
+
+
+class _Stream:
+    """Staging buffers and the current shard of one stream of transitions."""
+
+    def __init__(
+        self,
+        root: Path,
+        stream: int,
+        dtypes: dict[str, tuple[tuple[int, ...], np.dtype]],
+        shard_size: int,
+        flush_size: int,
+    ) -> None:
+        """Initialize the stream with two staging buffers."""
+        self.root = root
+        self.stream = stream
+        self.dtypes = dtypes
+        self.shard_size = shard_size
+        self.free: queue.Queue[dict[str, np.ndarray]] = queue.Queue()
+        for _ in range(2):
+            self.free.put(
+                {
+                    name: np.empty((flush_size, *shape), dtype=dtype)
+                    for name, (shape, dtype) in dtypes.items()
+                }
+            )
+        self.staging = self.free.get()
+        self.staged = 0
+        self.shards: list[dict[str, Any]] = []
+        self.memmaps: dict[str, np.ndarray] = {}
+
+    def write(self, batch: dict[str, np.ndarray], count: int) -> None:
+        """Copies staged rows into the shards, opening new shards as needed."""
+        start = 0
+        while start < count:
+            if not self.shards or self.shards[-1]["count"] == self.shard_size:
+                self._open_shard()
+            shard = self.shards[-1]
+            n = min(count - start, self.shard_size - shard["count"])
+            for name, memmap in self.memmaps.items():
+                memmap[shard["count"] : shard["count"] + n] = batch[name][start:][:n]
+            shard["count"] += n
+            start += n
+        for memmap in self.memmaps.values():
+            memmap.flush()
+        self._write_index()
+
+    def _open_shard(self) -> None:
+        """Creates the memory-mapped files of the next shard."""
+        name = f"s{self.stream:05d}-{len(self.shards):05d}"
+        directory = self.root / name
+        directory.mkdir()
+        self.memmaps = {
+            field: np.lib.format.open_memmap(
+                directory / f"{field}.npy",
+                mode="w+",
+                dtype=dtype,
+                shape=(self.shard_size, *shape),
+            )
+            for field, (shape, dtype) in self.dtypes.items()
+        }
+        self.shards.append({"name": name, "count": 0})
+
+    def _write_index(self) -> None:
+        """Atomically rewrites the index of the stream."""
+        path = self.root / f"index-{self.stream:05d}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"stream": self.stream, "shards": self.shards}))
+        tmp.replace(path)
+
+
+class TransitionWriter:
+    """Streams transitions of one or more environments into sharded memmaps.
+
+    Attributes:
+        root: Directory of the dataset.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        observation_space: gym.spaces.Box,
+        num_streams: int = 1,
+        first_stream: int = 0,
+        shard_size: int = 100_000,
+        flush_size: int = 128,
+    ) -> None:
+        """Initialize the writer and start its flush thread.
+
+        Args:
+            root: Directory of the dataset, created if missing.
+            observation_space: Space of the observations to store.
+            num_streams: Number of environments writing through this writer.
+            first_stream: Id of the first stream. Writers in different
+                processes sharing a root must use disjoint stream ids.
+            shard_size: Rows per shard.
+            flush_size: Rows staged in memory before a bulk write.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        dtypes = {
+            "obs": (observation_space.shape, observation_space.dtype),
+            "action": ((), np.dtype(np.int32)),
+            "reward": ((), np.dtype(np.float32)),
+            "terminated": ((), np.dtype(bool)),
+            "episode_start": ((), np.dtype(bool)),
+        }
+        self._streams = [
+            _Stream(self.root, first_stream + i, dtypes, shard_size, flush_size)
+            for i in range(num_streams)
+        ]
+        self._flush_size = flush_size
+        # every stream starts with a new episode
+        self._episode_start = [True] * num_streams
+        self._pending: queue.Queue = queue.Queue(maxsize=2 * num_streams)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def add(
+        self,
+        obs: np.ndarray | LazyObservation,
+        action: int,
+        reward: float,
+        terminated: bool,
+        stream: int = 0,
+    ) -> None:
+        """Stages one transition of a stream.
+
+        Args:
+            obs: Observation the action was taken in.
+            action: Action taken.
+            reward: Reward received.
+            terminated: True if the action ended the episode.
+            stream: Index of the stream within this writer.
+        """
+        state = self._streams[stream]
+        row = state.staged
+        staging = state.staging
+        if isinstance(obs, LazyObservation):
+            obs.materialize(staging["obs"][row])
+        else:
+            staging["obs"][row] = obs
+        staging["action"][row] = action
+        staging["reward"][row] = reward
+        staging["terminated"][row] = terminated
+        staging["episode_start"][row] = self._episode_start[stream]
+        self._episode_start[stream] = False
+        state.staged += 1
+        if state.staged == self._flush_size:
+            self._submit(state)
+
+    def start_episode(self, stream: int = 0) -> None:
+        """Marks the next transition of a stream as the first of an episode.
+
+        Call this on every reset; the transition before it is then never
+        sampled with the new episode's first observation as its successor.
+        """
+        self._episode_start[stream] = True
+
+    def flush(self) -> None:
+        """Hands all staged rows to the flush thread and waits until written."""
+        for state in self._streams:
+            if state.staged:
+                self._submit(state)
+        self._pending.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Writes all staged rows and stops the flush thread."""
+        self.flush()
+        self._pending.put(None)
+        self._thread.join()
+
+    def _submit(self, state: _Stream) -> None:
+        """Queues the staging buffer of a stream and takes a free one."""
+        self._raise_error()
+        self._pending.put((state, state.staging, state.staged))
+        state.staging = state.free.get()
+        state.staged = 0
+
+    def _flush_loop(self) -> None:
+        """Writes queued staging buffers into the shards."""
+        while (item := self._pending.get()) is not None:
+            state, batch, count = item
+            try:
+                state.write(batch, count)
+            except BaseException as error:  # noqa: BLE001 - re-raised in add()
+                self._error = error
+            finally:
+                state.free.put(batch)
+                self._pending.task_done()
+        self._pending.task_done()
+
+    def _raise_error(self) -> None:
+        """Re-raises an error of the flush thread in the caller's thread."""
+        if self._error is not None:
+            raise RuntimeError("writing transitions failed") from self._error
+
+
+class TransitionRecorder(gym.Wrapper):
+    """Wrapper recording every transition of an environment to a dataset."""
+
+    def __init__(
+        self, env: gym.Env, root: str | Path, stream: int = 0, **kwargs: Any
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            env: Environment to record.
+            root: Directory of the dataset.
+            stream: Stream id, unique among the writers sharing ``root``.
+            **kwargs: Forwarded to :class:`TransitionWriter`.
+        """
+        super().__init__(env)
+        self.writer = TransitionWriter(
+            root, env.observation_space, first_stream=stream, **kwargs
+        )
+        self._obs = None
+
+    def reset(self, **kwargs: Any) -> tuple[Any, dict[str, Any]]:
+        """Resets the environment and remembers the first observation."""
+        self._obs, info = self.env.reset(**kwargs)
+        self.writer.start_episode()
+        return self._obs, info
+
+    def step(self, action: int) -> tuple:
+        """Steps the environment and records the transition."""
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.writer.add(self._obs, action, reward, terminated)
+        self._obs = obs
+        return obs, reward, terminated, truncated, info
+
+    def close(self) -> None:
+        """Flushes the dataset and closes the environment."""
+        self.writer.close()
+        super().close()
+
+
+class VecTransitionRecorder(gym.vector.VectorWrapper):
+    """Vector env wrapper recording each sub-environment as its own stream.
+
+    Expects the default next-step autoreset of Gymnasium vector envs: the
+    step after an episode ends only resets that sub-environment and is not
+    recorded.
+    """
+
+    def __init__(
+        self,
+        env: gym.vector.VectorEnv,
+        root: str | Path,
+        first_stream: int = 0,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            env: Vector environment to record.
+            root: Directory of the dataset.
+            first_stream: Stream id of the first sub-environment.
+            **kwargs: Forwarded to :class:`TransitionWriter`.
+        """
+        super().__init__(env)
+        self.writer = TransitionWriter(
+            root,
+            env.single_observation_space,
+            num_streams=env.num_envs,
+            first_stream=first_stream,
+            **kwargs,
+        )
+        self._obs = None
+        self._autoreset = np.zeros(env.num_envs, dtype=bool)
+
+    def reset(self, **kwargs: Any) -> tuple[np.ndarray, dict[str, Any]]:
+        """Resets all sub-environments."""
+        self._obs, info = self.env.reset(**kwargs)
+        self._autoreset[:] = False
+        for i in range(self.num_envs):
+            self.writer.start_episode(i)
+        return self._obs, info
+
+    def step(self, actions: np.ndarray) -> tuple:
+        """Steps the sub-environments and records their transitions."""
+        obs, rewards, terminated, truncated, info = self.env.step(actions)
+        for i in np.flatnonzero(self._autoreset):
+            self.writer.start_episode(i)
+        for i in np.flatnonzero(~self._autoreset):
+            self.writer.add(self._obs[i], actions[i], rewards[i], terminated[i], i)
+        self._autoreset = terminated | truncated
+        self._obs = obs
+        return obs, rewards, terminated, truncated, info
+
+    def close(self, **kwargs: Any) -> None:
+        """Flushes the dataset and closes the environments."""
+        self.writer.close()
+        super().close(**kwargs)
+
+
+class TransitionDataset:
+    """Random-access reader over the shards of a transition dataset.
+
+    Shards are opened as read-only memory maps, so sampling only reads the
+    selected rows from disk. Rows are only sampled if they end an episode or
+    their successor in the same shard continues it, so neither the last row
+    of a shard nor the last row of a truncated or reset episode is paired
+    with an observation of another episode. Datasets written without
+    ``episode_start`` are read as one episode per run of rows.
+
+    Attributes:
+        root: Directory of the dataset.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        """Initialize the reader from the stream indexes under ``root``."""
+        self.root = Path(root)
+        self._shards: list[dict[str, np.ndarray]] = []
+        # per shard, the rows that can be sampled
+        self._rows: list[np.ndarray] = []
+        valid = []
+        for index in sorted(self.root.glob("index-*.json")):
+            for shard in json.loads(index.read_text())["shards"]:
+                if not shard["count"]:
+                    continue
+                arrays = {
+                    field: np.load(
+                        self.root / shard["name"] / f"{field}.npy", mmap_mode="r"
+                    )[: shard["count"]]
+                    for field in FIELDS
+                }
+                self._shards.append(arrays)
+                directory = self.root / shard["name"]
+                rows = np.array(arrays["terminated"])
+                if (directory / "episode_start.npy").exists():
+                    starts = np.load(directory / "episode_start.npy", mmap_mode="r")
+                    rows[:-1] |= ~starts[1 : shard["count"]]
+                else:
+                    rows[:-1] = True
+                self._rows.append(np.flatnonzero(rows))
+                valid.append(len(self._rows[-1]))
+        self._offsets = np.concatenate([[0], np.cumsum(valid)]).astype(np.int64)
+
+    def __len__(self) -> int:
+        """Returns the number of transitions that can be sampled."""
+        return int(self._offsets[-1])
+
+    def get(self, indices: np.ndarray) -> dict[str, np.ndarray]:
+        """Returns the transitions at the given dataset indices.
+
+        Returns:
+            The obs, action, reward, terminated and next_obs arrays. The
+            next_obs of terminal transitions is undefined.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_ids = np.searchsorted(self._offsets, indices, side="right") - 1
+        local = indices - self._offsets[shard_ids]
+        first = self._shards[0]
+        batch = {
+            field: np.empty((len(indices), *first[field].shape[1:]), first[field].dtype)
+            for field in FIELDS
+        }
+        batch["next_obs"] = np.empty_like(batch["obs"])
+        for shard_id in np.unique(shard_ids):
+            rows = np.flatnonzero(shard_ids == shard_id)
+            order = rows[np.argsort(local[rows])]
+            shard = self._shards[shard_id]
+            # sampleable rows are increasing, so the order stays sorted
+            at = self._rows[shard_id][local[order]]
+            for field in FIELDS:
+                batch[field][order] = shard[field][at]
+            successor = np.minimum(at + 1, len(shard["obs"]) - 1)
+            batch["next_obs"][order] = shard["obs"][successor]
+        return batch
+
+    def sample(
+        self, batch_size: int, rng: np.random.Generator | None = None
+    ) -> dict[str, np.ndarray]:
+        """Samples a minibatch of transitions uniformly at random."""
+        rng = rng or np.random.default_rng()
+        return self.get(rng.integers(0, len(self), size=batch_size))
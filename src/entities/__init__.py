@@ -1,7 +1,7 @@
 """Entity classes for the Flappy Bird game."""
 
 from src.entities.background import Background
-from src.entities.entity import Entity
+from src.entities.entity import DrawCommand, Entity
 from src.entities.floor import Floor
 from src.entities.game_over import GameOver
 from src.entities.pipe import Pipe, Pipes
@@ -11,6 +11,7 @@ from src.entities.welcome_message import WelcomeMessage
 
 __all__ = [
     "Background",
+    "DrawCommand",
     "Entity",
     "Floor",
     "Pipe",
@@ -11,6 +11,8 @@ class Background(Entity):
         config: Game configuration.
     """
 
+    __slots__ = ()
+
     def __init__(self, config: GameConfig) -> None:
         """Initialize the background."""
         super().__init__(
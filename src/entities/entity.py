@@ -6,6 +6,16 @@ from typing import Any
 import pygame
 
 from src.utils import GameConfig, get_hit_mask, pixel_collision
+from src.utils.utils import memoize
+
+# (image, x, y, rotation) needed to blit an entity without touching the screen
+DrawCommand = tuple[pygame.Surface, float, float, float]
+
+
+@memoize(maxsize=64, weak=True)
+def _scaled(image: pygame.Surface, size: tuple[float, float]) -> pygame.Surface:
+    """Returns a scaled copy of an image, shared by all entities using it."""
+    return pygame.transform.scale(image, size)
 
 
 class Entity(ABC):
@@ -21,6 +31,8 @@ class Entity(ABC):
         hit_mask: Hit mask of the entity.
     """
 
+    __slots__ = ("_rect", "config", "h", "hit_mask", "image", "w", "x", "y")
+
     def __init__(
         self,
         config: GameConfig,
@@ -38,14 +50,16 @@ class Entity(ABC):
         if w or h:
             self.w = w or config.window.ratio * h
             self.h = h or w / config.window.ratio
-            self.image = pygame.transform.scale(image, (self.w, self.h))
+            self.image = _scaled(image, (self.w, self.h))
         else:
             self.image = image
             self.w = image.get_width() if image else 0
             self.h = image.get_height() if image else 0
 
         self.hit_mask = get_hit_mask(image) if image else None
-        self.__dict__.update(kwargs)
+        self._rect = pygame.Rect(self.x, self.y, self.w, self.h)
+        for name, value in kwargs.items():
+            setattr(self, name, value)
 
     def update_image(
         self, image: pygame.Surface, w: int | None = None, h: int | None = None
@@ -68,8 +82,14 @@ class Entity(ABC):
 
     @property
     def rect(self) -> pygame.Rect:
-        """Returns the rect of the entity."""
-        return pygame.Rect(self.x, self.y, self.w, self.h)
+        """Returns the rect of the entity.
+
+        The same Rect instance is updated in place on every access, so callers
+        must copy it if they need to keep it around.
+        """
+        rect = self._rect
+        rect.update(self.x, self.y, self.w, self.h)
+        return rect
 
     def collide(self, other: "Entity") -> bool:
         """Returns a boolean indicating whether the entity collides with another entity."""
@@ -82,23 +102,34 @@ class Entity(ABC):
         """Updates the entity."""
         # Update entity logic here, if any
 
+    def draw_commands(self) -> tuple[DrawCommand, ...]:
+        """Returns the draw commands that reproduce the entity's current frame."""
+        if not self.image:
+            return ()
+        return ((self.image, self.x, self.y, 0),)
+
     def render(self) -> None:
         """Draws the entity on the screen."""
         if self.image:
             self.config.screen.blit(self.image, self.rect)
         if self.config.debug:
-            pygame.draw.rect(self.config.screen, (255, 0, 0), self.rect, 1)
-            # write x and y at top of rect
-            font = pygame.font.SysFont("Arial", 13, True)
-            text = font.render(
-                f"{self.x:.1f}, {self.y:.1f}, {self.w:.1f}, {self.h:.1f}",
-                True,
-                (255, 255, 255),
-            )
-            self.config.screen.blit(
-                text,
-                (
-                    self.rect.x + self.rect.w / 2 - text.get_width() / 2,
-                    self.rect.y - text.get_height(),
-                ),
-            )
+            self.render_debug()
+
+    def render_debug(self) -> None:
+        """Draws the entity's rect and coordinates on the screen."""
+        rect = self.rect
+        pygame.draw.rect(self.config.screen, (255, 0, 0), rect, 1)
+        # write x and y at top of rect
+        font = pygame.font.SysFont("Arial", 13, True)
+        text = font.render(
+            f"{self.x:.1f}, {self.y:.1f}, {self.w:.1f}, {self.h:.1f}",
+            True,
+            (255, 255, 255),
+        )
+        self.config.screen.blit(
+            text,
+            (
+                rect.x + rect.w / 2 - text.get_width() / 2,
+                rect.y - text.get_height(),
+            ),
+        )
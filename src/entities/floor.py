@@ -12,6 +12,8 @@ class Floor(Entity):
         x_extra: Extra width of the floor.
     """
 
+    __slots__ = ("vel_x", "x_extra")
+
     def __init__(self, config: GameConfig) -> None:
         """Initialize the floor."""
         super().__init__(config, config.images.base, 0, config.window.vh)
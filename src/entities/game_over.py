@@ -11,6 +11,8 @@ class GameOver(Entity):
         config: Game configuration.
     """
 
+    __slots__ = ()
+
     def __init__(self, config: GameConfig) -> None:
         """Initialize the game over screen."""
         super().__init__(
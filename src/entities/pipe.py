@@ -3,9 +3,12 @@
 import random
 from typing import Any
 
-from src.entities.entity import Entity
+from src.course import Course, get_course
+from src.entities.entity import DrawCommand, Entity
 from src.utils import GameConfig
 
+PIPE_VEL_X = -5
+
 
 class Pipe(Entity):
     """Pipe entity.
@@ -14,10 +17,12 @@ class Pipe(Entity):
         vel_x: Velocity of the pipe.
     """
 
+    __slots__ = ("vel_x",)
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         """Initialize the pipe."""
         super().__init__(*args, **kwargs)
-        self.vel_x = -5
+        self.vel_x = PIPE_VEL_X
 
     def tick(self) -> None:
         """Update the pipe."""
@@ -31,25 +36,73 @@ class Pipe(Entity):
 class Pipes(Entity):
     """Pipes entity.
 
+    Pipe pairs that leave the screen go back into a pool and are reused for
+    the next spawns, so no pipes are created once the pool holds as many
+    pairs as fit on the screen.
+
     Attributes:
         pipe_gap: Gap between the pipes.
         top: Top of the screen.
         bottom: Bottom of the screen.
         upper: List of upper pipes.
         lower: List of lower pipes.
+        course: Gap heights of the pipes, see :class:`~src.course.Course`.
+        spawned: Number of pipe pairs spawned from the course so far.
     """
 
+    __slots__ = (
+        "_pool",
+        "bottom",
+        "course",
+        "lower",
+        "pipe_gap",
+        "spawned",
+        "top",
+        "upper",
+    )
+
     upper: list[Pipe]
     lower: list[Pipe]
 
-    def __init__(self, config: GameConfig) -> None:
-        """Initialize the pipes."""
+    def __init__(
+        self,
+        config: GameConfig,
+        seed: int | None = None,
+        course: Course | None = None,
+    ) -> None:
+        """Initialize the pipes.
+
+        Args:
+            config: Game configuration.
+            seed: Seed of the course, so that seeded environments produce
+                reproducible courses; a random one by default.
+            course: Course to fly instead of the one of ``seed``.
+        """
         super().__init__(config)
         self.pipe_gap = 120
         self.top = 0
         self.bottom = self.config.window.viewport_height
         self.upper = []
         self.lower = []
+        self._pool: list[tuple[Pipe, Pipe]] = []
+        self.reset(seed, course)
+
+    @property
+    def gap_range(self) -> tuple[int, int]:
+        """Returns the lowest gap height and the bound all heights are below."""
+        base_y = self.config.window.viewport_height
+        low = int(base_y * 0.2)
+        return low, low + int(base_y * 0.6 - self.pipe_gap)
+
+    def reset(self, seed: int | None = None, course: Course | None = None) -> None:
+        """Starts over at the beginning of a course, recycling all pipes."""
+        if course is None:
+            if seed is None:
+                seed = random.getrandbits(64)
+            course = get_course(seed, *self.gap_range)
+        self.course = course
+        self.spawned = 0
+        self.resize(0)
         self.spawn_initial_pipes()
 
     def tick(self) -> None:
@@ -78,61 +131,81 @@ class Pipes(Entity):
     def spawn_new_pipes(self) -> None:
         """Spawn new pipes."""
         # add new pipe when first pipe is about to touch left of screen
-        upper, lower = self.make_random_pipes()
+        upper, lower = self.make_pipes()
         self.upper.append(upper)
         self.lower.append(lower)
 
     def remove_old_pipes(self) -> None:
         """Remove old pipes."""
-        # remove first pipe if its out of the screen
-        for pipe in self.upper:
-            if pipe.x < -pipe.w:
-                self.upper.remove(pipe)
-
-        for pipe in self.lower:
-            if pipe.x < -pipe.w:
-                self.lower.remove(pipe)
+        # recycle first pipe if its out of the screen
+        while self.upper and self.upper[0].x < -self.upper[0].w:
+            self._pool.append((self.upper.pop(0), self.lower.pop(0)))
 
     def spawn_initial_pipes(self) -> None:
         """Spawn initial pipes."""
-        upper_1, lower_1 = self.make_random_pipes()
+        upper_1, lower_1 = self.make_pipes()
         upper_1.x = self.config.window.width + upper_1.w * 3
         lower_1.x = self.config.window.width + upper_1.w * 3
         self.upper.append(upper_1)
         self.lower.append(lower_1)
 
-        upper_2, lower_2 = self.make_random_pipes()
+        upper_2, lower_2 = self.make_pipes()
         upper_2.x = upper_1.x + upper_1.w * 3.5
         lower_2.x = upper_1.x + upper_1.w * 3.5
         self.upper.append(upper_2)
         self.lower.append(lower_2)
 
-    def make_random_pipes(self) -> list[Pipe]:
-        """Returns a randomly generated pipe."""
+    def resize(self, n: int) -> None:
+        """Keeps the first ``n`` pipe pairs, adding pairs from the pool.
+
+        Added pairs still have to be positioned.
+        """
+        while len(self.upper) > n:
+            self._pool.append((self.upper.pop(), self.lower.pop()))
+        while len(self.upper) < n:
+            upper, lower = self._take_pair()
+            self.upper.append(upper)
+            self.lower.append(lower)
+
+    def _take_pair(self) -> tuple[Pipe, Pipe]:
+        """Returns a moving pipe pair from the pool, or a new one."""
+        images = self.config.images.pipe
+        if not self._pool:
+            return Pipe(self.config, images[0]), Pipe(self.config, images[1])
+        upper, lower = self._pool.pop()
+        # the sprites change when the images are randomized
+        if upper.image is not images[0]:
+            upper.update_image(images[0])
+            lower.update_image(images[1])
+        upper.vel_x = lower.vel_x = PIPE_VEL_X
+        return upper, lower
+
+    def make_pipes(self) -> tuple[Pipe, Pipe]:
+        """Returns the next pipe pair of the course."""
         # y of gap between upper and lower pipe
-        base_y = self.config.window.viewport_height
-
-        gap_y = random.randrange(0, int(base_y * 0.6 - self.pipe_gap))
-        gap_y += int(base_y * 0.2)
+        gap_y = self.course[self.spawned]
+        self.spawned += 1
         pipe_height = self.config.images.pipe[0].get_height()
-        pipe_x = self.config.window.width + 10
-
-        upper_pipe = Pipe(
-            self.config,
-            self.config.images.pipe[0],
-            pipe_x,
-            gap_y - pipe_height,
-        )
-
-        lower_pipe = Pipe(
-            self.config,
-            self.config.images.pipe[1],
-            pipe_x,
-            gap_y + self.pipe_gap,
-        )
 
+        upper_pipe, lower_pipe = self._take_pair()
+        upper_pipe.x = lower_pipe.x = self.config.window.width + 10
+        upper_pipe.y = gap_y - pipe_height
+        lower_pipe.y = gap_y + self.pipe_gap
         return upper_pipe, lower_pipe
 
+    def draw_commands(self) -> tuple[DrawCommand, ...]:
+        """Returns the draw commands of all pipes."""
+        commands = []
+        for up_pipe, low_pipe in zip(self.upper, self.lower, strict=False):
+            commands += up_pipe.draw_commands()
+            commands += low_pipe.draw_commands()
+        return tuple(commands)
+
+    def render_debug(self) -> None:
+        """Draws the rects and coordinates of all pipes."""
+        for pipe in self.upper + self.lower:
+            pipe.render_debug()
+
     def render(self) -> None:
         """Render the pipes."""
         for up_pipe, low_pipe in zip(self.upper, self.lower, strict=False):
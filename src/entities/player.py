@@ -5,7 +5,7 @@ from itertools import cycle
 
 import pygame
 
-from src.entities.entity import Entity
+from src.entities.entity import DrawCommand, Entity
 from src.entities.floor import Floor
 from src.entities.pipe import Pipe, Pipes
 from src.utils import GameConfig, clamp
@@ -33,6 +33,27 @@ class Player(Entity):
         crash_entity: Entity with which player crashed.
     """
 
+    __slots__ = (
+        "acc_y",
+        "crash_entity",
+        "crashed",
+        "flap_acc",
+        "flapped",
+        "frame",
+        "img_gen",
+        "img_idx",
+        "max_vel_y",
+        "max_y",
+        "min_vel_y",
+        "min_y",
+        "mode",
+        "rot",
+        "rot_max",
+        "rot_min",
+        "vel_rot",
+        "vel_y",
+    )
+
     def __init__(self, config: GameConfig) -> None:
         """Initialize the player."""
         image = config.images.player[0]
@@ -156,6 +177,10 @@ class Player(Entity):
             self.w = self.image.get_width()
             self.h = self.image.get_height()
 
+    def draw_commands(self) -> tuple[DrawCommand, ...]:
+        """Returns the draw command of the rotated player."""
+        return ((self.image, self.x, self.y, self.rot),)
+
     def draw_player(self) -> None:
         """Draw the player."""
         rotated_image = pygame.transform.rotate(self.image, self.rot)
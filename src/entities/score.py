@@ -2,7 +2,7 @@
 
 import pygame
 
-from src.entities.entity import Entity
+from src.entities.entity import DrawCommand, Entity
 from src.utils import GameConfig
 
 
@@ -14,6 +14,8 @@ class Score(Entity):
         score: Current score.
     """
 
+    __slots__ = ("score",)
+
     def __init__(self, config: GameConfig) -> None:
         """Initialize the score."""
         super().__init__(config)
@@ -42,6 +44,17 @@ class Score(Entity):
     def tick(self) -> None:
         """Updates the score."""
 
+    def draw_commands(self) -> tuple[DrawCommand, ...]:
+        """Returns the draw commands of the score digits."""
+        images = [self.config.images.numbers[int(digit)] for digit in str(self.score)]
+        x_offset = (self.config.window.width - sum(i.get_width() for i in images)) / 2
+
+        commands = []
+        for image in images:
+            commands.append((image, x_offset, self.y, 0))
+            x_offset += image.get_width()
+        return tuple(commands)
+
     def render(self) -> None:
         """Displays score in center of screen."""
         score_digits = [int(x) for x in list(str(self.score))]
@@ -11,6 +11,8 @@ class WelcomeMessage(Entity):
         config: Game configuration.
     """
 
+    __slots__ = ()
+
     def __init__(self, config: GameConfig) -> None:
         """Initialize the welcome message."""
         image = config.images.welcome_message
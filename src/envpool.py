@@ -0,0 +1,306 @@
+"""Asynchronous pool of Flappy Bird environments with an envpool-style API.
+
+Synchronous vector envs wait for their slowest environment on every step,
+and Flappy Bird episodes vary a lot in length while resets cost more than
+steps. :class:`EnvPool` instead lets workers step their environments
+independently: :meth:`EnvPool.send` hands out actions for some environments
+and returns at once, and :meth:`EnvPool.recv` returns the first
+``batch_size`` environments that are done stepping, whichever they are,
+together with their ids.
+
+Workers are threads or processes, each owning a fixed subset of the
+environments. They write every observation straight into that
+environment's row of one observation array, which the process backend keeps
+in shared memory, so frames are never pickled or copied between processes.
+Terminated episodes are reset by the worker right away; the returned
+observation is then the first one of the new episode, and the info holds the
+``final_score`` of the finished one.
+
+Example::
+
+    pool = EnvPool(num_envs=16, batch_size=8, backend="process")
+    obs, _, _, _, _, env_ids = pool.reset()
+    while training:
+        pool.send(policy(obs), env_ids)
+        obs, rewards, terminated, truncated, infos, env_ids = pool.recv()
+    pool.close()
+"""
+
+from collections.abc import Callable, Sequence
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+import threading
+import traceback
+from typing import Any
+
+from gymnasium import spaces
+import numpy as np
+
+from src.flappy_env import FlappyBirdEnv
+from src.observation import LazyObservation
+
+# (env id, reward, terminated, truncated, info), or ("error", traceback)
+_Result = tuple[int, float, bool, bool, dict[str, Any]]
+
+# seconds recv waits for a result before checking that the workers are alive
+_POLL_INTERVAL = 1.0
+
+
+def _make_env() -> FlappyBirdEnv:
+    """Creates a headless environment."""
+    return FlappyBirdEnv(render_mode=None)
+
+
+def _store(frame: LazyObservation | np.ndarray, out: np.ndarray) -> None:
+    """Writes an observation into its row of the observation array."""
+    if isinstance(frame, LazyObservation):
+        frame.materialize(out)
+    else:
+        out[...] = frame  # binary observations are arrays already
+
+
+def _run_worker(
+    env_ids: list[int],
+    commands: Any,
+    results: Any,
+    obs: np.ndarray | tuple[str, tuple[int, ...]],
+    env_fn: Callable[[], FlappyBirdEnv],
+    max_episode_steps: int | None,
+    close_envs: bool,
+) -> None:
+    """Steps the environments of one worker until told to stop.
+
+    An error is put on the results queue as ("error", traceback) and ends the
+    worker.
+
+    Args:
+        env_ids: Ids of the worker's environments.
+        commands: Queue of ("reset", env id, seed) and ("step", env id, action)
+            commands, None to stop.
+        results: Queue the results are put on.
+        obs: Observation array, or the name and shape of its shared memory.
+        env_fn: Creates an environment.
+        max_episode_steps: Steps after which episodes are truncated.
+        close_envs: Close the environments when stopping. Threads must not,
+            since closing quits pygame for the whole process.
+    """
+    shm = None
+    if isinstance(obs, tuple):
+        shm = shared_memory.SharedMemory(name=obs[0])
+        obs = np.ndarray(obs[1], dtype=np.uint8, buffer=shm.buf)
+    envs: dict[int, FlappyBirdEnv] = {}
+    lengths = dict.fromkeys(env_ids, 0)
+    try:
+        for env_id in env_ids:
+            envs[env_id] = env_fn()
+        while (command := commands.get()) is not None:
+            kind, env_id, arg = command
+            env = envs[env_id]
+            if kind == "reset":
+                frame, info = env.reset(seed=arg)
+                _store(frame, obs[env_id])
+                lengths[env_id] = 0
+                results.put((env_id, 0.0, False, False, info))
+                continue
+            frame, reward, terminated, truncated, info = env.step(arg)
+            lengths[env_id] += 1
+            if max_episode_steps is not None:
+                truncated = truncated or lengths[env_id] >= max_episode_steps
+            if terminated or truncated:
+                info = {"final_score": info["score"], "length": lengths[env_id]}
+                frame, _ = env.reset()
+                lengths[env_id] = 0
+            _store(frame, obs[env_id])
+            results.put((env_id, float(reward), terminated, truncated, info))
+    except BaseException:  # noqa: BLE001 - re-raised in EnvPool.recv()
+        results.put(("error", traceback.format_exc()))
+    finally:
+        if close_envs:
+            for env in envs.values():
+                env.close()
+        if shm is not None:
+            del obs
+            shm.close()
+
+
+class EnvPool:
+    """Environments stepped asynchronously by worker threads or processes.
+
+    Attributes:
+        backend: "thread" or "process".
+        num_envs: Number of environments.
+        batch_size: Number of environments :meth:`recv` returns.
+        observations: (num_envs, *observation shape) array holding the latest
+            observation of every environment.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        batch_size: int | None = None,
+        num_workers: int | None = None,
+        backend: str = "thread",
+        env_fn: Callable[[], FlappyBirdEnv] = _make_env,
+        max_episode_steps: int | None = None,
+        observation_space: spaces.Box | None = None,
+    ) -> None:
+        """Starts the workers.
+
+        Thread workers never close their environments, since that quits
+        pygame for the whole process; shutting pygame down is left to the
+        caller.
+
+        Args:
+            num_envs: Number of environments.
+            batch_size: Environments returned per :meth:`recv`, all by default.
+            num_workers: Workers, one per environment by default; environment
+                ``i`` belongs to worker ``i % num_workers``.
+            backend: "thread" or "process".
+            env_fn: Creates an environment, must be picklable for processes.
+            max_episode_steps: Steps after which episodes are truncated.
+            observation_space: Observation space of the environments, probed
+                from a temporary environment by default.
+        """
+        if backend not in ("thread", "process"):
+            raise ValueError(f"unknown backend {backend!r}")
+        self.backend = backend
+        self.num_envs = num_envs
+        self.batch_size = batch_size or num_envs
+        num_workers = min(num_workers or num_envs, num_envs)
+        if observation_space is None:
+            # not closed, since closing an env quits pygame for the process
+            observation_space = env_fn().observation_space
+        shape = (num_envs, *observation_space.shape)
+
+        self._shm = None
+        if backend == "process":
+            ctx = mp.get_context("spawn")
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=int(np.prod(shape))
+            )
+            self.observations = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf)
+            obs_arg: Any = (self._shm.name, shape)
+            self._results = ctx.Queue()
+            self._commands = [ctx.Queue() for _ in range(num_workers)]
+            worker_cls: Any = ctx.Process
+        else:
+            self.observations = np.zeros(shape, dtype=np.uint8)
+            obs_arg = self.observations
+            self._results = queue.Queue()
+            self._commands = [queue.Queue() for _ in range(num_workers)]
+            worker_cls = threading.Thread
+
+        self._workers = [
+            worker_cls(
+                target=_run_worker,
+                args=(
+                    list(range(worker, num_envs, num_workers)),
+                    self._commands[worker],
+                    self._results,
+                    obs_arg,
+                    env_fn,
+                    max_episode_steps,
+                    backend == "process",
+                ),
+                daemon=True,
+            )
+            for worker in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._in_flight = np.zeros(num_envs, dtype=bool)
+
+    def _command(self, kind: str, env_id: int, arg: Any) -> None:
+        """Hands a command to the worker of an environment."""
+        if self._in_flight[env_id]:
+            raise RuntimeError(f"env {env_id} has not been received yet")
+        self._in_flight[env_id] = True
+        self._commands[env_id % len(self._commands)].put((kind, env_id, arg))
+
+    def async_reset(self, seeds: Sequence[int | None] | int | None = None) -> None:
+        """Starts resetting every environment.
+
+        Args:
+            seeds: One seed per environment, or a base seed from which
+                environment ``i`` gets ``seed + i``.
+        """
+        if seeds is None or isinstance(seeds, int):
+            base = seeds
+            seeds = [None if base is None else base + i for i in range(self.num_envs)]
+        for env_id, seed in enumerate(seeds):
+            self._command("reset", env_id, seed)
+
+    def reset(
+        self, seeds: Sequence[int | None] | int | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list, np.ndarray]:
+        """Resets every environment and receives the first batch."""
+        self.async_reset(seeds)
+        return self.recv()
+
+    def send(self, actions: Sequence[int] | np.ndarray, env_ids: Sequence[int]) -> None:
+        """Starts stepping some environments; returns without waiting.
+
+        Args:
+            actions: One action per environment in ``env_ids``.
+            env_ids: Environments to step, which must have been received.
+        """
+        for env_id, action in zip(env_ids, actions, strict=True):
+            self._command("step", int(env_id), int(action))
+
+    def recv(
+        self,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list, np.ndarray]:
+        """Waits for the first ``batch_size`` environments that finished.
+
+        Returns:
+            The observations, rewards, terminated and truncated flags, info
+            dicts and ids of the environments, in the order they finished.
+
+        Raises:
+            RuntimeError: If a worker failed or died.
+        """
+        batch: list[_Result] = [self._next_result() for _ in range(self.batch_size)]
+        env_ids = np.array([result[0] for result in batch])
+        self._in_flight[env_ids] = False
+        return (
+            self.observations[env_ids],
+            np.array([result[1] for result in batch], dtype=np.float32),
+            np.array([result[2] for result in batch]),
+            np.array([result[3] for result in batch]),
+            [result[4] for result in batch],
+            env_ids,
+        )
+
+    def _next_result(self) -> _Result:
+        """Waits for the next result, failing if a worker failed or died."""
+        while True:
+            try:
+                result = self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError("an EnvPool worker died") from None
+                continue
+            if result[0] == "error":
+                raise RuntimeError(f"an EnvPool worker failed:\n{result[1]}")
+            return result
+
+    def close(self) -> None:
+        """Stops the workers and releases the shared memory."""
+        for commands in self._commands:
+            commands.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._shm is not None:
+            del self.observations
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "EnvPool":
+        """Returns the pool for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Closes the pool."""
+        self.close()
@@ -0,0 +1,289 @@
+"""Parallel evaluation of exported policies over many seeded episodes.
+
+Seeds are split across a process pool. Every worker plays ``batch_size``
+episodes side by side and picks their actions with one batched forward pass
+of a :class:`~src.inference.NumpyPolicy`. Every environment plays with the
+same sprites, :data:`~src.utils.constants.EVAL_SPRITES` by default, since a
+pixel policy's score depends on them. Results are cached per episode under
+the hash of the policy file, the sprites, the seed and
+:data:`~src.flappy_env.ENV_VERSION`, so evaluating a policy again only plays
+the seeds it has not seen yet.
+
+Run with ``python src/main.py evaluate --policy dqn_policy.npz --episodes 200``.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any
+
+import numpy as np
+
+from src.flappy_env import ENV_VERSION, FlappyBirdEnv
+from src.inference import NumpyPolicy
+from src.observation import FrameStack, LazyObservation, materialize_batch, preprocess
+from src.utils.constants import EVAL_SPRITES
+
+CACHE_DIR = Path(".cache") / "evaluation"
+
+
+def file_hash(path: str | Path) -> str:
+    """Returns the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EvaluationCache:
+    """Per-episode results of one policy file, stored as JSON.
+
+    Attributes:
+        path: JSON file of the policy's results.
+    """
+
+    def __init__(self, policy_hash: str, cache_dir: str | Path = CACHE_DIR) -> None:
+        """Initialize the cache of a policy, loading earlier results."""
+        self.path = Path(cache_dir) / f"{policy_hash}.json"
+        self._results: dict[str, list[int]] = (
+            json.loads(self.path.read_text()) if self.path.exists() else {}
+        )
+
+    @staticmethod
+    def _key(seed: int, max_steps: int, sprites: tuple[int, int, int]) -> str:
+        """Returns the key of an episode."""
+        variant = "-".join(map(str, sprites))
+        return f"v{ENV_VERSION}:{variant}:{max_steps}:{seed}"
+
+    def get(
+        self, seed: int, max_steps: int, sprites: tuple[int, int, int]
+    ) -> list[int] | None:
+        """Returns the cached (score, length) of an episode, if any."""
+        return self._results.get(self._key(seed, max_steps, sprites))
+
+    def put(
+        self,
+        seed: int,
+        max_steps: int,
+        sprites: tuple[int, int, int],
+        score: int,
+        length: int,
+    ) -> None:
+        """Stores the result of an episode."""
+        self._results[self._key(seed, max_steps, sprites)] = [score, length]
+
+    def save(self) -> None:
+        """Atomically writes the results to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._results))
+        tmp.replace(self.path)
+
+
+class _Worker:
+    """Plays batches of episodes in one process."""
+
+    def __init__(
+        self, policy_path: str, batch_size: int, sprites: tuple[int, int, int]
+    ) -> None:
+        """Initialize the policy and the environments."""
+        self.policy = NumpyPolicy.load(policy_path)
+        self.envs = [FlappyBirdEnv(render_mode=None) for _ in range(batch_size)]
+        for env in self.envs:
+            env.config.images.load_variant(*sprites)
+        self.rgb = np.empty(
+            (batch_size, *self.envs[0].observation_space.shape), dtype=np.uint8
+        )
+        self.stack: FrameStack | None = None
+
+    def _inputs(
+        self, active: list[int], frames: list[LazyObservation], new: set[int]
+    ) -> np.ndarray:
+        """Returns the network inputs of the active episodes."""
+        rgb = materialize_batch([frames[i] for i in active], self.rgb[: len(active)])
+        if not self.policy.grayscale:
+            return rgb.transpose(0, 3, 1, 2)
+        gray = preprocess(rgb, self.policy.scale)
+        if self.stack is None:
+            self.stack = FrameStack(len(self.envs), self.policy.n_stack, gray.shape[1:])
+        started = [row for row, i in enumerate(active) if i in new]
+        running = [row for row, i in enumerate(active) if i not in new]
+        for row in started:
+            self.stack.reset(active[row], gray[row])
+        if running:
+            self.stack.push(gray[running], np.array(active)[running])
+        return self.stack.frames[active]
+
+    def run(self, seeds: list[int], max_steps: int) -> list[tuple[int, int, int]]:
+        """Plays one episode per seed, ``batch_size`` at a time.
+
+        Returns:
+            The (seed, score, length) of every episode.
+        """
+        pending = deque(seeds)
+        slots: list[list[int] | None] = [None] * len(self.envs)
+        frames: list[LazyObservation | None] = [None] * len(self.envs)
+        results = []
+        while pending or any(slot is not None for slot in slots):
+            new = set()
+            for i, slot in enumerate(slots):
+                if slot is None and pending:
+                    seed = pending.popleft()
+                    frames[i], _ = self.envs[i].reset(seed=seed)
+                    slots[i] = [seed, 0]
+                    new.add(i)
+            active = [i for i, slot in enumerate(slots) if slot is not None]
+            actions = self.policy.q_values(self._inputs(active, frames, new)).argmax(1)
+            for i, action in zip(active, actions, strict=True):
+                frames[i], _, done, _, info = self.envs[i].step(int(action))
+                slots[i][1] += 1
+                if done or slots[i][1] >= max_steps:
+                    results.append((slots[i][0], info["score"], slots[i][1]))
+                    slots[i] = None
+        return results
+
+
+_worker: _Worker | None = None
+
+
+def _init_worker(
+    policy_path: str, batch_size: int, sprites: tuple[int, int, int]
+) -> None:
+    """Creates the per-process worker."""
+    global _worker
+    _worker = _Worker(policy_path, batch_size, sprites)
+
+
+def _play_seeds(seeds: list[int], max_steps: int) -> list[tuple[int, int, int]]:
+    """Plays the episodes of some seeds with the process's worker."""
+    return _worker.run(seeds, max_steps)
+
+
+def summarize(
+    values: np.ndarray, confidence: float = 0.95, resamples: int = 2000
+) -> dict[str, Any]:
+    """Returns summary statistics with confidence intervals.
+
+    The interval of the mean uses the normal approximation, the one of the
+    median a percentile bootstrap with a fixed seed.
+
+    Args:
+        values: Per-episode values.
+        confidence: Confidence level of the intervals.
+        resamples: Number of bootstrap resamples.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    mean = values.mean()
+    std = values.std(ddof=1) if n > 1 else 0.0
+    tail = (1 - confidence) / 2
+    z = NormalDist().inv_cdf(1 - tail)
+    rng = np.random.default_rng(0)
+    medians = np.median(rng.choice(values, size=(resamples, n)), axis=1)
+    p5, p25, p50, p75, p95 = np.percentile(values, (5, 25, 50, 75, 95))
+    return {
+        "n": n,
+        "mean": mean,
+        "std": std,
+        "mean_ci": (mean - z * std / np.sqrt(n), mean + z * std / np.sqrt(n)),
+        "median": p50,
+        "median_ci": tuple(np.quantile(medians, (tail, 1 - tail))),
+        "p5": p5,
+        "p25": p25,
+        "p75": p75,
+        "p95": p95,
+        "min": values.min(),
+        "max": values.max(),
+    }
+
+
+def evaluate(
+    policy_path: str | Path,
+    episodes: int = 100,
+    first_seed: int = 0,
+    workers: int = 1,
+    batch_size: int = 8,
+    max_steps: int = 10_000,
+    cache_dir: str | Path | None = CACHE_DIR,
+    sprites: tuple[int, int, int] = EVAL_SPRITES,
+) -> dict[str, Any]:
+    """Evaluates an exported policy on seeds ``first_seed + range(episodes)``.
+
+    Args:
+        policy_path: Policy exported by :func:`src.inference.export_policy`.
+        episodes: Number of episodes, one per seed.
+        first_seed: Seed of the first episode.
+        workers: Number of worker processes.
+        batch_size: Episodes each worker plays side by side.
+        max_steps: Steps after which an episode is cut off.
+        cache_dir: Directory of the result cache, None to disable it.
+        sprites: Background, player and pipe sprites every episode is played
+            with, see :meth:`~src.utils.Images.load_variant`.
+
+    Returns:
+        The per-episode scores and lengths, their summaries, the sprites, and
+        how many episodes came from the cache.
+    """
+    seeds = list(range(first_seed, first_seed + episodes))
+    cache = EvaluationCache(file_hash(policy_path), cache_dir) if cache_dir else None
+    results = {}
+    if cache is not None:
+        for seed in seeds:
+            if (cached := cache.get(seed, max_steps, sprites)) is not None:
+                results[seed] = cached
+    missing = [seed for seed in seeds if seed not in results]
+
+    if missing:
+        chunks = [missing[i::workers] for i in range(workers) if missing[i::workers]]
+        with ProcessPoolExecutor(
+            max_workers=len(chunks),
+            initializer=_init_worker,
+            initargs=(str(policy_path), batch_size, sprites),
+        ) as pool:
+            for played in pool.map(_play_seeds, chunks, [max_steps] * len(chunks)):
+                for seed, score, length in played:
+                    results[seed] = [score, length]
+                    if cache is not None:
+                        cache.put(seed, max_steps, sprites, score, length)
+        if cache is not None:
+            cache.save()
+
+    scores = np.array([results[seed][0] for seed in seeds])
+    lengths = np.array([results[seed][1] for seed in seeds])
+    return {
+        "seeds": seeds,
+        "scores": scores,
+        "lengths": lengths,
+        "score": summarize(scores),
+        "length": summarize(lengths),
+        "sprites": sprites,
+        "cached": episodes - len(missing),
+    }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Formats the summaries of :func:`evaluate` as a small table."""
+    lines = [
+        (
+            f"{report['score']['n']} episodes ({report['cached']} cached), "
+            "sprites {}-{}-{}".format(*report["sprites"])
+        ),
+        (
+            f"{'':<8}{'mean':>9}{'95% CI':>18}{'median':>9}{'95% CI':>18}"
+            f"{'p5':>8}{'p25':>8}{'p75':>8}{'p95':>8}"
+        ),
+    ]
+    for name in ("score", "length"):
+        stats = report[name]
+        mean_ci = "{:.1f}..{:.1f}".format(*stats["mean_ci"])
+        median_ci = "{:.1f}..{:.1f}".format(*stats["median_ci"])
+        lines.append(
+            f"{name:<8}{stats['mean']:>9.1f}{mean_ci:>18}{stats['median']:>9.1f}"
+            f"{median_ci:>18}{stats['p5']:>8.1f}{stats['p25']:>8.1f}"
+            f"{stats['p75']:>8.1f}{stats['p95']:>8.1f}"
+        )
+    return "\n".join(lines)
@@ -1,13 +1,21 @@
-"""Flappy Bird game implementation."""
+"""Flappy Bird game implementation.
 
-import asyncio
+The game loop is paced by a :class:`~src.utils.FramePacer`: the game advances
+in fixed steps at ``config.fps`` while frames are drawn at the display rate,
+interpolated between the last two steps, and input is read once per frame.
+F3 shows the frame time statistics, which are also printed on quit.
+"""
+
+from collections.abc import Sequence
 import sys
 
 import pygame
-from pygame.locals import K_ESCAPE, K_SPACE, K_UP, KEYDOWN, QUIT
+from pygame.locals import K_ESCAPE, K_F3, K_SPACE, K_UP, KEYDOWN, QUIT
 
 from src.entities import (
     Background,
+    DrawCommand,
+    Entity,
     Floor,
     GameOver,
     Pipes,
@@ -16,7 +24,15 @@ from src.entities import (
     Score,
     WelcomeMessage,
 )
-from src.utils import GameConfig, Images, Sounds, Window
+from src.observation import Rasterizer
+from src.utils import (
+    FramePacer,
+    GameConfig,
+    Images,
+    Sounds,
+    Window,
+    interpolate_commands,
+)
 
 
 class Flappy:
@@ -38,6 +54,14 @@ class Flappy:
             images=images,
             sounds=Sounds(),
         )
+        self.pacer = FramePacer(sim_fps=self.config.fps)
+        self.painter = Rasterizer(window.width, window.height)
+        self.painter.surface = screen
+        # frame time overlay, toggled with F3
+        self.show_frame_stats = bool(self.config.debug)
+        self._previous: tuple[DrawCommand, ...] = ()
+        self._current: tuple[DrawCommand, ...] = ()
+        self._scene: Sequence[Entity] = ()
 
     async def start(self) -> None:
         """Starts the game loop."""
@@ -56,25 +80,21 @@ class Flappy:
     async def splash(self) -> None:
         """Shows welcome splash screen animation of flappy bird."""
         self.player.set_mode(PlayerMode.SHM)
+        scene = (self.background, self.floor, self.player, self.welcome_message)
+        self.begin_scene(scene)
 
-        while True:
-            for event in pygame.event.get():
-                self.check_quit_event(event)
-                if self.is_tap_event(event):
-                    return
-
-            self.background.render()
-            self.floor.render()
-            self.player.render()
-            self.welcome_message.render()
-
-            pygame.display.update()
-            await asyncio.sleep(0)
-            self.config.tick()
+        async for steps, alpha in self.pacer.run():
+            if self.poll_events():
+                return
+            for _ in range(steps):
+                self.player.update_image()
+                self.capture(scene)
+            self.draw(alpha)
 
     def check_quit_event(self, event: pygame.event.Event) -> None:
         """Check if the quit event is triggered."""
         if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+            print(self.pacer.summary())
             pygame.quit()
             sys.exit()
 
@@ -91,62 +111,87 @@ class Flappy:
         """Game loop."""
         self.score.reset()
         self.player.set_mode(PlayerMode.NORMAL)
+        scene = (self.background, self.floor, self.pipes, self.score, self.player)
+        self.begin_scene(scene)
+        flap = False
+
+        async for steps, alpha in self.pacer.run():
+            # a tap in a frame without steps flaps in the next step
+            flap = self.poll_events() or flap
+            for _ in range(steps):
+                if self.player.collided(self.pipes, self.floor):
+                    return
 
-        while True:
-            if self.player.collided(self.pipes, self.floor):
-                return
-
-            for _i, pipe in enumerate(self.pipes.upper):
-                if self.player.crossed(pipe):
-                    self.score.add()
+                for pipe in self.pipes.upper:
+                    if self.player.crossed(pipe):
+                        self.score.add()
 
-            for event in pygame.event.get():
-                self.check_quit_event(event)
-                if self.is_tap_event(event):
+                if flap:
                     self.player.flap()
+                    flap = False
 
-            self.pipes.tick()
-            self.player.tick()
-
-            self.background.render()
-            self.floor.render()
-            self.pipes.render()
-            self.score.render()
-            self.player.render()
-
-            pygame.display.update()
-            await asyncio.sleep(0)
-            self.config.tick()
+                self.pipes.tick()
+                self.player.tick()
+                self.player.update_image()
+                self.capture(scene)
+            self.draw(alpha)
 
     async def game_over(self) -> None:
         """Crashes the player down and shows gameover image."""
         self.player.set_mode(PlayerMode.CRASH)
         self.pipes.stop()
         self.floor.stop()
+        scene = (
+            self.background,
+            self.floor,
+            self.pipes,
+            self.score,
+            self.player,
+            self.game_over_message,
+        )
+        self.begin_scene(scene)
 
-        while True:
-            for event in pygame.event.get():
-                self.check_quit_event(event)
-                if (
-                    self.is_tap_event(event)
-                    and self.player.y + self.player.h >= self.floor.y - 1
-                ):
-                    return
-
-            self.pipes.tick()
-            self.player.tick()
-
-            self.background.render()
-            self.floor.render()
-            self.pipes.render()
-            self.score.render()
-            self.player.render()
-            self.game_over_message.render()
-
-            pygame.display.update()
-            await asyncio.sleep(0)
-            self.config.tick()
-
-            self.config.tick()
-            pygame.display.update()
-            await asyncio.sleep(0)
+        async for steps, alpha in self.pacer.run():
+            if self.poll_events() and self.player.y + self.player.h >= self.floor.y - 1:
+                return
+            for _ in range(steps):
+                self.pipes.tick()
+                self.player.tick()
+                self.player.update_image()
+                self.capture(scene)
+            self.draw(alpha)
+
+    def poll_events(self) -> bool:
+        """Samples the input once per frame; returns True if it had a tap."""
+        tapped = False
+        for event in pygame.event.get():
+            self.check_quit_event(event)
+            if event.type == KEYDOWN and event.key == K_F3:
+                self.show_frame_stats = not self.show_frame_stats
+            tapped = self.is_tap_event(event) or tapped
+        return tapped
+
+    def begin_scene(self, scene: Sequence[Entity]) -> None:
+        """Starts drawing a scene from the current state of its entities."""
+        self._scene = scene
+        self._current = self._previous = _scene_commands(scene)
+
+    def capture(self, scene: Sequence[Entity]) -> None:
+        """Records the state of the scene after a simulation step."""
+        self._previous, self._current = self._current, _scene_commands(scene)
+
+    def draw(self, alpha: float) -> None:
+        """Draws the scene interpolated between the last two steps."""
+        self.painter.draw(interpolate_commands(self._previous, self._current, alpha))
+        if self.config.debug:
+            # hitboxes at the simulated, not the interpolated positions
+            for entity in self._scene:
+                entity.render_debug()
+        if self.show_frame_stats:
+            self.pacer.render_overlay(self.config.screen)
+        pygame.display.update()
+
+
+def _scene_commands(scene: Sequence[Entity]) -> tuple[DrawCommand, ...]:
+    """Returns the draw commands of the entities of a scene, in order."""
+    return tuple(command for entity in scene for command in entity.draw_commands())
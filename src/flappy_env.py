@@ -1,7 +1,9 @@
 """Flappy Bird Gymnasium environment for reinforcement learning."""
 
+import os
+import random
 import sys
-from typing import ClassVar
+from typing import Any, ClassVar
 
 import gymnasium as gym
 from gymnasium import spaces
@@ -11,6 +13,7 @@ from pygame.locals import K_ESCAPE, K_SPACE, K_UP, KEYDOWN, QUIT
 
 from src.entities import (
     Background,
+    DrawCommand,
     Floor,
     GameOver,
     Pipes,
@@ -19,31 +22,76 @@ from src.entities import (
     Score,
     WelcomeMessage,
 )
-from src.utils import GameConfig, Images, Sounds, Window
+from src.observation import LazyObservation, OccupancyEncoder, Rasterizer
+from src.state import GameState, capture_state, restore_state
+from src.utils import GameConfig, Images, Sounds, Window, get_hit_mask_array
+
+# Bumped whenever a change alters the dynamics, so recordings and cached
+# results made against an older simulation can be told apart.
+# 2: unseeded resets draw their course seed from the env RNG, so the courses
+# that follow a seeded reset differ from version 1.
+ENV_VERSION = 2
+
+# occupancy planes of the "binary" observation mode
+BINARY_PLANES = ("bird", "pipe", "floor")
 
 
 class FlappyBirdEnv(gym.Env):
     """Custom Gym Environment for Flappy Bird."""
 
-    metadata: ClassVar[dict[str, list[str]]] = {"render.modes": ["human"]}
+    metadata: ClassVar[dict[str, Any]] = {"render_modes": ["human"], "render_fps": 30}
 
-    def __init__(self) -> None:
-        """Initialize the Flappy Bird environment."""
+    def __init__(
+        self,
+        render_mode: str | None = "human",
+        obs_mode: str = "rgb",
+        obs_scale: int = 8,
+    ) -> None:
+        """Initialize the Flappy Bird environment.
+
+        Args:
+            render_mode: "human" to show the game window, None for headless
+                simulation without a display or audio device.
+            obs_mode: "rgb" for lazily rendered frames, "binary" for
+                bit-packed occupancy planes of the BINARY_PLANES, see
+                :class:`~src.observation.OccupancyEncoder`.
+            obs_scale: Downscaling factor of the binary observations.
+        """
+        if obs_mode not in ("rgb", "binary"):
+            raise ValueError(f"unknown observation mode {obs_mode!r}")
         super().__init__()
+        self.render_mode = render_mode
+        self.rng = random.Random()
+        if render_mode is None:
+            # SDL picks its drivers on init, so this only takes effect if no
+            # visible window was opened in this process before
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 
         # Define action and observation space
         # Actions: 0 = no flap, 1 = flap
         self.action_space = spaces.Discrete(2)
 
-        # Observation space: Define as needed
-        self.observation_space = spaces.Box(
-            low=0, high=255, shape=(288, 512, 3), dtype=np.uint8
-        )
-
         pygame.init()
         pygame.display.set_caption("Flappy Bird")
         window = Window(288, 512)
-        screen = pygame.display.set_mode((window.width, window.height))
+
+        # Observation space: RGB frame as (height, width, channels), or packed
+        # occupancy planes as (planes, rows, bytes per row)
+        self.obs_mode = obs_mode
+        self.encoder = OccupancyEncoder(
+            window.width, window.height, obs_scale, len(BINARY_PLANES)
+        )
+        obs_shape = (
+            (window.height, window.width, 3)
+            if obs_mode == "rgb"
+            else self.encoder.shape
+        )
+        self.observation_space = spaces.Box(
+            low=0, high=255, shape=obs_shape, dtype=np.uint8
+        )
+        flags = pygame.SHOWN if render_mode == "human" else pygame.HIDDEN
+        screen = pygame.display.set_mode((window.width, window.height), flags)
         images = Images()
 
         self.config = GameConfig(
@@ -54,28 +102,61 @@ class FlappyBirdEnv(gym.Env):
             images=images,
             sounds=Sounds(),
         )
+        self.rasterizer = Rasterizer(window.width, window.height)
+
+    def reset(
+        self, *, seed: int | None = None, options: dict[str, Any] | None = None
+    ) -> tuple[LazyObservation | np.ndarray, dict[str, Any]]:
+        """Reset the environment state.
+
+        Args:
+            seed: Seed for the pipe course. Episodes reset with the same seed
+                and fed the same actions play out identically. Without a seed,
+                the course seed is drawn from :attr:`rng`.
+            options: Optional ``"course"``, a :class:`~src.course.Course` to
+                fly instead of the one of the seed, e.g. one course shared by
+                all environments of a vector env.
+
+        Returns:
+            The first observation and the info dict.
+        """
+        super().reset(seed=seed)
+        if seed is not None:
+            self.rng.seed(seed)
 
-    def reset(self) -> np.ndarray:
-        """Reset the environment state."""
         self.background = Background(self.config)
         self.floor = Floor(self.config)
         self.player = Player(self.config)
         self.welcome_message = WelcomeMessage(self.config)
         self.game_over_message = GameOver(self.config)
-        self.pipes = Pipes(self.config)
+        course_seed = seed if seed is not None else self.rng.getrandbits(64)
+        course = (options or {}).get("course")
+        if getattr(self, "pipes", None) is None:
+            self.pipes = Pipes(self.config, course_seed, course)
+        else:
+            self.pipes.reset(course_seed, course)  # recycles the pipes
         self.score = Score(self.config)
 
         self.score.reset()
         self.player.set_mode(PlayerMode.NORMAL)
         self.done = False
-        return self._get_observation()
+        return self._get_observation(), self._get_info()
 
-    def step(self, action: int) -> tuple:
-        """Take a step in the environment."""
+    def step(
+        self, action: int
+    ) -> tuple[LazyObservation | np.ndarray, int, bool, bool, dict]:
+        """Take a step in the environment.
+
+        The returned observation is a :class:`LazyObservation`; the frame is
+        only rasterized when it is converted to an array. In the binary mode
+        it is an array of packed occupancy planes.
+
+        Returns:
+            The observation, reward, terminated and truncated flags, and info.
+        """
         if action == 1:
             self.player.flap()
 
-        pygame.time.wait(25)
         self.background.tick()
         self.floor.tick()
         self.pipes.tick()
@@ -83,16 +164,28 @@ class FlappyBirdEnv(gym.Env):
         self.player.tick()
 
         obs = self._get_observation()
-        reward = self._calculate_reward()
         self.done = self.player.collided(self.pipes, self.floor)
-        if self.done:
-            self.game_over()
+        reward = self._calculate_reward()
 
-        for _i, pipe in enumerate(self.pipes.upper):
+        for pipe in self.pipes.upper:
             if self.player.crossed(pipe):
                 self.score.add()
 
-        return obs, reward, self.done, {}
+        return obs, reward, self.done, False, self._get_info()
+
+    def clone_state(self) -> GameState:
+        """Returns a snapshot of the simulation to branch from later.
+
+        The environment must have been reset at least once.
+        """
+        return capture_state(self)
+
+    def restore_state(self, state: GameState) -> None:
+        """Puts the simulation back into a state from :meth:`clone_state`.
+
+        Stepping afterwards plays out exactly as it did after the snapshot.
+        """
+        restore_state(self, state)
 
     def render(self, mode: str = "human") -> bool:
         """Render the environment.
@@ -103,13 +196,7 @@ class FlappyBirdEnv(gym.Env):
         Returns:
             bool: True if the environment is still running, False if it is closed.
         """
-        self.config.screen.blit(self.config.images.background, (0, 0))
-
-        self.floor.render()
-        self.pipes.render()
-        self.player.render()
-        self.score.render()
-        pygame.display.update()
+        self.draw_frame()
 
         # Event handling for human play
         for event in pygame.event.get():
@@ -117,23 +204,78 @@ class FlappyBirdEnv(gym.Env):
                 self.close()
                 return False
             if self._is_tap_event(event):
-                self.step(1)
+                self._play_step(1)
 
-        self.step(0)
+        self._play_step(0)
         return True
 
+    def draw_commands(self) -> tuple[DrawCommand, ...]:
+        """Returns the draw commands of the current frame.
+
+        The commands only reference immutable sprites and coordinates, so they
+        are a snapshot of the frame that another thread can draw later.
+        """
+        return (
+            *self.background.draw_commands(),
+            *self.floor.draw_commands(),
+            *self.pipes.draw_commands(),
+            *self.player.draw_commands(),
+            *self.score.draw_commands(),
+        )
+
+    def draw_frame(self) -> None:
+        """Draw the current frame to the window without stepping the game."""
+        self.config.screen.blit(self.config.images.background, (0, 0))
+
+        self.floor.render()
+        self.pipes.render()
+        self.player.render()
+        self.score.render()
+        pygame.display.update()
+
     def close(self) -> None:
         """Close the environment."""
         pygame.quit()
 
-    def _get_observation(self) -> np.ndarray:
-        """Capture the game screen as the observation."""
-        return pygame.surfarray.array3d(pygame.display.get_surface()).transpose(1, 0, 2)
+    def _play_step(self, action: int) -> None:
+        """Take a human-paced step, showing the game over screen on a crash."""
+        pygame.time.wait(25)
+        self.step(action)
+        if self.done:
+            self.game_over()
+
+    def _get_observation(self) -> LazyObservation | np.ndarray:
+        """Capture the current game state as a lazily rendered observation.
+
+        In the binary mode the observation is the packed occupancy of the
+        entities' hit masks instead, which needs no rendering at all.
+        """
+        if self.obs_mode == "binary":
+            return self._get_binary_observation()
+        return LazyObservation(self.rasterizer, self.draw_commands())
+
+    def _get_binary_observation(self) -> np.ndarray:
+        """Returns the packed occupancy planes of bird, pipes and floor."""
+        bird, pipe, floor = range(len(BINARY_PLANES))
+        player = self.player
+        sprites = [
+            (bird, get_hit_mask_array(player.image), player.x, player.y),
+            (floor, get_hit_mask_array(self.floor.image), self.floor.x, self.floor.y),
+        ]
+        sprites += [
+            (pipe, get_hit_mask_array(p.image), p.x, p.y)
+            for p in (*self.pipes.upper, *self.pipes.lower)
+        ]
+        return self.encoder.encode(sprites)
+
+    def _get_info(self) -> dict[str, Any]:
+        """Returns the info dict reported by reset and step."""
+        return {"score": self.score.score}
 
     def _calculate_reward(self) -> int:
         """Calculate the reward for the current step."""
         reward = 1
-        if self.player.collided(self.pipes, self.floor):
+        if self.done:
             reward = -100
         return reward
 
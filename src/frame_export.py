@@ -0,0 +1,265 @@
+"""Headless export of episodes as frame sequences or compressed archives.
+
+Episodes are simulated in a hidden environment, either live from a policy or
+re-simulated from a recording (see :mod:`src.recording`). Frames are
+rasterized and written in fixed-size chunks, so memory stays flat however long
+the episode is. Whole recordings can be exported across a process pool.
+
+Run with ``python src/frame_export.py recording.bin out/ --workers 4``.
+"""
+
+import argparse
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import zipfile
+
+import numpy as np
+import pygame
+
+from src.flappy_env import FlappyBirdEnv
+from src.observation import LazyObservation, materialize_batch
+from src.recording import Replayer, read_recording
+
+Policy = Callable[[LazyObservation], int]
+
+FORMATS = ("npz", "png")
+
+
+class NpzChunkWriter:
+    """Streams frame chunks into a compressed ``.npz`` archive.
+
+    Every chunk becomes its own ``frames_XXXXX`` member, so the archive is
+    written incrementally and can be read back chunk by chunk with np.load.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the writer for the archive at ``path``."""
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._chunks = 0
+
+    def write(self, frames: np.ndarray) -> None:
+        """Appends a chunk of frames to the archive."""
+        self._write_array(f"frames_{self._chunks:05d}", frames)
+        self._chunks += 1
+
+    def close(self, **arrays: np.ndarray) -> None:
+        """Writes the extra arrays and closes the archive."""
+        for name, array in arrays.items():
+            self._write_array(name, array)
+        self._zip.close()
+
+    def _write_array(self, name: str, array: np.ndarray) -> None:
+        """Writes one array as an .npy member of the archive."""
+        with self._zip.open(f"{name}.npy", "w", force_zip64=True) as member:
+            np.lib.format.write_array(member, array, allow_pickle=False)
+
+
+class PngSequenceWriter:
+    """Writes frames as a numbered sequence of PNG images."""
+
+    def __init__(self, directory: Path) -> None:
+        """Initialize the writer for the images in ``directory``."""
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._frames = 0
+
+    def write(self, frames: np.ndarray) -> None:
+        """Writes a chunk of frames as PNG images."""
+        for frame in frames:
+            surface = pygame.surfarray.make_surface(frame.swapaxes(0, 1))
+            pygame.image.save(surface, self.directory / f"{self._frames:06d}.png")
+            self._frames += 1
+
+    def close(self, **arrays: np.ndarray) -> None:
+        """Writes the extra arrays next to the images."""
+        if arrays:
+            np.savez(self.directory / "episode.npz", **arrays)
+
+
+def _make_writer(path: Path, fmt: str) -> NpzChunkWriter | PngSequenceWriter:
+    """Returns the writer for a format."""
+    if fmt == "npz":
+        return NpzChunkWriter(path)
+    if fmt == "png":
+        return PngSequenceWriter(path)
+    raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+def _play(
+    env: FlappyBirdEnv, seed: int | None, actions: Iterable[int] | Policy
+) -> Iterator[tuple[LazyObservation, int, int]]:
+    """Plays an episode, yielding each observation with the action and reward.
+
+    The first observation comes from reset and carries action and reward 0.
+    """
+    obs, _ = env.reset(seed=seed)
+    yield obs, 0, 0
+    steps = None if callable(actions) else iter(actions)
+    while not env.done:
+        action = actions(obs) if steps is None else next(steps, None)
+        if action is None:
+            return
+        obs, reward, *_ = env.step(action)
+        yield obs, int(action), reward
+
+
+def export_frames(
+    env: FlappyBirdEnv,
+    path: str | Path,
+    actions: Iterable[int] | Policy,
+    seed: int | None = None,
+    fmt: str = "npz",
+    chunk_size: int = 256,
+    max_steps: int = 100_000,
+) -> int:
+    """Exports the frames of one episode.
+
+    Args:
+        env: Environment to simulate in, typically created with
+            ``render_mode=None``.
+        path: Archive path for "npz", output directory for "png".
+        actions: Recorded actions to replay, or a policy mapping lazy
+            observations to actions.
+        seed: Seed to reset the environment with.
+        fmt: Output format, one of FORMATS.
+        chunk_size: Number of frames rasterized and written at once.
+        max_steps: Upper bound on the number of exported frames.
+
+    Returns:
+        The number of frames written.
+    """
+    writer = _make_writer(Path(path), fmt)
+    buffer = np.empty((chunk_size, *env.observation_space.shape), dtype=np.uint8)
+    pending: list[LazyObservation] = []
+    taken, rewards = [], []
+    for obs, action, reward in _play(env, seed, actions):
+        pending.append(obs)
+        taken.append(action)
+        rewards.append(reward)
+        if len(pending) == chunk_size:
+            writer.write(materialize_batch(pending, buffer))
+            pending.clear()
+        if len(taken) >= max_steps:
+            break
+    if pending:
+        writer.write(materialize_batch(pending, buffer[: len(pending)]))
+    writer.close(
+        actions=np.asarray(taken, dtype=np.uint8),
+        rewards=np.asarray(rewards, dtype=np.int32),
+    )
+    return len(taken)
+
+
+def export_episode(
+    policy: Policy, path: str | Path, seed: int | None = None, **kwargs: object
+) -> int:
+    """Plays a policy live in a headless environment and exports the frames.
+
+    Args:
+        policy: Function mapping lazy observations to actions.
+        path: Output path, see :func:`export_frames`.
+        seed: Seed to reset the environment with.
+        **kwargs: Forwarded to :func:`export_frames`.
+
+    Returns:
+        The number of frames written.
+    """
+    env = FlappyBirdEnv(render_mode=None)
+    try:
+        return export_frames(env, path, policy, seed, **kwargs)
+    finally:
+        env.close()
+
+
+_replayer: Replayer | None = None
+
+
+def _init_worker(recording: str) -> None:
+    """Creates the per-process replayer of a worker."""
+    global _replayer
+    _replayer = Replayer(recording)
+
+
+def _export_recorded(index: int, path: Path, fmt: str, chunk_size: int) -> int:
+    """Exports one recorded episode with the worker's replayer."""
+    episode = _replayer.episodes[index]
+    return export_frames(
+        _replayer.env, path, episode.actions, episode.seed, fmt, chunk_size
+    )
+
+
+def export_recording(
+    recording: str | Path,
+    out_dir: str | Path,
+    fmt: str = "npz",
+    chunk_size: int = 256,
+    workers: int = 1,
+    episodes: Iterable[int] | None = None,
+) -> list[Path]:
+    """Exports recorded episodes, one archive or directory per episode.
+
+    Args:
+        recording: Path of the recording file.
+        out_dir: Directory the exports are written to.
+        fmt: Output format, one of FORMATS.
+        chunk_size: Number of frames rasterized and written at once.
+        workers: Number of worker processes.
+        episodes: Indices of the episodes to export, all by default.
+
+    Returns:
+        The paths of the exports.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if episodes is None:
+        episodes = range(len(read_recording(recording)[1]))
+    episodes = list(episodes)
+    suffix = ".npz" if fmt == "npz" else ""
+    paths = [out_dir / f"episode_{index:05d}{suffix}" for index in episodes]
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(str(recording),)
+    ) as pool:
+        list(
+            pool.map(
+                _export_recorded,
+                episodes,
+                paths,
+                [fmt] * len(paths),
+                [chunk_size] * len(paths),
+            )
+        )
+    return paths
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Export recorded episode frames")
+    parser.add_argument("recording", help="Path of the recording file.")
+    parser.add_argument("out_dir", help="Directory to write the exports to.")
+    parser.add_argument("--format", choices=FORMATS, default="npz")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--episodes", type=int, nargs="*", help="Episode indices, all by default."
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Exports the episodes of a recording."""
+    args = parse_args()
+    paths = export_recording(
+        args.recording,
+        args.out_dir,
+        args.format,
+        args.chunk_size,
+        args.workers,
+        args.episodes,
+    )
+    print(f"exported {len(paths)} episodes to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Lean CPU inference for trained DQN policies.
+
+Policies are exported once to a ``.npz`` archive of float32 weights and then
+evaluated with a pure-NumPy forward pass of :class:`src.model.DQN`, so playing
+needs neither PyTorch nor Stable-Baselines3. Both native checkpoints written
+by :func:`src.train.save_checkpoint` and Stable-Baselines3 ``DQN`` zip files
+with a ``CnnPolicy`` can be exported; the latter use the same layer layout
+under other names and see unstacked RGB frames.
+
+Export with ``python src/inference.py dqn_native.pt dqn_policy.npz``.
+"""
+
+import argparse
+import json
+from pathlib import Path
+import zipfile
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.observation import FrameStack, LazyObservation, preprocess
+
+CONV_LAYERS = (("features.0", 4), ("features.2", 2), ("features.4", 1))
+FC_LAYERS = ("fc.0", "fc.2")
+
+# Stable-Baselines3 CnnPolicy layer names of the DQN layers
+SB3_LAYERS = {
+    "q_net.features_extractor.cnn.0": "features.0",
+    "q_net.features_extractor.cnn.2": "features.2",
+    "q_net.features_extractor.cnn.4": "features.4",
+    "q_net.features_extractor.linear.0": "fc.0",
+    "q_net.q_net.0": "fc.2",
+}
+
+
+def _is_sb3_model(path: Path) -> bool:
+    """Returns True for SB3 model files, which torch.save archives are not."""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as archive:
+        return "policy.pth" in archive.namelist()
+
+
+def _load_weights(checkpoint: Path) -> tuple[dict[str, np.ndarray], dict]:
+    """Reads the weights and input format of a native or SB3 checkpoint.
+
+    Native checkpoints are written with torch.save, SB3 models are zip files
+    holding the policy weights in ``policy.pth``.
+    """
+    import torch  # only needed for exporting
+
+    if _is_sb3_model(checkpoint):
+        with zipfile.ZipFile(checkpoint) as archive, archive.open("policy.pth") as f:
+            state_dict = torch.load(f, map_location="cpu")
+        weights = {
+            f"{SB3_LAYERS[prefix]}.{param}": tensor.numpy()
+            for key, tensor in state_dict.items()
+            for prefix, _, param in [key.rpartition(".")]
+            if prefix in SB3_LAYERS
+        }
+        return weights, {"scale": 1, "n_stack": 1, "grayscale": False}
+
+    saved = torch.load(checkpoint, map_location="cpu")
+    weights = {key: tensor.numpy() for key, tensor in saved["state_dict"].items()}
+    config = saved["config"]
+    meta = {
+        "scale": config["scale"],
+        "n_stack": config["n_stack"],
+        "grayscale": True,
+    }
+    return weights, meta
+
+
+def export_policy(checkpoint: str | Path, path: str | Path) -> Path:
+    """Exports a trained policy to a NumPy weight archive.
+
+    Args:
+        checkpoint: Native checkpoint or Stable-Baselines3 DQN zip file.
+        path: Path of the ``.npz`` archive to write.
+
+    Returns:
+        The path of the archive.
+    """
+    weights, meta = _load_weights(Path(checkpoint))
+    path = Path(path)
+    np.savez(
+        path,
+        meta=np.array(json.dumps(meta)),
+        **{key: value.astype(np.float32) for key, value in weights.items()},
+    )
+    return path
+
+
+class NumpyPolicy:
+    """Greedy policy evaluating an exported DQN with NumPy.
+
+    Weights are laid out at load time for channels-last im2col convolutions,
+    so a forward pass is three matrix products for the convolutions and two
+    for the head.
+
+    Attributes:
+        scale: Downscaling factor of the frames, see :func:`preprocess`.
+        n_stack: Number of stacked frames per observation.
+        grayscale: True if frames are preprocessed to grayscale stacks,
+            False if the network sees raw RGB frames.
+    """
+
+    def __init__(self, weights: dict[str, np.ndarray], meta: dict) -> None:
+        """Initialize the policy from exported weights and input format."""
+        self.scale = meta["scale"]
+        self.n_stack = meta["n_stack"]
+        self.grayscale = meta["grayscale"]
+        self._convs = []
+        for name, stride in CONV_LAYERS:
+            kernel = weights[f"{name}.weight"]
+            size = kernel.shape[-1]
+            matrix = np.ascontiguousarray(kernel.reshape(len(kernel), -1).T)
+            self._convs.append((matrix, weights[f"{name}.bias"], size, stride))
+        self._fc = [
+            [weights[f"{name}.weight"].T.copy(), weights[f"{name}.bias"]]
+            for name in FC_LAYERS
+        ]
+        self._stack: FrameStack | None = None
+        self._features_permuted = False
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NumpyPolicy":
+        """Loads a policy exported by :func:`export_policy`."""
+        with np.load(path) as archive:
+            meta = json.loads(str(archive["meta"]))
+            weights = {key: archive[key] for key in archive.files if key != "meta"}
+        return cls(weights, meta)
+
+    def q_values(self, obs: np.ndarray) -> np.ndarray:
+        """Returns the Q-values of a batch of channels-first uint8 observations."""
+        x = obs.transpose(0, 2, 3, 1).astype(np.float32)
+        x *= 1 / 255
+        for matrix, bias, size, stride in self._convs:
+            windows = sliding_window_view(x, (size, size), axis=(1, 2))
+            windows = windows[:, ::stride, ::stride]
+            n, height, width = windows.shape[:3]
+            x = windows.reshape(n * height * width, -1) @ matrix
+            x += bias
+            np.maximum(x, 0, out=x)
+            x = x.reshape(n, height, width, -1)
+        if not self._features_permuted:
+            self._permute_features(x.shape[1:])
+        (w1, b1), (w2, b2) = self._fc
+        x = x.reshape(len(x), -1) @ w1
+        x += b1
+        np.maximum(x, 0, out=x)
+        return x @ w2 + b2
+
+    def _permute_features(self, shape: tuple[int, int, int]) -> None:
+        """Reorders the first FC layer's inputs from channels-first to last."""
+        height, width, channels = shape
+        w1 = self._fc[0][0]
+        self._fc[0][0] = np.ascontiguousarray(
+            w1.reshape(channels, height, width, -1)
+            .transpose(1, 2, 0, 3)
+            .reshape(w1.shape)
+        )
+        self._features_permuted = True
+
+    def reset(self) -> None:
+        """Starts a new episode, clearing the frame stack."""
+        self._stack = None
+
+    def observe(self, frame: LazyObservation | np.ndarray) -> np.ndarray:
+        """Turns an env frame into the network input of a single observation."""
+        frame = np.asarray(frame)
+        if not self.grayscale:
+            return frame.transpose(2, 0, 1)[None]
+        gray = preprocess(frame[None], self.scale)
+        if self._stack is None:
+            self._stack = FrameStack(1, self.n_stack, gray.shape[1:])
+            self._stack.reset(0, gray[0])
+        else:
+            self._stack.push(gray)
+        return self._stack.frames
+
+    def act(self, frame: LazyObservation | np.ndarray) -> int:
+        """Returns the greedy action for the next frame of the episode."""
+        return int(self.q_values(self.observe(frame))[0].argmax())
+
+
+def latency_percentiles(latencies: list[float]) -> dict[str, float]:
+    """Returns the p50, p90, p99 and max of decision latencies."""
+    values = np.asarray(latencies)
+    p50, p90, p99 = np.percentile(values, (50, 90, 99))
+    return {"p50": p50, "p90": p90, "p99": p99, "max": values.max()}
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Export a DQN policy for NumPy")
+    parser.add_argument("checkpoint", help="Native checkpoint or SB3 DQN zip.")
+    parser.add_argument("out", help="Path of the .npz archive to write.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Exports a checkpoint."""
+    args = parse_args()
+    print(f"exported to {export_policy(args.checkpoint, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,36 @@ It contains the entry point of the program, which initializes and starts the Fla
 """
 
 import argparse
+import os
+import time
+
+import pygame
+from pygame.locals import K_ESCAPE, KEYDOWN, QUIT
 
 from src.flappy_env import (
     FlappyBirdEnv,  # Assuming you have this Gym environment defined
 )
 
 
-def main(mode: str) -> None:
+def main(args: argparse.Namespace) -> None:
     """Entry point of the program."""
-    if mode == "human":
+    if args.mode == "human":
         human_mode()
 
-    elif mode == "agent" or mode == "agent_training":
-        pass
+    elif args.mode == "agent":
+        agent_mode(args)
+
+    elif args.mode == "agent_training":
+        agent_training_mode(args)
+
+    elif args.mode == "evaluate":
+        evaluate_mode(args)
+
+    elif args.mode == "neuroevolution":
+        neuroevolution_mode(args)
+
+    elif args.mode == "watch":
+        watch_mode(args)
 
 
 def human_mode() -> None:
@@ -33,23 +50,232 @@ def human_mode() -> None:
     env.close()
 
 
+def agent_mode(args: argparse.Namespace) -> None:
+    """Lets an exported policy or the planner play and reports its latencies."""
+    from src.inference import NumpyPolicy, latency_percentiles
+
+    env = FlappyBirdEnv(render_mode=None if args.headless else "human")
+    if args.policy == "planner":
+        from src.planner import Planner
+
+        policy = Planner(env)
+    else:
+        policy = NumpyPolicy.load(args.policy)
+    obs, _ = env.reset(seed=args.seed)
+    latencies = []
+    episodes = 0
+
+    running = True
+    while running:
+        start = time.perf_counter()
+        action = policy.act(obs)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        obs, _, done, _, info = env.step(action)
+
+        if not args.headless:
+            env.draw_frame()
+            env.config.tick()
+            for event in pygame.event.get():
+                if event.type == QUIT or (
+                    event.type == KEYDOWN and event.key == K_ESCAPE
+                ):
+                    running = False
+        if done:
+            episodes += 1
+            print(f"episode {episodes}: score {info['score']}")
+            if episodes == args.episodes:
+                break
+            obs, _ = env.reset()
+            policy.reset()
+    env.close()
+
+    stats = latency_percentiles(latencies)
+    print(
+        f"{len(latencies)} decisions, latency ms: "
+        + ", ".join(f"{name} {value:.2f}" for name, value in stats.items())
+    )
+
+
+def watch_mode(args: argparse.Namespace) -> None:
+    """Shows a policy playing, simulated on its own thread at a playback speed."""
+    from src.inference import NumpyPolicy
+    from src.watch import Watcher
+
+    env = FlappyBirdEnv()
+    if args.policy == "planner":
+        from src.planner import Planner
+
+        policy = Planner(env)
+    else:
+        policy = NumpyPolicy.load(args.policy)
+    watcher = Watcher(
+        env,
+        policy,
+        speed=args.speed,
+        display_fps=args.display_fps,
+        episodes=args.episodes,
+        seed=args.seed,
+    )
+    watcher.run()
+    env.close()
+    stats = watcher.stats
+    print(
+        f"{stats['simulated']} frames simulated, {stats['displayed']} displayed, "
+        f"{stats['dropped']} dropped"
+    )
+
+
+def agent_training_mode(args: argparse.Namespace) -> None:
+    """Trains a DQN with local actor processes and saves the checkpoint."""
+    # imported here so the other modes do not pay for torch
+    from src.actor_learner import ActorLearner, ActorLearnerConfig
+    from src.train import save_checkpoint
+
+    config = ActorLearnerConfig(
+        num_actors=args.num_actors, total_steps=args.steps, seed=args.seed
+    )
+    learner = ActorLearner(config)
+    stats = learner.train()
+    save_checkpoint(args.checkpoint, learner.net, config)
+    print(
+        f"{stats.steps} steps, {stats.updates} updates in {stats.elapsed:.0f}s: "
+        f"{stats.steps_per_s:.0f} steps/s, {stats.updates_per_s:.1f} updates/s"
+    )
+
+
+def evaluate_mode(args: argparse.Namespace) -> None:
+    """Evaluates an exported policy over many seeds and prints the statistics."""
+    from src.evaluation import evaluate, format_report
+
+    report = evaluate(
+        args.policy,
+        episodes=args.episodes or 100,
+        first_seed=args.seed or 0,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    print(format_report(report))
+
+
+def neuroevolution_mode(args: argparse.Namespace) -> None:
+    """Evolves an MLP policy on feature observations and saves the best one."""
+    from src.neuroevolution import NeuroConfig, NeuroTrainer
+
+    config = NeuroConfig(
+        method=args.method,
+        population_size=args.population_size,
+        generations=args.generations,
+        target_score=args.target_score,
+        workers=args.workers,
+        seed=args.seed,
+    )
+    trainer = NeuroTrainer(config)
+    stats = trainer.train()
+    trainer.save(args.out)
+    if stats.time_to_target is None:
+        print(
+            f"target score {config.target_score} not reached in "
+            f"{stats.generations} generations ({stats.elapsed:.1f}s), "
+            f"best {stats.best_score:.1f}"
+        )
+    else:
+        print(
+            f"target score {config.target_score} reached after "
+            f"{stats.generations} generations in {stats.time_to_target:.1f}s"
+        )
+
+
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Flappy Bird Reinforcement Learning")
     parser.add_argument(
         "mode",
-        choices=["human", "agent", "agent_training"],
+        choices=[
+            "human",
+            "agent",
+            "watch",
+            "agent_training",
+            "evaluate",
+            "neuroevolution",
+        ],
         help="Mode to run the program in.\n"
         "\t'human' for human play,\n"
         "\t'agent' for agent play,\n"
-        "\t'agent_training' for training the agent.",
+        "\t'watch' for watching the agent with a separate render thread,\n"
+        "\t'agent_training' for training the agent,\n"
+        "\t'evaluate' for evaluating the agent over many seeds,\n"
+        "\t'neuroevolution' for evolving an MLP policy on features.",
+    )
+    parser.add_argument(
+        "--num-actors",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) - 1),
+        help="Actor processes for agent_training, one per spare core by default.",
+    )
+    parser.add_argument(
+        "--steps", type=int, default=1_000_000, help="Transitions to train for."
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--checkpoint", default="dqn_native.pt", help="Path of the policy checkpoint."
+    )
+    parser.add_argument(
+        "--policy",
+        default="dqn_policy.npz",
+        help=(
+            "Policy exported with src/inference.py, for agent and evaluate, "
+            "or 'planner' for the lookahead planner in agent and watch mode."
+        ),
+    )
+    parser.add_argument(
+        "--episodes",
+        type=int,
+        default=0,
+        help="Episodes to play, 0 for no limit in agent mode and 100 in evaluate.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for evaluate and neuroevolution.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Episodes each evaluate worker plays with batched inference.",
+    )
+    parser.add_argument(
+        "--method",
+        choices=["cem", "es"],
+        default="cem",
+        help="Search method of neuroevolution.",
+    )
+    parser.add_argument("--population-size", type=int, default=256)
+    parser.add_argument("--generations", type=int, default=100)
+    parser.add_argument(
+        "--target-score",
+        type=float,
+        default=50.0,
+        help="Mean score at which neuroevolution stops.",
+    )
+    parser.add_argument(
+        "--out", default="mlp_policy.npz", help="Output of neuroevolution."
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Playback speed of watch mode as a multiple of 30 fps, 0 for max.",
+    )
+    parser.add_argument(
+        "--display-fps", type=int, default=60, help="Redraw rate of watch mode."
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="Play without a window or pacing."
     )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
-    args = parse_args()
-    if args.mode == "human":
-        main(args.mode)
-    else:
-        main(args.mode)
+    main(parse_args())
@@ -48,7 +48,7 @@ class DQN(nn.Module):
             The Q-values for each action.
         """
         x = self.features(x)
-        x = x.view(x.size(0), -1)
+        x = x.reshape(x.size(0), -1)
         x = self.fc(x)
         return x
 
@@ -0,0 +1,228 @@
+"""Neuroevolution of small MLP policies on feature observations.
+
+Instead of learning from pixels, a population of tiny MLPs maps the features
+of :meth:`src.population.Population.observe` to flap decisions and is
+improved by the cross-entropy method (CEM) or by evolution strategies (ES).
+Fitness evaluation is spread over a process pool: every worker flies its share
+of the candidates as one :class:`~src.population.Population`, with one bird
+per candidate and one batched forward pass of all their MLPs per step. All
+candidates of a generation fly the same seeded courses, so their fitness
+differences come from the policies and not from the courses (common random
+numbers).
+
+Training stops once the best candidate reaches ``target_score`` on average
+and reports the wall-clock time it took. Run with
+``python src/main.py neuroevolution --target-score 50``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+
+import numpy as np
+
+from src.population import NUM_FEATURES, Population
+
+
+@dataclass
+class NeuroConfig:
+    """Hyperparameters of the neuroevolution trainer."""
+
+    method: str = "cem"
+    population_size: int = 256
+    hidden: int = 16
+    generations: int = 100
+    episodes: int = 3
+    max_steps: int = 5_000
+    target_score: float = 50.0
+    elite_fraction: float = 0.1
+    init_std: float = 1.0
+    min_std: float = 0.02
+    learning_rate: float = 0.1
+    workers: int = 1
+    seed: int | None = None
+
+
+@dataclass
+class NeuroStats:
+    """Progress of a neuroevolution run."""
+
+    generations: int = 0
+    elapsed: float = 0.0
+    best_score: float = 0.0
+    time_to_target: float | None = None
+    # (elapsed seconds, mean score, best score) of every generation
+    history: list[tuple[float, float, float]] = field(default_factory=list)
+
+
+def num_params(hidden: int) -> int:
+    """Returns the number of parameters of an MLP with one hidden layer."""
+    return NUM_FEATURES * hidden + hidden + hidden + 1
+
+
+def mlp_actions(params: np.ndarray, features: np.ndarray, hidden: int) -> np.ndarray:
+    """Returns the actions of many MLPs, each on its own observation.
+
+    Args:
+        params: (k, num_params) flat parameters of k MLPs.
+        features: (k, NUM_FEATURES) observations, one per MLP.
+        hidden: Width of the hidden layer.
+
+    Returns:
+        (k,) actions, 1 where the MLP's output is positive.
+    """
+    k = len(params)
+    split = np.cumsum([NUM_FEATURES * hidden, hidden, hidden])
+    w1, b1, w2, b2 = np.split(params, split, axis=1)
+    h = np.tanh(
+        np.einsum("ki,kih->kh", features, w1.reshape(k, NUM_FEATURES, hidden)) + b1
+    )
+    return (np.einsum("kh,kh->k", h, w2) + b2[:, 0] > 0).astype(np.int64)
+
+
+_populations: dict[int, Population] = {}
+
+
+def evaluate_candidates(
+    params: np.ndarray, seeds: list[int], hidden: int, max_steps: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Flies every candidate on the courses of some seeds.
+
+    Returns:
+        The mean steps survived and the mean score of every candidate.
+    """
+    k = len(params)
+    if k not in _populations:  # one simulation per chunk size and process
+        _populations[k] = Population(k)
+    population = _populations[k]
+    params = params.astype(np.float32)
+    steps = np.zeros(k)
+    scores = np.zeros(k)
+    for seed in seeds:
+        obs = population.reset(seed=seed)
+        for _ in range(max_steps):
+            obs, _, _ = population.step(mlp_actions(params, obs, hidden))
+            if population.done:
+                break
+        steps += population.steps
+        scores += population.score
+    return steps / len(seeds), scores / len(seeds)
+
+
+class NeuroTrainer:
+    """Evolves MLP policies with CEM or ES.
+
+    Attributes:
+        config: Hyperparameters.
+        mean: Mean of the search distribution over the parameters.
+        std: Standard deviations of the search distribution.
+        best: Parameters of the best candidate seen so far.
+        stats: Progress of the run.
+    """
+
+    def __init__(self, config: NeuroConfig) -> None:
+        """Initialize the search distribution."""
+        if config.method not in ("cem", "es"):
+            raise ValueError(f"unknown method {config.method!r}")
+        self.config = config
+        self.rng = np.random.default_rng(config.seed)
+        size = num_params(config.hidden)
+        self.mean = np.zeros(size)
+        self.std = np.full(size, config.init_std)
+        self.best = self.mean.copy()
+        self.stats = NeuroStats()
+
+    def sample(self) -> tuple[np.ndarray, np.ndarray]:
+        """Draws the candidates of a generation.
+
+        ES uses antithetic pairs, mirrored around the mean.
+
+        Returns:
+            The candidate parameters and their standard normal noise.
+        """
+        config = self.config
+        if config.method == "es":
+            half = self.rng.standard_normal(
+                (config.population_size // 2, len(self.mean))
+            )
+            noise = np.concatenate([half, -half])
+        else:
+            noise = self.rng.standard_normal((config.population_size, len(self.mean)))
+        return self.mean + self.std * noise, noise
+
+    def update(
+        self, candidates: np.ndarray, noise: np.ndarray, fitness: np.ndarray
+    ) -> None:
+        """Moves the search distribution towards the fitter candidates."""
+        config = self.config
+        if config.method == "cem":
+            n_elite = max(2, int(len(candidates) * config.elite_fraction))
+            elite = candidates[np.argsort(fitness)[-n_elite:]]
+            self.mean = elite.mean(axis=0)
+            self.std = np.maximum(elite.std(axis=0), config.min_std)
+        else:
+            # centered ranks make the step independent of the fitness scale
+            ranks = np.empty(len(fitness))
+            ranks[np.argsort(fitness)] = np.arange(len(fitness))
+            weights = ranks / (len(fitness) - 1) - 0.5
+            self.mean = self.mean + config.learning_rate * self.std * (
+                weights @ noise
+            ) / len(fitness)
+
+    def train(self) -> NeuroStats:
+        """Runs generations until the target score or the generation limit.
+
+        Returns:
+            The progress of the run, with the time to reach the target score.
+        """
+        config, stats = self.config, self.stats
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=config.workers) as pool:
+            for generation in range(config.generations):
+                candidates, noise = self.sample()
+                seeds = self.rng.integers(0, 2**31, size=config.episodes).tolist()
+                chunks = np.array_split(candidates, config.workers)
+                results = list(
+                    pool.map(
+                        evaluate_candidates,
+                        chunks,
+                        [seeds] * len(chunks),
+                        [config.hidden] * len(chunks),
+                        [config.max_steps] * len(chunks),
+                    )
+                )
+                steps = np.concatenate([r[0] for r in results])
+                scores = np.concatenate([r[1] for r in results])
+                self.update(candidates, noise, steps)
+
+                # the best candidate is the best scoring one, as the target
+                # is a score; steps survived only break ties
+                best = int(np.lexsort((steps, scores))[-1])
+                if scores[best] >= stats.best_score:
+                    stats.best_score = float(scores[best])
+                    self.best = candidates[best]
+                stats.generations = generation + 1
+                stats.elapsed = time.perf_counter() - start
+                stats.history.append(
+                    (stats.elapsed, float(scores.mean()), float(scores[best]))
+                )
+                print(
+                    f"generation {generation + 1} | {stats.elapsed:.1f}s | "
+                    f"mean score {scores.mean():.1f} | best {scores[best]:.1f} | "
+                    f"mean steps {steps.mean():.0f}"
+                )
+                if scores[best] >= config.target_score:
+                    stats.time_to_target = stats.elapsed
+                    break
+        return stats
+
+    def save(self, path: str | Path) -> None:
+        """Saves the best parameters with the width of their hidden layer."""
+        np.savez(path, params=self.best, hidden=self.config.hidden)
+
+
+def load_mlp(path: str | Path) -> tuple[np.ndarray, int]:
+    """Loads parameters saved by :meth:`NeuroTrainer.save`."""
+    with np.load(path) as archive:
+        return archive["params"], int(archive["hidden"])
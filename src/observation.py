@@ -0,0 +1,280 @@
+"""Lazy observations for the Flappy Bird environment.
+
+The environment hands out :class:`LazyObservation` handles instead of pixel
+arrays. A handle only stores the draw commands of the frame it stands for and
+rasterizes them the first time it is converted to an array, so frames that the
+caller never looks at cost nothing to render.
+
+:func:`preprocess` and :class:`FrameStack` turn materialized frames into the
+downscaled grayscale stacks the networks in :mod:`src.model` take as input.
+
+:class:`OccupancyEncoder` is the cheap alternative to rendering: it samples
+the hit masks of the entities on a coarse grid into one occupancy plane per
+entity class and packs them 8 pixels per byte, so a frame takes under a
+kilobyte. :func:`unpack_occupancy` turns such frames back into network input.
+"""
+
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+import pygame
+
+from src.entities import DrawCommand
+
+
+class Rasterizer:
+    """Off-screen renderer turning draw commands into RGB arrays.
+
+    Attributes:
+        surface: Off-screen surface the commands are drawn onto.
+        shape: Shape of the produced arrays, (height, width, 3).
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        """Initialize the rasterizer for frames of the given size."""
+        self.surface = pygame.Surface((width, height))
+        self.shape = (height, width, 3)
+
+    def draw(self, commands: Sequence[DrawCommand]) -> pygame.Surface:
+        """Draws the commands onto the off-screen surface and returns it."""
+        for image, x, y, rot in commands:
+            if rot:
+                center = pygame.Rect(x, y, image.get_width(), image.get_height())
+                image = pygame.transform.rotate(image, rot)
+                self.surface.blit(image, image.get_rect(center=center.center))
+            else:
+                self.surface.blit(image, (x, y))
+        return self.surface
+
+    def to_array(
+        self, commands: Sequence[DrawCommand], out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Rasterizes the commands into an (height, width, 3) uint8 array.
+
+        Args:
+            commands: Draw commands of the frame.
+            out: Optional array to write the frame into.
+
+        Returns:
+            The frame, ``out`` if it was given.
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        pixels = pygame.surfarray.pixels3d(self.draw(commands))
+        out[...] = pixels.transpose(1, 0, 2)
+        del pixels  # release the surface lock
+        return out
+
+
+class LazyObservation:
+    """Handle to a frame that is rasterized only when accessed as an array.
+
+    Attributes:
+        shape: Shape of the materialized frame.
+        dtype: Data type of the materialized frame.
+    """
+
+    __slots__ = ("_array", "_commands", "_rasterizer")
+
+    dtype = np.dtype(np.uint8)
+
+    def __init__(
+        self, rasterizer: Rasterizer, commands: tuple[DrawCommand, ...]
+    ) -> None:
+        """Initialize the handle from the draw commands of a frame."""
+        self._rasterizer = rasterizer
+        self._commands = commands
+        self._array: np.ndarray | None = None
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """Returns the shape of the materialized frame."""
+        return self._rasterizer.shape
+
+    @property
+    def materialized(self) -> bool:
+        """Returns True if the frame has already been rasterized."""
+        return self._array is not None
+
+    def materialize(self, out: np.ndarray | None = None) -> np.ndarray:
+        """Rasterizes the frame, caching the result for later accesses.
+
+        Frames written into a caller-owned ``out`` buffer are not cached, since
+        the caller may reuse that buffer for other frames.
+
+        Args:
+            out: Optional array to write the frame into.
+
+        Returns:
+            The frame as a (height, width, 3) uint8 array.
+        """
+        if out is not None:
+            if self._array is None:
+                return self._rasterizer.to_array(self._commands, out)
+            out[...] = self._array
+            return out
+        if self._array is None:
+            self._array = self._rasterizer.to_array(self._commands)
+            self._commands = ()
+        return self._array
+
+    def __array__(
+        self, dtype: np.dtype | None = None, copy: bool | None = None
+    ) -> np.ndarray:
+        """Returns the materialized frame for NumPy conversions."""
+        array = self.materialize()
+        if dtype is not None and dtype != array.dtype:
+            return array.astype(dtype)
+        return array.copy() if copy else array
+
+    def __reduce__(self) -> tuple:
+        """Pickles and deep-copies the handle as its materialized frame."""
+        return np.asarray, (self.materialize(),)
+
+
+def materialize_batch(
+    observations: Sequence[LazyObservation | np.ndarray],
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """Materializes many observations into one stacked array.
+
+    Frames are rasterized straight into their row of the batch, so no
+    intermediate per-frame arrays are allocated. Wrappers and vector
+    environments use this to fetch the frames of a whole batch at once.
+
+    Args:
+        observations: Lazy handles or already materialized frames.
+        out: Optional (len(observations), height, width, 3) array to fill.
+
+    Returns:
+        The stacked frames.
+    """
+    if out is None:
+        out = np.empty((len(observations), *observations[0].shape), dtype=np.uint8)
+    for row, observation in zip(out, observations, strict=True):
+        if isinstance(observation, LazyObservation):
+            observation.materialize(row)
+        else:
+            row[...] = observation
+    return out
+
+
+def preprocess(
+    frames: np.ndarray, scale: int = 4, out: np.ndarray | None = None
+) -> np.ndarray:
+    """Converts RGB frames to downscaled grayscale frames for the networks.
+
+    Every ``scale``-th pixel of each row and column is kept and its channels
+    averaged, which is cheap and keeps the pipes and the bird well visible.
+
+    Args:
+        frames: (n, height, width, 3) uint8 RGB frames.
+        scale: Downscaling factor of both axes.
+        out: Optional (n, height // scale, width // scale) array to fill.
+
+    Returns:
+        The grayscale frames as uint8.
+    """
+    sampled = frames[:, ::scale, ::scale]
+    gray = sampled.sum(axis=-1, dtype=np.uint16)
+    gray //= 3
+    if out is None:
+        return gray.astype(np.uint8)
+    out[...] = gray
+    return out
+
+
+class OccupancyEncoder:
+    """Bit-packed occupancy planes of the entities, sampled from hit masks.
+
+    Every ``scale``-th pixel of each row and column is kept, as in
+    :func:`preprocess`, and set in the plane of an entity class if an opaque
+    pixel of an entity of that class covers it. Rows are packed along the
+    width, padded to whole bytes.
+
+    Attributes:
+        width: Width of the unpacked planes.
+        shape: Shape of the packed frames, (planes, rows, bytes per row).
+    """
+
+    def __init__(
+        self, width: int, height: int, scale: int = 8, planes: int = 3
+    ) -> None:
+        """Initialize the encoder for frames of the given size."""
+        self._rows = np.arange(0, height, scale)
+        self._cols = np.arange(0, width, scale)
+        self._planes = np.zeros((planes, len(self._rows), len(self._cols)), bool)
+        self.width = len(self._cols)
+        self.shape = (planes, len(self._rows), -(-self.width // 8))
+
+    def encode(
+        self, sprites: Iterable[tuple[int, np.ndarray, float, float]]
+    ) -> np.ndarray:
+        """Returns the packed occupancy of some sprites.
+
+        Args:
+            sprites: (plane, hit mask, x, y) of every sprite, with the hit
+                mask as a (width, height) bool array.
+        """
+        planes = self._planes
+        planes[...] = False
+        rows, cols = self._rows, self._cols
+        for plane, mask, x, y in sprites:
+            x, y = int(x), int(y)  # truncated like pygame rects
+            w, h = mask.shape
+            r0, r1 = np.searchsorted(rows, (y, y + h))
+            c0, c1 = np.searchsorted(cols, (x, x + w))
+            if r0 < r1 and c0 < c1:
+                hits = mask[np.ix_(cols[c0:c1] - x, rows[r0:r1] - y)]
+                planes[plane, r0:r1, c0:c1] |= hits.T
+        return np.packbits(planes, axis=-1)
+
+
+def unpack_occupancy(packed: np.ndarray, width: int) -> np.ndarray:
+    """Unpacks frames of :class:`OccupancyEncoder` into float32 network input.
+
+    Args:
+        packed: (..., planes, rows, bytes per row) packed frames.
+        width: Width of the unpacked planes, see ``OccupancyEncoder.width``.
+
+    Returns:
+        (..., planes, rows, width) array of zeros and ones.
+    """
+    return np.unpackbits(packed, axis=-1, count=width).astype(np.float32)
+
+
+class FrameStack:
+    """Channels-first stacks of the latest preprocessed frames of many envs.
+
+    Slots that reach back before the start of an episode are zero, like with
+    Stable-Baselines3's ``VecFrameStack``.
+
+    Attributes:
+        frames: Array of shape (num_envs, n_stack, height, width).
+    """
+
+    def __init__(
+        self, num_envs: int, n_stack: int, frame_shape: tuple[int, int]
+    ) -> None:
+        """Initialize empty stacks."""
+        self.frames = np.zeros((num_envs, n_stack, *frame_shape), dtype=np.uint8)
+
+    def push(self, frames: np.ndarray, envs: np.ndarray | None = None) -> np.ndarray:
+        """Appends one frame per env, dropping the oldest, and returns the stacks.
+
+        Args:
+            frames: One frame per env, or per env in ``envs``.
+            envs: Indices of the envs to push to, all of them by default.
+        """
+        if envs is None:
+            self.frames[:, :-1] = self.frames[:, 1:]
+            self.frames[:, -1] = frames
+        else:
+            self.frames[envs, :-1] = self.frames[envs, 1:]
+            self.frames[envs, -1] = frames
+        return self.frames
+
+    def reset(self, envs: np.ndarray | int, frames: np.ndarray) -> None:
+        """Starts new stacks for the given envs from their first frames."""
+        self.frames[envs] = 0
+        self.frames[envs, -1] = frames
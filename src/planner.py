@@ -0,0 +1,161 @@
+"""Lookahead planning agent that needs no training.
+
+At every decision the planner clones the game state and simulates both
+actions ``horizon`` frames ahead. All branches of one depth advance together
+as NumPy arrays of bird heights and velocities; the pipes move the same way in
+every branch, so they are advanced once per depth. After each frame the
+branches are deduplicated through a transposition table keyed on the
+quantized (height, velocity) of the bird: the next pipe's distance and gap are
+shared by all branches of a depth, so two branches with the same key play out
+identically from there on. This keeps the search at a few hundred branches per
+depth instead of ``2 ** horizon`` and a decision at about 2 ms on one core.
+
+Collisions are checked against the bounding boxes of the bird and the pipes,
+which contain their hit masks, so the planner never believes a crashing
+branch survives. Pipes spawning during the lookahead are ignored; they appear
+well beyond the reach of the horizon.
+
+Play with ``python src/main.py agent --policy planner``.
+"""
+
+import numpy as np
+
+from src.entities import PlayerMode
+from src.flappy_env import FlappyBirdEnv
+from src.state import PLAYER_FIELDS, GameState
+
+_Y, _VEL_Y, _MAX_VEL_Y, _ACC_Y, _FLAP_ACC = (
+    PLAYER_FIELDS.index(name)
+    for name in ("y", "vel_y", "max_vel_y", "acc_y", "flap_acc")
+)
+
+
+class Planner:
+    """Chooses actions by searching the simulation of an environment.
+
+    Implements the ``act`` / ``reset`` interface of
+    :class:`~src.inference.NumpyPolicy`, but decides from the state of the
+    environment instead of from the observation.
+
+    Attributes:
+        env: Environment whose game is planned for.
+        horizon: Frames simulated ahead per decision.
+        resolution: Pixels of height that branches are merged within.
+        margin: Pixels the bounding boxes are grown by. Covers the rounding of
+            pygame rects and, as long as it is at least ``resolution``, the
+            height difference of merged branches.
+    """
+
+    def __init__(
+        self,
+        env: FlappyBirdEnv,
+        horizon: int = 32,
+        resolution: float = 2.0,
+        margin: float = 2.0,
+    ) -> None:
+        """Initialize the planner for an environment."""
+        self.env = env
+        self.horizon = horizon
+        self.resolution = resolution
+        self.margin = margin
+        config = env.config
+        bird = config.images.player[0]
+        pipe = config.images.pipe[0]
+        self._bird_size = (bird.get_width(), bird.get_height())
+        self._pipe_size = (pipe.get_width(), pipe.get_height())
+        self._floor_y = config.window.viewport_height
+        # the bird's reachable heights, as set by Player.__init__
+        self._min_y = -2 * bird.get_height()
+        self._max_y = config.window.viewport_height - bird.get_height() * 0.75
+        self._alternating = np.zeros(0, dtype=bool)
+
+    def reset(self) -> None:
+        """Does nothing; the planner keeps no state between decisions."""
+
+    def act(self, obs: object = None) -> int:
+        """Returns the action for the current state of the environment.
+
+        Args:
+            obs: Ignored, the planner reads the game state instead.
+        """
+        return self.plan(self.env.clone_state())
+
+    def plan(self, state: GameState) -> int:
+        """Returns the action that survives longest from a game state.
+
+        Ties between actions surviving the whole horizon go to the one whose
+        best final branch is closest to the center of the gap ahead.
+        """
+        if state.mode != PlayerMode.NORMAL or state.done:
+            return 0
+        player = state.player
+        max_vel_y, acc_y, flap_acc = (
+            player[_MAX_VEL_Y],
+            player[_ACC_Y],
+            player[_FLAP_ACC],
+        )
+        bird_x, (bird_w, bird_h) = player[0], self._bird_size
+        pipe_w, pipe_h = self._pipe_size
+        pipes = np.array(state.pipes, dtype=np.float64).reshape(-1, 4)
+        pipe_x = pipes[:, 0].copy()
+        # the upper pipes always reach above the bird's highest point, so a
+        # bird between two pipes is safe exactly when it is within the gap
+        gap_top = pipes[:, 1] + pipe_h + self.margin
+        gap_bottom = pipes[:, 3] - self.margin
+
+        # dense transposition table, indexed by (root, height bin, velocity)
+        min_vel = min(flap_acc, player[_VEL_Y])
+        rows = int((self._max_y - self._min_y) // self.resolution) + 1
+        cols = int(max(max_vel_y, player[_VEL_Y]) - min_vel) + 2
+        table = np.empty(2 * rows * cols, dtype=np.intp)
+        if len(self._alternating) < len(table):
+            self._alternating = np.tile(np.array([False, True]), len(table))
+
+        y = np.full(2, player[_Y], dtype=np.float64)
+        vel = np.full(2, player[_VEL_Y], dtype=np.float64)
+        root = np.array([0, 1], dtype=np.intp)
+        flap = root.astype(bool)
+        survived = np.zeros(2, dtype=np.int64)
+        for depth in range(1, self.horizon + 1):
+            # Player.flap, then Player.tick_normal
+            flap &= y > self._min_y
+            fall = ~flap & (vel < max_vel_y)
+            vel = np.where(flap, flap_acc, vel + fall * acc_y)
+            y = np.clip(y + vel, self._min_y, self._max_y)
+
+            pipe_x += state.pipe_vel_x
+            alive = y + bird_h <= self._floor_y
+            near = (pipe_x - self.margin < bird_x + bird_w) & (
+                bird_x < pipe_x + pipe_w + self.margin
+            )
+            for top, bottom in zip(gap_top[near], gap_bottom[near], strict=True):
+                alive &= (y >= top) & (y + bird_h <= bottom)
+            y, vel, root = y[alive], vel[alive], root[alive]
+            if not len(y):
+                break
+            # branches stay sorted by root action
+            survived[[root[0], root[-1]]] = depth
+            if depth == self.horizon:
+                break
+
+            # transposition table: one branch per quantized (root, y, vel)
+            keys = (
+                root * rows + ((y - self._min_y) // self.resolution).astype(np.intp)
+            ) * cols + (vel - min_vel).astype(np.intp)
+            table[keys] = np.arange(len(keys))
+            first = table[keys]
+            first = first[first == np.arange(len(keys))]
+            y, vel, root = y[first], vel[first], root[first]
+            # every branch continues with both actions
+            y, vel, root = np.repeat(y, 2), np.repeat(vel, 2), np.repeat(root, 2)
+            flap = self._alternating[: 2 * len(first)].copy()
+
+        if survived[0] != survived[1] or not len(y):
+            return int(survived[1] > survived[0])
+        ahead = pipe_x + pipe_w > bird_x
+        if not ahead.any():
+            return 0
+        gap_center = (gap_top[ahead][0] + gap_bottom[ahead][0]) / 2
+        distance = np.abs(y + bird_h / 2 - gap_center)
+        best = [distance[root == action].min() for action in (0, 1)]
+        return int(best[1] < best[0])
@@ -0,0 +1,289 @@
+"""Many birds flying through one shared pipe course.
+
+:class:`Population` runs hundreds of birds in a single simulation for
+evolutionary and population-based methods. The course, that is the pipes and
+the floor, is ticked once per step exactly as in :class:`FlappyBirdEnv`,
+while the physics of all birds are NumPy array operations over the
+population. Dead birds are masked out and keep their last state, so arrays
+and indices stay stable for the whole episode.
+
+Collisions are pixel-exact like :meth:`src.entities.Player.collided`. For
+every course sprite a table holds, per column and vertical offset to the
+bird, the bitmask of its opaque pixels across the bird's height; a bird hits
+the sprite if that bitmask shares a bit with the bird's own column bitmask in
+any overlapping column. Transparent pixels, such as the narrower pipe bodies
+below the lips, therefore never count as hits.
+
+All birds share the x position, so they cross pipes and score together.
+"""
+
+from typing import Any
+
+import numpy as np
+import pygame
+
+from src.entities import PlayerMode
+from src.entities.entity import DrawCommand
+from src.flappy_env import FlappyBirdEnv
+from src.observation import Rasterizer
+from src.utils import get_hit_mask
+
+# bird features of :meth:`Population.observe`
+NUM_FEATURES = 5
+
+
+class _MaskTable:
+    """Column bitmasks of a sprite at every vertical offset to the bird.
+
+    Attributes:
+        bits: (width, sprite height + bird height + 1) array; entry
+            ``[c, dy + bird height]`` holds the opaque pixels of column ``c``
+            in the bird height rows starting at row ``dy`` as bits.
+    """
+
+    def __init__(self, image: pygame.Surface, bird_height: int) -> None:
+        """Builds the table of a sprite."""
+        mask = np.array(get_hit_mask(image), dtype=np.uint64)  # (width, height)
+        padded = np.pad(mask, ((0, 0), (bird_height, bird_height)))
+        weights = np.uint64(1) << np.arange(bird_height, dtype=np.uint64)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, bird_height, axis=1)
+        self.bits = (windows * weights).sum(axis=2, dtype=np.uint64)
+        self.width, self.height = mask.shape
+
+    def hits(
+        self,
+        x: int,
+        y: int,
+        bird_x: int,
+        bird_y: np.ndarray,
+        bird_bits: np.ndarray,
+    ) -> np.ndarray:
+        """Returns which birds overlap the sprite at (x, y) pixel-exactly.
+
+        Args:
+            x: Left edge of the sprite.
+            y: Top edge of the sprite.
+            bird_x: Left edge of all birds.
+            bird_y: Top edges of the birds.
+            bird_bits: Column bitmasks of the bird image.
+        """
+        start = max(x, bird_x)
+        stop = min(x + self.width, bird_x + len(bird_bits))
+        if start >= stop:
+            return np.zeros(len(bird_y), dtype=bool)
+        bird_height = self.bits.shape[1] - self.height - 1
+        offset = np.clip(bird_y - y + bird_height, 0, self.bits.shape[1] - 1)
+        columns = self.bits[start - x : stop - x][:, offset]  # (columns, birds)
+        overlap = columns & bird_bits[start - bird_x : stop - bird_x, None]
+        return overlap.any(axis=0)
+
+
+class Population:
+    """Simulates many birds on the course of one environment.
+
+    Attributes:
+        size: Number of birds.
+        env: Environment providing the course and its sprites; its own player
+            is not used.
+        y: Heights of the birds.
+        vel_y: Vertical velocities of the birds.
+        rot: Rotations of the birds, only used for drawing.
+        alive: Mask of the birds that have not crashed.
+        score: Pipes passed by every bird.
+        steps: Steps survived by every bird.
+    """
+
+    def __init__(self, size: int, render_mode: str | None = None) -> None:
+        """Initialize the population and its course."""
+        self.size = size
+        self.env = FlappyBirdEnv(render_mode=render_mode)
+        self.env.reset()
+        config = self.env.config
+        bird = config.images.player[0]
+        self._bird_bits = (
+            _MaskTable(bird, bird.get_height()).bits[:, bird.get_height()].copy()
+        )
+        self._bird_size = (bird.get_width(), bird.get_height())
+        self._pipe_tables = [
+            _MaskTable(image, bird.get_height()) for image in config.images.pipe
+        ]
+        self._floor_table = _MaskTable(config.images.base, bird.get_height())
+
+        player = self.env.player
+        self._x = player.x
+        self._min_y, self._max_y = player.min_y, player.max_y
+        self._params: dict[str, float] = {}
+        self._painter: Rasterizer | None = None
+        self.y = np.zeros(size)
+        self.vel_y = np.zeros(size)
+        self.rot = np.zeros(size)
+        self.flapped = np.zeros(size, dtype=bool)
+        self.alive = np.zeros(size, dtype=bool)
+        self.score = np.zeros(size, dtype=np.int64)
+        self.steps = np.zeros(size, dtype=np.int64)
+
+    def reset(self, seed: int | None = None) -> np.ndarray:
+        """Starts all birds at the beginning of a new course.
+
+        Args:
+            seed: Seed for the pipe course, as for :meth:`FlappyBirdEnv.reset`.
+
+        Returns:
+            The features of all birds, see :meth:`observe`.
+        """
+        self.env.reset(seed=seed)
+        player = self.env.player
+        if player.mode != PlayerMode.NORMAL:
+            raise RuntimeError("population birds start in normal mode")
+        self._params = {
+            name: getattr(player, name)
+            for name in (
+                "max_vel_y",
+                "acc_y",
+                "flap_acc",
+                "vel_rot",
+                "rot_min",
+                "rot_max",
+            )
+        }
+        self.y[:] = player.y
+        self.vel_y[:] = player.vel_y
+        self.rot[:] = player.rot
+        self.flapped[:] = False
+        self.alive[:] = True
+        self.score[:] = 0
+        self.steps[:] = 0
+        return self.observe()
+
+    @property
+    def done(self) -> bool:
+        """Returns True once every bird has crashed."""
+        return not self.alive.any()
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Advances the course once and every living bird by one frame.
+
+        Args:
+            actions: One action per bird, 1 to flap; ignored for dead birds.
+
+        Returns:
+            The features of all birds, their rewards as in
+            :class:`FlappyBirdEnv` (0 for birds that were already dead), and
+            the mask of the birds that crashed in this step.
+        """
+        alive, params = self.alive.copy(), self._params
+
+        # Player.flap
+        flap = alive & (np.asarray(actions) == 1) & (self.y > self._min_y)
+        self.vel_y[flap] = params["flap_acc"]
+        self.flapped |= flap
+        self.rot[flap] = 80
+
+        env = self.env
+        env.background.tick()
+        env.floor.tick()
+        env.pipes.tick()
+
+        # Player.tick_normal
+        fall = alive & ~self.flapped & (self.vel_y < params["max_vel_y"])
+        self.vel_y[fall] += params["acc_y"]
+        self.flapped[alive] = False
+        y = np.clip(self.y + self.vel_y, self._min_y, self._max_y)
+        rot = np.clip(
+            self.rot + params["vel_rot"], params["rot_min"], params["rot_max"]
+        )
+        self.y = np.where(alive, y, self.y)
+        self.rot = np.where(alive, rot, self.rot)
+
+        crashed = alive & self._collided()
+        rewards = np.where(crashed, -100, alive.astype(np.int64))
+        self.alive &= ~crashed
+        self.steps[alive] += 1
+
+        # all birds share the x position, so they cross pipes together; like
+        # in the environment, a bird crashing in this step still scores
+        center = self._x + self._bird_size[0] / 2
+        for pipe in env.pipes.upper:
+            if pipe.cx <= center < pipe.cx - pipe.vel_x:
+                self.score[alive] += 1
+        return self.observe(), rewards, crashed
+
+    def _collided(self) -> np.ndarray:
+        """Returns which birds touch the floor or a pipe, pixel-exactly."""
+        env = self.env
+        # pygame rects truncate coordinates towards zero
+        y = np.trunc(self.y).astype(np.int64)
+        x = int(self._x)
+        hit = self._floor_table.hits(
+            int(env.floor.x), int(env.floor.y), x, y, self._bird_bits
+        )
+        upper_table, lower_table = self._pipe_tables
+        for upper, lower in zip(env.pipes.upper, env.pipes.lower, strict=True):
+            hit |= upper_table.hits(int(upper.x), int(upper.y), x, y, self._bird_bits)
+            hit |= lower_table.hits(int(lower.x), int(lower.y), x, y, self._bird_bits)
+        return hit
+
+    def observe(self) -> np.ndarray:
+        """Returns the features of every bird for policies without pixels.
+
+        Returns:
+            (size, NUM_FEATURES) float32 array of the bird's height and
+            velocity, the distance to the next pipe and the offsets of its gap
+            edges to the bird, all scaled to roughly [-1, 1].
+        """
+        env = self.env
+        window = env.config.window
+        bird_h = self._bird_size[1]
+        pipe_h = env.config.images.pipe[0].get_height()
+        upper = next(
+            (pipe for pipe in env.pipes.upper if pipe.x + pipe.w > self._x), None
+        )
+        if upper is None:
+            dx, gap_top = window.width, 0.0
+        else:
+            dx, gap_top = upper.x + upper.w - self._x, upper.y + pipe_h
+        gap_bottom = gap_top + env.pipes.pipe_gap
+        features = np.empty((self.size, NUM_FEATURES), dtype=np.float32)
+        features[:, 0] = self.y / window.viewport_height
+        features[:, 1] = self.vel_y / 10
+        features[:, 2] = dx / window.width
+        features[:, 3] = (gap_top - self.y) / window.viewport_height
+        features[:, 4] = (gap_bottom - self.y - bird_h) / window.viewport_height
+        return features
+
+    def draw_commands(self, max_birds: int | None = None) -> tuple[DrawCommand, ...]:
+        """Returns the draw commands of the course and the living birds.
+
+        The course is drawn once, followed by one sprite per living bird.
+
+        Args:
+            max_birds: Draw at most this many living birds.
+        """
+        env = self.env
+        image = env.player.image
+        birds = np.flatnonzero(self.alive)[:max_birds]
+        env.score.score = int(self.score.max(initial=0))
+        return (
+            *env.background.draw_commands(),
+            *env.floor.draw_commands(),
+            *env.pipes.draw_commands(),
+            *((image, self._x, self.y[i], self.rot[i]) for i in birds),
+            *env.score.draw_commands(),
+        )
+
+    def render(self, max_birds: int | None = None) -> None:
+        """Draws the population onto the window."""
+        if self._painter is None:
+            window = self.env.config.window
+            self._painter = Rasterizer(window.width, window.height)
+            self._painter.surface = self.env.config.screen
+        self._painter.draw(self.draw_commands(max_birds))
+        pygame.display.update()
+
+    def info(self) -> dict[str, Any]:
+        """Returns summary statistics of the population."""
+        return {
+            "alive": int(self.alive.sum()),
+            "best_score": int(self.score.max(initial=0)),
+            "mean_steps": float(self.steps.mean()),
+        }
@@ -0,0 +1,209 @@
+"""Post-training int8 quantization of the DQN for CPU inference.
+
+:func:`quantize_dqn` applies eager-mode static quantization to
+:class:`src.model.DQN`: conv/linear layers are fused with their ReLUs,
+activation ranges are calibrated on recorded game states, and the weights
+are converted to int8 per output channel. The quantized network is checked
+against the float one on held-out states, where the greedy actions have to
+agree, and both are timed at batch sizes used by play and evaluation.
+
+Run with ``python src/quantization.py dqn_native.pt --out dqn_int8.pt``.
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+import torch
+from torch import nn
+from torch.ao import quantization
+
+from src.flappy_env import FlappyBirdEnv
+from src.model import DQN
+from src.observation import FrameStack, preprocess
+from src.train import load_checkpoint
+
+
+class QuantizableDQN(nn.Module):
+    """DQN taking uint8 frame stacks, with quantization boundaries."""
+
+    def __init__(self, net: DQN) -> None:
+        """Wraps a float network, which is copied."""
+        super().__init__()
+        self.quant = quantization.QuantStub()
+        self.net = copy.deepcopy(net)
+        self.dequant = quantization.DeQuantStub()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """Returns the Q-values of a batch of uint8 frame stacks."""
+        return self.dequant(self.net(self.quant(x.float().div(255))))
+
+
+def quantize_dqn(
+    net: DQN, calibration: np.ndarray, backend: str = "x86", batch_size: int = 256
+) -> nn.Module:
+    """Returns a statically int8-quantized copy of a network.
+
+    Args:
+        net: Float network.
+        calibration: uint8 frame stacks to calibrate activation ranges on.
+        backend: Quantized engine, "x86", "fbgemm" or "qnnpack".
+        batch_size: Calibration batch size.
+
+    Returns:
+        The quantized network, taking uint8 frame stacks.
+    """
+    torch.backends.quantized.engine = backend
+    model = QuantizableDQN(net).eval()
+    quantization.fuse_modules(
+        model.net,
+        [
+            ["features.0", "features.1"],
+            ["features.2", "features.3"],
+            ["features.4", "features.5"],
+            ["fc.0", "fc.1"],
+        ],
+        inplace=True,
+    )
+    model.qconfig = quantization.get_default_qconfig(backend)
+    quantization.prepare(model, inplace=True)
+    with torch.no_grad():
+        for start in range(0, len(calibration), batch_size):
+            model(torch.from_numpy(calibration[start : start + batch_size]))
+    return quantization.convert(model, inplace=True)
+
+
+def collect_states(
+    net: DQN,
+    config: dict,
+    count: int,
+    epsilon: float = 0.1,
+    seed: int | None = None,
+) -> np.ndarray:
+    """Records frame stacks visited by an epsilon-greedy policy.
+
+    Args:
+        net: Policy network.
+        config: Training config of the network, for its preprocessing.
+        count: Number of states to record.
+        epsilon: Probability of a random action, for more varied states.
+        seed: Seed of the episodes and the exploration.
+
+    Returns:
+        The (count, n_stack, height, width) uint8 states.
+    """
+    rng = np.random.default_rng(seed)
+    env = FlappyBirdEnv(render_mode=None)
+    _, height, width = net.input_shape
+    stack = FrameStack(1, config["n_stack"], (height, width))
+    states = np.empty((count, *net.input_shape), dtype=np.uint8)
+
+    obs, _ = env.reset(seed=int(rng.integers(2**31)))
+    stack.reset(0, preprocess(obs.materialize()[None], config["scale"])[0])
+    for state in states:
+        state[...] = stack.frames[0]
+        with torch.no_grad():
+            action = int(net(torch.from_numpy(state[None]).float().div(255)).argmax())
+        if rng.random() < epsilon:
+            action = int(rng.integers(2))
+        obs, _, done, _, _ = env.step(action)
+        frame = preprocess(obs.materialize()[None], config["scale"])
+        if done:
+            obs, _ = env.reset(seed=int(rng.integers(2**31)))
+            stack.reset(0, preprocess(obs.materialize()[None], config["scale"])[0])
+        else:
+            stack.push(frame)
+    env.close()
+    return states
+
+
+def q_values(model: nn.Module, states: np.ndarray) -> np.ndarray:
+    """Returns the Q-values of a float or quantized network."""
+    with torch.no_grad():
+        x = torch.from_numpy(states)
+        if isinstance(model, DQN):
+            x = x.float().div(255)
+        return model(x).numpy()
+
+
+def compare(net: DQN, quantized: nn.Module, states: np.ndarray) -> dict[str, float]:
+    """Compares the quantized network's decisions with the float network's.
+
+    For undertrained networks the Q-values of both actions are often within
+    the quantization error of each other, so the agreement is reported along
+    with the largest Q-value error to tell near-ties from a broken model.
+
+    Returns:
+        The greedy action agreement and the largest absolute Q-value error.
+    """
+    reference = q_values(net, states)
+    approx = q_values(quantized, states)
+    return {
+        "agreement": float(np.mean(reference.argmax(axis=1) == approx.argmax(axis=1))),
+        "max_q_error": float(np.abs(reference - approx).max()),
+    }
+
+
+def throughput(
+    model: nn.Module, states: np.ndarray, batch_size: int, seconds: float = 2.0
+) -> float:
+    """Returns the states evaluated per second at a batch size."""
+    batch = states[:batch_size]
+    q_values(model, batch)
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        q_values(model, batch)
+        count += len(batch)
+    return count / elapsed
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Quantize a DQN checkpoint to int8")
+    parser.add_argument("checkpoint", help="Checkpoint of src/train.py.")
+    parser.add_argument("--out", default="dqn_int8.pt", help="TorchScript output.")
+    parser.add_argument("--calibration-states", type=int, default=1000)
+    parser.add_argument("--held-out-states", type=int, default=2000)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Quantizes a checkpoint, checks its actions and benchmarks it."""
+    args = parse_args()
+    net, config = load_checkpoint(args.checkpoint)
+    net.eval()
+    states = collect_states(
+        net,
+        config,
+        args.calibration_states + args.held_out_states,
+        seed=args.seed,
+    )
+    calibration = states[: args.calibration_states]
+    held_out = states[args.calibration_states :]
+    quantized = quantize_dqn(net, calibration)
+
+    check = compare(net, quantized, held_out)
+    print(
+        f"{len(held_out)} held-out states: greedy action agreement "
+        f"{check['agreement']:.2%}, max Q error {check['max_q_error']:.4f}"
+    )
+    for batch_size in (1, 64):
+        fp32 = throughput(net, held_out, batch_size)
+        int8 = throughput(quantized, held_out, batch_size)
+        print(
+            f"batch {batch_size:>3}: fp32 {fp32:>8.0f} states/s, "
+            f"int8 {int8:>8.0f} states/s ({int8 / fp32:.2f}x)"
+        )
+    if check["agreement"] < args.min_agreement:
+        raise SystemExit(f"agreement below {args.min_agreement:.0%}, not saved")
+    traced = torch.jit.trace(quantized, torch.from_numpy(held_out[:1]))
+    torch.jit.save(traced, args.out)
+    print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Episode recording to compact action logs and deterministic replay.
+
+An environment reset with a given seed and fed the same actions plays out
+identically, so an episode is fully described by its seed and its actions.
+:class:`EpisodeRecorder` stores exactly that, with the actions packed eight
+per byte, plus optional periodic :class:`~src.state.GameState` keyframes that
+let :class:`Replayer` seek into an episode without replaying it from the
+start. A 100-step episode without keyframes takes about 30 bytes.
+
+File layout (little endian)::
+
+    b"FLPREC" | version: u8 | config length: u32 | config JSON
+    per episode:
+        seed: u64 | steps: u32 | score: u32 | keyframes: u16
+        actions: ceil(steps / 8) bytes, bit-packed
+        per keyframe: step: u32 | length: u32 | GameState.to_bytes()
+"""
+
+import argparse
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+import json
+from pathlib import Path
+import random
+import struct
+from typing import Any, BinaryIO
+
+import gymnasium as gym
+import numpy as np
+
+from src.flappy_env import ENV_VERSION, FlappyBirdEnv
+from src.observation import LazyObservation
+from src.state import GameState, capture_state, restore_state
+
+MAGIC = b"FLPREC"
+FORMAT_VERSION = 2
+
+_FILE_HEADER = struct.Struct("<6sBI")
+_EPISODE_HEADER = struct.Struct("<QIIH")
+_KEYFRAME_HEADER = struct.Struct("<II")
+
+
+@dataclass
+class Episode:
+    """A recorded episode.
+
+    Attributes:
+        seed: Seed the environment was reset with.
+        actions: Action taken at every step.
+        score: Score reached at the end of the episode.
+        keyframes: Serialized states keyed by the number of steps taken.
+    """
+
+    seed: int
+    actions: np.ndarray
+    score: int
+    keyframes: dict[int, bytes] = field(default_factory=dict)
+
+    def write(self, file: BinaryIO) -> None:
+        """Appends the episode to an open recording file."""
+        file.write(
+            _EPISODE_HEADER.pack(
+                self.seed, len(self.actions), self.score, len(self.keyframes)
+            )
+        )
+        file.write(np.packbits(self.actions.astype(bool), bitorder="little"))
+        for step, blob in self.keyframes.items():
+            file.write(_KEYFRAME_HEADER.pack(step, len(blob)))
+            file.write(blob)
+
+    @classmethod
+    def read(cls, file: BinaryIO) -> "Episode | None":
+        """Reads the next episode from a recording file, None at its end."""
+        header = file.read(_EPISODE_HEADER.size)
+        if not header:
+            return None
+        seed, steps, score, n_keyframes = _EPISODE_HEADER.unpack(header)
+        packed = np.frombuffer(file.read((steps + 7) // 8), dtype=np.uint8)
+        actions = np.unpackbits(packed, count=steps, bitorder="little")
+        keyframes = {}
+        for _ in range(n_keyframes):
+            step, length = _KEYFRAME_HEADER.unpack(file.read(_KEYFRAME_HEADER.size))
+            keyframes[step] = file.read(length)
+        return cls(seed, actions, score, keyframes)
+
+
+def env_config(env: FlappyBirdEnv) -> dict[str, Any]:
+    """Returns the settings a replay needs to rebuild an identical environment."""
+    return {
+        "env_version": ENV_VERSION,
+        "fps": env.config.fps,
+        "window": [env.config.window.width, env.config.window.height],
+        "sprites": list(env.config.images.variant),
+    }
+
+
+class EpisodeRecorder(gym.Wrapper):
+    """Wrapper appending every episode of an environment to a recording file.
+
+    Resets without an explicit seed are given one drawn from the recorder's
+    own generator, so every recorded episode can be replayed.
+
+    Attributes:
+        path: Path of the recording file.
+        keyframe_interval: Steps between state keyframes, 0 to disable them.
+    """
+
+    def __init__(
+        self,
+        env: FlappyBirdEnv,
+        path: str | Path,
+        keyframe_interval: int = 0,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the recorder and write the file header.
+
+        Args:
+            env: Environment to record.
+            path: Path of the recording file, overwritten if it exists.
+            keyframe_interval: Steps between state keyframes, 0 to disable.
+            seed: Seed of the generator drawing per-episode seeds.
+        """
+        super().__init__(env)
+        self.path = Path(path)
+        self.keyframe_interval = keyframe_interval
+        self._seeds = random.Random(seed)
+        self._file = self.path.open("wb")
+        config = json.dumps(env_config(env.unwrapped)).encode()
+        self._file.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION, len(config)))
+        self._file.write(config)
+        self._episode: Episode | None = None
+        self._actions: list[int] = []
+
+    def reset(
+        self, *, seed: int | None = None, options: dict[str, Any] | None = None
+    ) -> tuple[LazyObservation, dict[str, Any]]:
+        """Finishes the current episode and starts recording a new one."""
+        self._flush()
+        if seed is None:
+            seed = self._seeds.getrandbits(63)
+        self._episode = Episode(seed, np.empty(0, dtype=np.uint8), 0)
+        self._actions = []
+        return self.env.reset(seed=seed, options=options)
+
+    def step(self, action: int) -> tuple:
+        """Steps the environment and records the action."""
+        result = self.env.step(action)
+        self._actions.append(int(action))
+        self._episode.score = result[4]["score"]
+        steps = len(self._actions)
+        if self.keyframe_interval and steps % self.keyframe_interval == 0:
+            state = capture_state(self.env.unwrapped)
+            self._episode.keyframes[steps] = state.to_bytes()
+        return result
+
+    def close(self) -> None:
+        """Writes the pending episode and closes the file and environment."""
+        self._flush()
+        self._file.close()
+        super().close()
+
+    def _flush(self) -> None:
+        """Writes the current episode, if it took any steps."""
+        if self._episode is not None and self._actions:
+            self._episode.actions = np.asarray(self._actions, dtype=np.uint8)
+            self._episode.write(self._file)
+            self._file.flush()
+        self._episode = None
+
+
+def read_recording(path: str | Path) -> tuple[dict[str, Any], list[Episode]]:
+    """Reads a recording file.
+
+    Returns:
+        The environment config and the recorded episodes.
+    """
+    with Path(path).open("rb") as file:
+        magic, version, config_len = _FILE_HEADER.unpack(file.read(_FILE_HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} recording")
+        config = json.loads(file.read(config_len))
+        episodes = []
+        while (episode := Episode.read(file)) is not None:
+            episodes.append(episode)
+    return config, episodes
+
+
+class Replayer:
+    """Headless re-simulation of recorded episodes.
+
+    Attributes:
+        config: Environment config stored in the recording.
+        episodes: Recorded episodes.
+        env: Hidden environment the episodes are re-simulated in.
+    """
+
+    def __init__(self, path: str | Path, env: FlappyBirdEnv | None = None) -> None:
+        """Initialize the replayer.
+
+        Args:
+            path: Path of the recording file.
+            env: Environment to replay in, a hidden one is created by default.
+        """
+        self.config, self.episodes = read_recording(path)
+        if self.config["env_version"] != ENV_VERSION:
+            raise ValueError(
+                f"recording was made with env version {self.config['env_version']},"
+                f" this is version {ENV_VERSION}"
+            )
+        self.env = env or FlappyBirdEnv(render_mode=None)
+        self.env.config.images.load_variant(*self.config["sprites"])
+
+    def seek(self, index: int, step: int) -> FlappyBirdEnv:
+        """Puts the environment into the state of an episode after some steps.
+
+        Replays from the closest keyframe at or before ``step``.
+
+        Args:
+            index: Index of the episode.
+            step: Number of recorded actions to apply.
+
+        Returns:
+            The environment, positioned at ``step``.
+        """
+        episode = self.episodes[index]
+        self.env.reset(seed=episode.seed)
+        start = max((k for k in episode.keyframes if k <= step), default=0)
+        if start:
+            restore_state(self.env, GameState.from_bytes(episode.keyframes[start]))
+        for action in episode.actions[start:step]:
+            self.env.step(action)
+        return self.env
+
+    def replay(self, index: int, start: int = 0) -> Iterator[tuple]:
+        """Re-simulates an episode, yielding every step's result.
+
+        Args:
+            index: Index of the episode.
+            start: Step to start from, reached via :meth:`seek`.
+
+        Yields:
+            The (observation, reward, terminated, truncated, info) tuples.
+        """
+        episode = self.episodes[index]
+        self.seek(index, start)
+        for action in episode.actions[start:]:
+            yield self.env.step(action)
+
+    def verify(self, index: int) -> bool:
+        """Returns True if replaying an episode reproduces its recorded score."""
+        self.seek(index, len(self.episodes[index].actions))
+        return self.env.score.score == self.episodes[index].score
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Replay a Flappy Bird recording")
+    parser.add_argument("path", help="Path of the recording file.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Replays every episode of a recording and checks the recorded scores."""
+    args = parse_args()
+    replayer = Replayer(args.path)
+    for index, episode in enumerate(replayer.episodes):
+        status = "ok" if replayer.verify(index) else "MISMATCH"
+        print(
+            f"episode {index}: seed={episode.seed} steps={len(episode.actions)}"
+            f" score={episode.score} {status}"
+        )
+    replayer.env.close()
+
+
+if __name__ == "__main__":
+    main()
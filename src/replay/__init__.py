@@ -0,0 +1,12 @@
+"""Replay buffers storing every observation frame only once."""
+
+from src.replay.buffers import FrameReplayBuffer
+from src.replay.compressed import CompressedFrameReplayBuffer, CompressedFrameStore
+from src.replay.frame_store import FrameStore
+
+__all__ = [
+    "CompressedFrameReplayBuffer",
+    "CompressedFrameStore",
+    "FrameReplayBuffer",
+    "FrameStore",
+]
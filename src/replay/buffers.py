@@ -0,0 +1,259 @@
+"""Stable-Baselines3 replay buffers that store each frame only once.
+
+SB3's :class:`~stable_baselines3.common.buffers.ReplayBuffer` keeps ``obs`` and
+``next_obs`` in two arrays, and with frame stacking every frame is repeated
+``n_stack`` times in each of them. :class:`FrameReplayBuffer` stores only the
+newest frame of every observation and rebuilds observations, next observations
+and frame stacks by index when sampling.
+"""
+
+from typing import Any
+
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.buffers import BaseBuffer, ReplayBuffer
+from stable_baselines3.common.preprocessing import is_image_space_channels_first
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+from stable_baselines3.common.vec_env import VecNormalize
+import torch as th
+
+from src.replay.frame_store import FrameStore
+
+
+class FrameReplayBuffer(ReplayBuffer):
+    """Replay buffer deduplicating observation frames.
+
+    Position ``pos`` holds the newest frame of the observation of transition
+    ``pos``, and position ``pos + 1`` the newest frame of its next
+    observation, which is also the observation of the following transition.
+    Next observations of transitions that ended an episode are kept apart,
+    since the following position holds the first frame of the next episode.
+
+    Frame stacks, as produced by ``VecFrameStack``, are rebuilt from the
+    preceding positions and zero-padded across episode starts like
+    ``VecFrameStack`` does after a reset.
+
+    Attributes:
+        n_stack: Number of frames stacked per observation.
+        stack_axis: Axis of the observation the frames are stacked along.
+        frames: Storage of the deduplicated frames.
+        episode_steps: Frames since the episode start of each stored
+            observation, capped at n_stack.
+        terminal_frames: Newest next-observation frame of transitions that
+            ended an episode, keyed by (position, env).
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Box,
+        action_space: spaces.Space,
+        device: th.device | str = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        n_stack: int = 1,
+    ) -> None:
+        """Initialize the replay buffer.
+
+        Args:
+            buffer_size: Maximum number of transitions.
+            observation_space: Observation space, uint8 images or vectors.
+            action_space: Action space.
+            device: PyTorch device of the sampled tensors.
+            n_envs: Number of parallel environments.
+            optimize_memory_usage: Ignored, frames are always deduplicated.
+            handle_timeout_termination: Treat truncated episodes as
+                non-terminal when computing targets.
+            n_stack: Number of stacked frames in each observation.
+        """
+        # skip ReplayBuffer.__init__, which allocates the duplicated arrays
+        BaseBuffer.__init__(
+            self, buffer_size, observation_space, action_space, device, n_envs=n_envs
+        )
+        self.buffer_size = max(buffer_size // n_envs, 1)
+        self.optimize_memory_usage = optimize_memory_usage
+        self.handle_timeout_termination = handle_timeout_termination
+        self.n_stack = n_stack
+
+        channels_first = len(self.obs_shape) == 3 and is_image_space_channels_first(
+            observation_space
+        )
+        self.stack_axis = 0 if channels_first else len(self.obs_shape) - 1
+        frame_shape = list(self.obs_shape)
+        frame_shape[self.stack_axis] //= n_stack
+        self.frame_shape = tuple(frame_shape)
+        self.frames = self._make_frame_store()
+
+        self.actions = np.zeros(
+            (self.buffer_size, self.n_envs, self.action_dim),
+            dtype=self._maybe_cast_dtype(action_space.dtype),
+        )
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.dones = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.timeouts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.episode_steps = np.zeros((self.buffer_size, self.n_envs), dtype=np.int32)
+        self.terminal_frames: dict[tuple[int, int], np.ndarray] = {}
+        self._episode_step = np.zeros(self.n_envs, dtype=np.int32)
+
+    def _make_frame_store(self) -> FrameStore:
+        """Returns the storage for the frames."""
+        return FrameStore(self.buffer_size, self.n_envs, self.frame_shape)
+
+    def _newest_frames(self, obs: np.ndarray) -> np.ndarray:
+        """Returns the newest frame of a batch of (stacked) observations."""
+        index = [slice(None)] * obs.ndim
+        index[self.stack_axis + 1] = slice(-self.frame_shape[self.stack_axis], None)
+        return obs[tuple(index)]
+
+    def add(
+        self,
+        obs: np.ndarray,
+        next_obs: np.ndarray,
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        infos: list[dict[str, Any]],
+    ) -> None:
+        """Adds one transition per env."""
+        self.add_frames(
+            self._newest_frames(np.asarray(obs)),
+            self._newest_frames(np.asarray(next_obs)),
+            action,
+            reward,
+            done,
+            infos,
+        )
+
+    def add_frames(
+        self,
+        frames: np.ndarray,
+        next_frames: np.ndarray,
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        infos: list[dict[str, Any]],
+    ) -> None:
+        """Adds one transition per env given only the newest frames.
+
+        Producers that keep the frame stacks themselves, such as remote
+        actors, only need to ship the newest frame of each observation.
+
+        Args:
+            frames: Newest frame of each observation, (n_envs, *frame_shape).
+            next_frames: Newest frame of each next observation.
+            action: Action of each env.
+            reward: Reward of each env.
+            done: Done flag of each env.
+            infos: Info dict of each env.
+        """
+        pos = self.pos
+        for env in range(self.n_envs):
+            self.terminal_frames.pop((pos, env), None)
+
+        self.frames.put(pos, frames)
+        self.frames.put((pos + 1) % self.buffer_size, next_frames)
+        for env in np.flatnonzero(done):
+            self.terminal_frames[(pos, int(env))] = next_frames[env].copy()
+
+        self.actions[pos] = np.asarray(action).reshape((self.n_envs, self.action_dim))
+        self.rewards[pos] = reward
+        self.dones[pos] = done
+        if self.handle_timeout_termination:
+            self.timeouts[pos] = [
+                info.get("TimeLimit.truncated", False) for info in infos
+            ]
+        self.episode_steps[pos] = self._episode_step
+        self._episode_step = np.where(
+            done, 0, np.minimum(self._episode_step + 1, self.n_stack)
+        )
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def sample(
+        self, batch_size: int, env: VecNormalize | None = None
+    ) -> ReplayBufferSamples:
+        """Samples transitions whose frames have not been overwritten."""
+        return self._get_samples(self._sample_indices(batch_size), env=env)
+
+    def _sample_indices(self, batch_size: int, margin: int = 0) -> np.ndarray:
+        """Returns random valid transition positions.
+
+        Once the buffer is full, the frames at the write head belong to the
+        newest next observation, which invalidates the n_stack oldest
+        transitions.
+
+        Args:
+            batch_size: Number of positions.
+            margin: Number of further oldest transitions to skip, for batches
+                assembled while new transitions are being added. Before the
+                buffer is full, this skips the first positions once the write
+                head is about to wrap around onto them.
+        """
+        if self.full:
+            low = min(self.n_stack + margin, self.buffer_size - 1)
+            offsets = np.random.randint(low, self.buffer_size, batch_size)
+            return (offsets + self.pos) % self.buffer_size
+        low = 0
+        if margin:
+            wrapped = self.pos + self.n_stack + margin - self.buffer_size
+            low = min(max(wrapped, 0), self.pos - 1)
+        return np.random.randint(low, self.pos, size=batch_size)
+
+    def _get_samples(
+        self, batch_inds: np.ndarray, env: VecNormalize | None = None
+    ) -> ReplayBufferSamples:
+        """Rebuilds the observations of the given transitions."""
+        return self._to_samples(self._gather(batch_inds), env)
+
+    def _gather(self, batch_inds: np.ndarray) -> tuple[np.ndarray, ...]:
+        """Returns the raw obs, actions, next obs, dones and rewards arrays."""
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        dones = self.dones[batch_inds, env_indices]
+        return (
+            self._stack(batch_inds, env_indices, 0),
+            self.actions[batch_inds, env_indices, :],
+            self._stack(batch_inds, env_indices, 1),
+            # only use dones that are not due to timeouts
+            (dones * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            self.rewards[batch_inds, env_indices].reshape(-1, 1),
+        )
+
+    def _to_samples(
+        self, data: tuple[np.ndarray, ...], env: VecNormalize | None = None
+    ) -> ReplayBufferSamples:
+        """Normalizes gathered arrays and converts them to tensors."""
+        obs, actions, next_obs, dones, rewards = data
+        return ReplayBufferSamples(
+            *map(
+                self.to_torch,
+                (
+                    self._normalize_obs(obs, env),
+                    actions,
+                    self._normalize_obs(next_obs, env),
+                    dones,
+                    self._normalize_reward(rewards, env),
+                ),
+            )
+        )
+
+    def _stack(self, inds: np.ndarray, envs: np.ndarray, offset: int) -> np.ndarray:
+        """Rebuilds stacked observations (offset 0) or next observations (1)."""
+        back = np.arange(self.n_stack - 1, -1, -1)
+        positions = ((inds + offset)[:, None] - back) % self.buffer_size
+        frames = self.frames.get(positions, envs[:, None])
+        if offset:
+            for row in np.flatnonzero(self.dones[inds, envs]):
+                frames[row, -1] = self.terminal_frames[(inds[row], envs[row])]
+        if self.n_stack == 1:
+            return frames[:, 0]
+
+        # zero the slots that reach back before the start of the episode
+        since_start = self.episode_steps[inds, envs] + offset
+        frames[back[None, :] > since_start[:, None]] = 0
+        if self.stack_axis == 0:
+            return frames.reshape(len(inds), *self.obs_shape)
+        return np.moveaxis(frames, 1, -2).reshape(len(inds), *self.obs_shape)
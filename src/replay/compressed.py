@@ -0,0 +1,316 @@
+"""Compressed replay frame storage with a RAM budget and disk spilling.
+
+Flappy Bird frames are mostly flat sky and repeated pipe columns, so zlib
+shrinks them by well over an order of magnitude. :class:`CompressedFrameStore`
+keeps every frame compressed, groups positions into segments, and once the
+compressed frames exceed the RAM budget moves the segments holding the oldest
+transitions into memory-mapped files on local disk. Segments are read back
+into RAM when the write head wraps around to them.
+
+:class:`CompressedFrameReplayBuffer` decompresses sampled minibatches in a
+background thread pool, a few batches ahead of the learner.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+from typing import Any
+import weakref
+import zlib
+
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+from stable_baselines3.common.vec_env import VecNormalize
+import torch as th
+
+from src.replay.buffers import FrameReplayBuffer
+
+
+class _Segment:
+    """Compressed frames of a run of consecutive positions.
+
+    In RAM the frames are a list of blobs; once spilled they are a memory map
+    of the concatenated blobs plus their offsets.
+    """
+
+    __slots__ = ("blobs", "memmap", "nbytes", "offsets", "path")
+
+    def __init__(self, size: int) -> None:
+        """Initialize an empty in-RAM segment of ``size`` frames."""
+        self.blobs: list[bytes] | None = [b""] * size
+        self.nbytes = 0
+        self.memmap: np.memmap | None = None
+        self.offsets: np.ndarray | None = None
+        self.path: Path | None = None
+
+    def blob(self, index: int) -> bytes | memoryview:
+        """Returns the compressed frame at an index of the segment."""
+        if self.blobs is not None:
+            return self.blobs[index]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return memoryview(self.memmap[start:end])
+
+    def spill(self, path: Path) -> None:
+        """Moves the frames into a memory-mapped file."""
+        lengths = [len(blob) for blob in self.blobs]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        with path.open("wb") as file:
+            file.writelines(self.blobs)
+        self.memmap = np.memmap(path, dtype=np.uint8, mode="r")
+        self.path = path
+        self.blobs = None
+
+    def load(self) -> None:
+        """Reads spilled frames back into RAM and deletes the file."""
+        self.blobs = [
+            bytes(self.memmap[start:end])
+            for start, end in zip(self.offsets[:-1], self.offsets[1:], strict=True)
+        ]
+        self.memmap = None
+        self.offsets = None
+        self.path.unlink(missing_ok=True)
+        self.path = None
+
+
+class CompressedFrameStore:
+    """zlib-compressed frame storage bounded by a RAM budget.
+
+    Attributes:
+        frame_shape: Shape of a single frame.
+        ram_budget: Bytes of compressed frames kept in RAM.
+        spill_dir: Directory of the spilled segment files. Temporary
+            directories created by the store are removed with it.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        n_envs: int,
+        frame_shape: tuple[int, ...],
+        ram_budget: int = 2 << 30,
+        spill_dir: str | Path | None = None,
+        segment_size: int = 1024,
+        level: int = 1,
+    ) -> None:
+        """Initialize the storage.
+
+        Args:
+            buffer_size: Number of positions per env.
+            n_envs: Number of parallel environments.
+            frame_shape: Shape of a single frame.
+            ram_budget: Bytes of compressed frames kept in RAM.
+            spill_dir: Directory for spilled segments, a temporary one by
+                default.
+            segment_size: Positions per segment.
+            level: zlib compression level.
+        """
+        self.frame_shape = frame_shape
+        self.ram_budget = ram_budget
+        self._owns_spill_dir = spill_dir is None
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else Path()
+        self._open_spill_dir()
+        self._n_envs = n_envs
+        self._segment_size = segment_size
+        self._level = level
+        n_segments = -(-buffer_size // segment_size)
+        self._segments = [_Segment(segment_size * n_envs) for _ in range(n_segments)]
+        self._ram_bytes = 0
+        self._lock = threading.Lock()
+
+    def _open_spill_dir(self) -> None:
+        """Creates the spill directory, temporary ones with a cleanup hook."""
+        if self._owns_spill_dir:
+            self.spill_dir = Path(tempfile.mkdtemp(prefix="replay-"))
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        else:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the bytes of compressed frames held in RAM."""
+        return self._ram_bytes
+
+    def put(self, pos: int, frames: np.ndarray) -> None:
+        """Compresses and stores the frames of all envs at a position."""
+        blobs = [
+            zlib.compress(np.ascontiguousarray(frame), self._level) for frame in frames
+        ]
+        number, offset = divmod(pos, self._segment_size)
+        with self._lock:
+            segment = self._segments[number]
+            if segment.blobs is None:
+                segment.load()
+                self._ram_bytes += segment.nbytes
+            for env, blob in enumerate(blobs):
+                index = offset * self._n_envs + env
+                delta = len(blob) - len(segment.blobs[index])
+                segment.blobs[index] = blob
+                segment.nbytes += delta
+                self._ram_bytes += delta
+            self._enforce_budget(number)
+
+    def get(self, positions: np.ndarray, envs: np.ndarray) -> np.ndarray:
+        """Decompresses the frames at the given (position, env) pairs."""
+        positions, envs = np.broadcast_arrays(positions, envs)
+        numbers, offsets = np.divmod(positions.ravel(), self._segment_size)
+        indices = offsets * self._n_envs + envs.ravel()
+        with self._lock:
+            blobs = [
+                self._segments[number].blob(index)
+                for number, index in zip(numbers, indices, strict=True)
+            ]
+        out = np.empty((len(blobs), *self.frame_shape), dtype=np.uint8)
+        for row, blob in zip(out, blobs, strict=True):
+            if not len(blob):  # never written, reached by stacks before the start
+                row[...] = 0
+                continue
+            row.ravel()[:] = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+        return out.reshape(*positions.shape, *self.frame_shape)
+
+    def _enforce_budget(self, current: int) -> None:
+        """Spills the coldest segments until the RAM budget is met.
+
+        Segments are written in ring order, so the ones right after the
+        current segment hold the oldest transitions.
+        """
+        n_segments = len(self._segments)
+        for step in range(1, n_segments):
+            if self._ram_bytes <= self.ram_budget:
+                return
+            number = (current + step) % n_segments
+            segment = self._segments[number]
+            if segment.blobs is not None and segment.nbytes:
+                segment.spill(self.spill_dir / f"segment-{number:06d}.bin")
+                self._ram_bytes -= segment.nbytes
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Pickles the store with every segment in RAM and without the lock."""
+        state = self.__dict__.copy()
+        segments = []
+        for segment in self._segments:
+            copy = _Segment(0)
+            copy.nbytes = segment.nbytes
+            copy.blobs = (
+                list(segment.blobs)
+                if segment.blobs is not None
+                else [bytes(segment.blob(i)) for i in range(len(segment.offsets) - 1)]
+            )
+            segments.append(copy)
+        state["_segments"] = segments
+        state["_ram_bytes"] = sum(segment.nbytes for segment in segments)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """Restores a pickled store, spilling again to meet the budget.
+
+        A configured spill directory is kept; a temporary one is replaced by
+        a new temporary directory.
+        """
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._open_spill_dir()
+        with self._lock:
+            self._enforce_budget(0)
+
+
+class CompressedFrameReplayBuffer(FrameReplayBuffer):
+    """Frame-deduplicating replay buffer with compressed, spillable frames.
+
+    Minibatches are gathered and decompressed in a thread pool ahead of time,
+    so ``sample`` usually returns a batch that is already prepared. Because
+    transitions keep being added while a batch is prepared, the ``margin``
+    oldest transitions are never sampled.
+
+    Attributes:
+        prefetch: Number of batches prepared ahead of the learner.
+        margin: Oldest transitions excluded from sampling.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Box,
+        action_space: spaces.Space,
+        device: th.device | str = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        n_stack: int = 1,
+        ram_budget: int = 2 << 30,
+        spill_dir: str | Path | None = None,
+        segment_size: int = 1024,
+        workers: int = 2,
+        prefetch: int = 4,
+        margin: int = 256,
+    ) -> None:
+        """Initialize the replay buffer.
+
+        Args:
+            buffer_size: Maximum number of transitions.
+            observation_space: Observation space, uint8 images or vectors.
+            action_space: Action space.
+            device: PyTorch device of the sampled tensors.
+            n_envs: Number of parallel environments.
+            optimize_memory_usage: Ignored, frames are always deduplicated.
+            handle_timeout_termination: Treat truncated episodes as
+                non-terminal when computing targets.
+            n_stack: Number of stacked frames in each observation.
+            ram_budget: Bytes of compressed frames kept in RAM.
+            spill_dir: Directory for spilled segments.
+            segment_size: Positions per spillable segment.
+            workers: Threads decompressing minibatches.
+            prefetch: Number of batches prepared ahead of the learner.
+            margin: Oldest transitions excluded from sampling.
+        """
+        self._store_kwargs = {
+            "ram_budget": ram_budget,
+            "spill_dir": spill_dir,
+            "segment_size": segment_size,
+        }
+        super().__init__(
+            buffer_size,
+            observation_space,
+            action_space,
+            device,
+            n_envs,
+            optimize_memory_usage,
+            handle_timeout_termination,
+            n_stack,
+        )
+        self.workers = workers
+        self.prefetch = prefetch
+        self.margin = margin
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: deque[tuple[int, Future]] = deque()
+
+    def _make_frame_store(self) -> CompressedFrameStore:
+        """Returns the compressed storage for the frames."""
+        return CompressedFrameStore(
+            self.buffer_size, self.n_envs, self.frame_shape, **self._store_kwargs
+        )
+
+    def sample(
+        self, batch_size: int, env: VecNormalize | None = None
+    ) -> ReplayBufferSamples:
+        """Returns a prefetched minibatch and queues the preparation of more."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, "replay-decompress")
+        if self._pending and self._pending[0][0] != batch_size:
+            self._pending.clear()
+        while len(self._pending) <= self.prefetch:
+            inds = self._sample_indices(batch_size, self.margin)
+            self._pending.append((batch_size, self._pool.submit(self._gather, inds)))
+        _, future = self._pending.popleft()
+        return self._to_samples(future.result(), env)
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Pickles the buffer without its thread pool and pending batches."""
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_pending"] = deque()
+        return state
@@ -0,0 +1,36 @@
+"""Storage for the frames of a replay buffer."""
+
+import numpy as np
+
+
+class FrameStore:
+    """Dense uint8 storage of one frame per (position, env) slot.
+
+    Attributes:
+        frames: Array of shape (buffer_size, n_envs, *frame_shape).
+    """
+
+    def __init__(
+        self, buffer_size: int, n_envs: int, frame_shape: tuple[int, ...]
+    ) -> None:
+        """Initialize the storage.
+
+        Args:
+            buffer_size: Number of positions per env.
+            n_envs: Number of parallel environments.
+            frame_shape: Shape of a single frame.
+        """
+        self.frames = np.zeros((buffer_size, n_envs, *frame_shape), dtype=np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the memory held by the stored frames."""
+        return self.frames.nbytes
+
+    def put(self, pos: int, frames: np.ndarray) -> None:
+        """Stores the frames of all envs at a position."""
+        self.frames[pos] = frames
+
+    def get(self, positions: np.ndarray, envs: np.ndarray) -> np.ndarray:
+        """Returns the frames at the given (position, env) pairs."""
+        return self.frames[positions, envs]
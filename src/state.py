@@ -0,0 +1,225 @@
+"""Snapshots of the simulation state of a Flappy Bird environment.
+
+A :class:`GameState` holds only plain numbers: the player physics, the pipe
+positions, the floor offset, the score and the position on the course. It
+never references Surfaces or the :class:`~src.utils.GameConfig`, so it is cheap
+to capture and can be serialized to a few hundred bytes.
+
+Environments expose this as ``FlappyBirdEnv.clone_state`` and
+``FlappyBirdEnv.restore_state``; :func:`capture_states` and
+:func:`restore_states` do the same for every environment of a vector env, so
+search-based agents and debugging tools can branch from any state.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from itertools import cycle
+import struct
+from typing import TYPE_CHECKING, Any
+
+from src.course import get_course
+from src.entities import PlayerMode
+
+if TYPE_CHECKING:
+    from src.flappy_env import FlappyBirdEnv
+
+# Player attributes captured verbatim, see Player.reset_vals_*
+PLAYER_FIELDS = (
+    "x",
+    "y",
+    "vel_y",
+    "max_vel_y",
+    "min_vel_y",
+    "acc_y",
+    "rot",
+    "vel_rot",
+    "rot_min",
+    "rot_max",
+    "flap_acc",
+)
+
+MODES = tuple(PlayerMode)
+CRASH_ENTITIES = (None, "floor", "pipe")
+WING_CYCLE = (0, 1, 2, 1)
+
+# player fields, animation frame and image index, mode, crash entity, flapped,
+# crashed, done, score, pipe velocity, floor x, floor velocity, course seed,
+# pipe pairs spawned, pipe pairs
+_HEADER = struct.Struct(f"<{len(PLAYER_FIELDS)}dII5BIdddQIH")
+_PIPE = struct.Struct("<dddd")
+
+
+@dataclass(frozen=True, slots=True)
+class GameState:
+    """Snapshot of the simulation state of one environment.
+
+    Attributes:
+        player: Values of the PLAYER_FIELDS attributes of the player.
+        animation: Animation frame count and wing image index of the player.
+        mode: Player mode.
+        crash_entity: Entity the player crashed into, if any.
+        flapped: True if the player flapped during the current tick.
+        crashed: True if the player crashed.
+        pipes: (upper x, upper y, lower x, lower y) of every pipe pair.
+        pipe_vel_x: Horizontal velocity shared by all pipes.
+        floor: (x, vel_x) of the floor.
+        score: Current score.
+        done: True if the episode has terminated.
+        course: Seed of the pipe course and number of pipe pairs spawned from
+            it, see :class:`~src.course.Course`.
+    """
+
+    player: tuple[float, ...]
+    animation: tuple[int, int]
+    mode: PlayerMode
+    crash_entity: str | None
+    flapped: bool
+    crashed: bool
+    pipes: tuple[tuple[float, float, float, float], ...]
+    pipe_vel_x: float
+    floor: tuple[float, float]
+    score: int
+    done: bool
+    course: tuple[int, int]
+
+    def to_bytes(self) -> bytes:
+        """Serializes the state into a compact binary blob."""
+        header = _HEADER.pack(
+            *self.player,
+            *self.animation,
+            MODES.index(self.mode),
+            CRASH_ENTITIES.index(self.crash_entity),
+            self.flapped,
+            self.crashed,
+            self.done,
+            self.score,
+            self.pipe_vel_x,
+            *self.floor,
+            *self.course,
+            len(self.pipes),
+        )
+        return header + b"".join(_PIPE.pack(*pipe) for pipe in self.pipes)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameState":
+        """Deserializes a state written by :meth:`to_bytes`."""
+        values = _HEADER.unpack_from(data)
+        player = values[: len(PLAYER_FIELDS)]
+        frame, img_idx, mode, crash, flapped, crashed, done, score = values[
+            len(PLAYER_FIELDS) : len(PLAYER_FIELDS) + 8
+        ]
+        vel_x, floor_x, floor_vel, seed, spawned, n = values[len(PLAYER_FIELDS) + 8 :]
+        pipes = tuple(
+            _PIPE.unpack_from(data, _HEADER.size + i * _PIPE.size) for i in range(n)
+        )
+        return cls(
+            player=player,
+            animation=(frame, img_idx),
+            mode=MODES[mode],
+            crash_entity=CRASH_ENTITIES[crash],
+            flapped=bool(flapped),
+            crashed=bool(crashed),
+            pipes=pipes,
+            pipe_vel_x=vel_x,
+            floor=(floor_x, floor_vel),
+            score=score,
+            done=bool(done),
+            course=(seed, spawned),
+        )
+
+
+def capture_state(env: "FlappyBirdEnv") -> GameState:
+    """Captures the simulation state of an environment."""
+    player = env.player
+    pipes = env.pipes
+    return GameState(
+        player=tuple(getattr(player, name) for name in PLAYER_FIELDS),
+        animation=(player.frame, player.img_idx),
+        mode=player.mode,
+        crash_entity=player.crash_entity,
+        flapped=player.flapped,
+        crashed=player.crashed,
+        pipes=tuple(
+            (up.x, up.y, low.x, low.y)
+            for up, low in zip(pipes.upper, pipes.lower, strict=True)
+        ),
+        pipe_vel_x=pipes.upper[0].vel_x if pipes.upper else 0,
+        floor=(env.floor.x, env.floor.vel_x),
+        score=env.score.score,
+        done=env.done,
+        course=(pipes.course.seed, pipes.spawned),
+    )
+
+
+def restore_state(env: "FlappyBirdEnv", state: GameState) -> None:
+    """Restores a state captured by :func:`capture_state` into an environment.
+
+    The environment must have been reset at least once, and must use the same
+    sprites as the one the state was captured from. The course is looked up
+    by its seed, so states of courses passed to ``reset`` as an option must be
+    restored into an environment flying that course. The environment RNG,
+    which only seeds the courses of unseeded resets, is not restored.
+    """
+    player = env.player
+    for name, value in zip(PLAYER_FIELDS, state.player, strict=True):
+        setattr(player, name, value)
+    player.frame, player.img_idx = state.animation
+    player.mode = state.mode
+    player.crash_entity = state.crash_entity
+    player.flapped = state.flapped
+    player.crashed = state.crashed
+    player.image = env.config.images.player[player.img_idx]
+    if state.mode == PlayerMode.CRASH:
+        player.img_gen = cycle([player.img_idx])
+    else:
+        # the wing animation advances once every five rendered frames
+        start = (player.frame // 5) % len(WING_CYCLE)
+        player.img_gen = cycle(WING_CYCLE[start:] + WING_CYCLE[:start])
+
+    # reuse the existing pipe objects, recycling or taking the surplus
+    pipes = env.pipes
+    seed, pipes.spawned = state.course
+    if pipes.course.seed != seed:
+        pipes.course = get_course(seed, *pipes.gap_range)
+    pipes.resize(len(state.pipes))
+    for upper, lower, (up_x, up_y, low_x, low_y) in zip(
+        pipes.upper, pipes.lower, state.pipes, strict=True
+    ):
+        upper.x, upper.y, lower.x, lower.y = up_x, up_y, low_x, low_y
+        upper.vel_x = lower.vel_x = state.pipe_vel_x
+
+    env.floor.x, env.floor.vel_x = state.floor
+    env.score.score = state.score
+    env.done = state.done
+
+
+def _game_envs(envs: Any) -> list["FlappyBirdEnv"]:
+    """Returns the unwrapped games of a vector env or a sequence of envs."""
+    if not isinstance(envs, Sequence):
+        envs = envs.envs  # Gymnasium SyncVectorEnv and SB3 DummyVecEnv
+    return [env.unwrapped for env in envs]
+
+
+def capture_states(envs: Any) -> list[GameState]:
+    """Captures the states of all environments of a vector env.
+
+    Args:
+        envs: Environments, or a vector env holding them in ``envs`` such as
+            Gymnasium's ``SyncVectorEnv`` or Stable-Baselines3's ``DummyVecEnv``.
+    """
+    return [capture_state(env) for env in _game_envs(envs)]
+
+
+def restore_states(envs: Any, states: Sequence[GameState]) -> None:
+    """Restores one state per environment of a vector env.
+
+    Vector envs keep the last observation of every environment, which still
+    shows the frame before the restore until the next step.
+
+    Args:
+        envs: Environments or vector env, as for :func:`capture_states`.
+        states: States captured by :func:`capture_state` or
+            :func:`capture_states`.
+    """
+    for env, state in zip(_game_envs(envs), states, strict=True):
+        restore_state(env, state)
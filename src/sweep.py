@@ -0,0 +1,375 @@
+"""Local hyperparameter sweeps of the DQN agent.
+
+Trials sample hyperparameters of :func:`src.agent.train` from a search space
+and run in a process pool, each pinned to its own set of cores with matching
+thread limits. Every ``eval_interval`` steps a trial plays a few seeded
+episodes with the :data:`~src.utils.constants.EVAL_SPRITES` and reports the
+mean return; trials whose return is below the median of the completed trials
+at the same step are pruned, as with a median pruner. Trials and their
+intermediate results live in a SQLite database, so interrupted sweeps can be
+continued and configs that already completed or were pruned are skipped on
+reruns.
+
+A search space maps parameter names to a list of choices or to a range
+``{"low": 500, "high": 5000, "log": true, "int": true}``. Run with
+``python src/sweep.py --space space.json --trials 20 --workers 4``.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import multiprocessing as mp
+import os
+from pathlib import Path
+import sqlite3
+import statistics
+import time
+from typing import Any
+
+import numpy as np
+
+from src.flappy_env import ENV_VERSION, FlappyBirdEnv
+from src.utils.constants import EVAL_SPRITES
+
+SearchSpace = dict[str, list[Any] | dict[str, Any]]
+
+DEFAULT_SPACE: SearchSpace = {
+    "buffer_size": [20000, 50000, 100000],
+    "learning_starts": {"low": 500, "high": 10000, "log": True, "int": True},
+    "batch_size": [32, 64, 128],
+    "target_update_interval": {"low": 250, "high": 5000, "log": True, "int": True},
+}
+
+# BLAS thread limits, read once when numpy is imported
+_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    config_key TEXT UNIQUE NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    value REAL,
+    started REAL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    trial_id INTEGER NOT NULL REFERENCES trials(id),
+    step INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (trial_id, step)
+);
+"""
+
+
+def sample_configs(
+    space: SearchSpace, n_trials: int, seed: int = 0
+) -> list[dict[str, Any]]:
+    """Draws hyperparameter configs from a search space.
+
+    The draws only depend on the seed, so rerunning a sweep yields the same
+    configs and finished ones can be recognized.
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n_trials):
+        config = {}
+        for name, spec in sorted(space.items()):
+            if isinstance(spec, list):
+                config[name] = spec[rng.integers(len(spec))]
+                continue
+            low, high = spec["low"], spec["high"]
+            if spec.get("log"):
+                value = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+            else:
+                value = float(rng.uniform(low, high))
+            config[name] = round(value) if spec.get("int") else value
+        configs.append(config)
+    return configs
+
+
+def config_key(params: dict[str, Any], budget: dict[str, Any]) -> str:
+    """Returns the identity of a trial: its params, budget and env version."""
+    payload = json.dumps(
+        {"params": params, "budget": budget, "env_version": ENV_VERSION},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SweepStore:
+    """SQLite store of trials shared by the processes of a sweep."""
+
+    def __init__(self, path: str | Path) -> None:
+        """Opens or creates the store."""
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def is_finished(self, key: str) -> bool:
+        """Returns True if the trial of a config completed or was pruned."""
+        row = self._db.execute(
+            "SELECT state FROM trials WHERE config_key = ?", (key,)
+        ).fetchone()
+        return row is not None and row[0] in ("complete", "pruned")
+
+    def start(self, key: str, params: dict[str, Any]) -> int:
+        """Registers a running trial, discarding an interrupted earlier run."""
+        with self._db:
+            row = self._db.execute(
+                "SELECT id FROM trials WHERE config_key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM reports WHERE trial_id = ?", row)
+                self._db.execute("DELETE FROM trials WHERE id = ?", row)
+            cursor = self._db.execute(
+                "INSERT INTO trials (config_key, params, state, started) "
+                "VALUES (?, ?, 'running', ?)",
+                (key, json.dumps(params), time.time()),
+            )
+        return cursor.lastrowid
+
+    def report(self, trial_id: int, step: int, value: float) -> None:
+        """Stores an intermediate result of a trial."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO reports VALUES (?, ?, ?)", (trial_id, step, value)
+        )
+
+    def should_prune(
+        self, trial_id: int, step: int, value: float, min_trials: int
+    ) -> bool:
+        """Returns True if a result is below the median of completed trials.
+
+        Args:
+            trial_id: Trial that reported the result.
+            step: Step of the result.
+            value: Reported result.
+            min_trials: Completed trials needed before anything is pruned.
+        """
+        rows = self._db.execute(
+            "SELECT r.value FROM reports r JOIN trials t ON t.id = r.trial_id "
+            "WHERE t.state = 'complete' AND r.step = ? AND t.id != ?",
+            (step, trial_id),
+        ).fetchall()
+        if len(rows) < min_trials:
+            return False
+        return value < statistics.median(row[0] for row in rows)
+
+    def finish(self, trial_id: int, state: str, value: float | None) -> None:
+        """Marks a trial as complete or pruned with its last result."""
+        self._db.execute(
+            "UPDATE trials SET state = ?, value = ?, finished = ? WHERE id = ?",
+            (state, value, time.time(), trial_id),
+        )
+
+    def results(self) -> list[dict[str, Any]]:
+        """Returns all finished trials, best first."""
+        rows = self._db.execute(
+            "SELECT params, state, value FROM trials "
+            "WHERE state IN ('complete', 'pruned') ORDER BY state, value DESC"
+        ).fetchall()
+        return [
+            {"params": json.loads(params), "state": state, "value": value}
+            for params, state, value in rows
+        ]
+
+
+def mean_return(
+    model: Any, env: FlappyBirdEnv, episodes: int, max_steps: int = 2000
+) -> float:
+    """Returns the mean greedy return in ``env`` on seeds 0..episodes-1."""
+    returns = []
+    for seed in range(episodes):
+        obs, _ = env.reset(seed=seed)
+        total, done, steps = 0.0, False, 0
+        while not done and steps < max_steps:
+            action, _ = model.predict(np.asarray(obs), deterministic=True)
+            obs, reward, done, _, _ = env.step(int(action))
+            total += reward
+            steps += 1
+        returns.append(total)
+    return float(np.mean(returns))
+
+
+def _pin_worker(cores: mp.Queue) -> None:
+    """Pins a worker process to its core set and limits its torch threads.
+
+    The BLAS limits are set by :func:`run_sweep` before the worker starts.
+    """
+    allowed = cores.get()
+    os.sched_setaffinity(0, allowed)
+
+    import torch
+
+    torch.set_num_threads(len(allowed))
+    torch.set_num_interop_threads(1)
+
+
+def _run_trial(
+    params: dict[str, Any],
+    budget: dict[str, Any],
+    store_path: str,
+    min_trials: int,
+) -> str:
+    """Trains one config, reporting to the store, and returns its final state."""
+    from stable_baselines3.common.callbacks import BaseCallback
+
+    from src.agent import train
+
+    store = SweepStore(store_path)
+    trial_id = store.start(config_key(params, budget), params)
+    last = {"value": None, "pruned": False}
+
+    class Reporter(BaseCallback):
+        """Evaluates the model periodically and stops pruned trials.
+
+        All evaluations of a trial share one environment with the sprites of
+        the budget. It lives only as long as the training environments, since
+        :func:`~src.agent.train` closing those quits pygame.
+        """
+
+        def _on_training_start(self) -> None:
+            self.eval_env = FlappyBirdEnv(render_mode=None)
+            self.eval_env.config.images.load_variant(*budget["eval_sprites"])
+
+        def _on_step(self) -> bool:
+            if self.num_timesteps % budget["eval_interval"]:
+                return True
+            value = mean_return(self.model, self.eval_env, budget["eval_episodes"])
+            store.report(trial_id, self.num_timesteps, value)
+            last["value"] = value
+            if store.should_prune(trial_id, self.num_timesteps, value, min_trials):
+                last["pruned"] = True
+            return not last["pruned"]
+
+        def _on_training_end(self) -> None:
+            if not last["pruned"]:
+                value = mean_return(self.model, self.eval_env, budget["eval_episodes"])
+                store.report(trial_id, budget["timesteps"], value)
+                last["value"] = value
+            self.eval_env.close()
+
+    train(budget["timesteps"], callback=Reporter(), seed=0, **params)
+    state = "pruned" if last["pruned"] else "complete"
+    store.finish(trial_id, state, last["value"])
+    return state
+
+
+def run_sweep(
+    space: SearchSpace,
+    store_path: str | Path = "sweep.db",
+    n_trials: int = 20,
+    workers: int = 1,
+    cores_per_trial: int = 1,
+    timesteps: int = 50000,
+    eval_interval: int = 10000,
+    eval_episodes: int = 5,
+    min_trials: int = 3,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """Runs the trials of a sweep that have not finished yet.
+
+    Args:
+        space: Search space of the hyperparameters.
+        store_path: SQLite database of the sweep.
+        n_trials: Number of configs drawn from the space.
+        workers: Trials run at the same time, capped by the available cores.
+        cores_per_trial: Cores each trial is pinned to.
+        timesteps: Training steps of a trial.
+        eval_interval: Steps between intermediate evaluations.
+        eval_episodes: Episodes of every evaluation.
+        min_trials: Completed trials needed before pruning starts.
+        seed: Seed of the config draws.
+
+    Returns:
+        All finished trials of the store, best first.
+    """
+    budget = {
+        "timesteps": timesteps,
+        "eval_interval": eval_interval,
+        "eval_episodes": eval_episodes,
+        "eval_sprites": list(EVAL_SPRITES),
+    }
+    store = SweepStore(store_path)
+    configs = sample_configs(space, n_trials, seed)
+    todo = [c for c in configs if not store.is_finished(config_key(c, budget))]
+    print(f"{len(configs) - len(todo)} of {len(configs)} trials already finished")
+
+    available = sorted(os.sched_getaffinity(0))
+    core_sets = [
+        available[i : i + cores_per_trial]
+        for i in range(0, len(available) - cores_per_trial + 1, cores_per_trial)
+    ]
+    workers = max(1, min(workers, len(core_sets)))
+    ctx = mp.get_context("spawn")
+    cores = ctx.Queue()
+    for core_set in core_sets[:workers]:
+        cores.put(core_set)
+
+    if todo:
+        # spawned workers import numpy before their initializer runs, so the
+        # BLAS limits must already be in the environment they inherit
+        saved = {name: os.environ.get(name) for name in _THREAD_VARS}
+        os.environ.update(dict.fromkeys(_THREAD_VARS, str(cores_per_trial)))
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=ctx,
+                initializer=_pin_worker,
+                initargs=(cores,),
+            ) as pool:
+                states = pool.map(
+                    _run_trial,
+                    todo,
+                    [budget] * len(todo),
+                    [str(store_path)] * len(todo),
+                    [min_trials] * len(todo),
+                )
+                for params, state in zip(todo, states, strict=True):
+                    print(f"{state:<9} {params}")
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    return store.results()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="DQN hyperparameter sweep")
+    parser.add_argument("--space", help="JSON search space, a default one if unset.")
+    parser.add_argument("--db", default="sweep.db", help="SQLite store.")
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cores-per-trial", type=int, default=1)
+    parser.add_argument("--timesteps", type=int, default=50000)
+    parser.add_argument("--eval-interval", type=int, default=10000)
+    parser.add_argument("--eval-episodes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs a sweep and prints the best trials."""
+    args = parse_args()
+    space = json.loads(Path(args.space).read_text()) if args.space else DEFAULT_SPACE
+    results = run_sweep(
+        space,
+        args.db,
+        args.trials,
+        args.workers,
+        args.cores_per_trial,
+        args.timesteps,
+        args.eval_interval,
+        args.eval_episodes,
+        seed=args.seed,
+    )
+    for result in results[:5]:
+        print(f"{result['state']:<9} {result['value']:>8.1f} {result['params']}")
+
+
+if __name__ == "__main__":
+    main()
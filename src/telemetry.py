@@ -0,0 +1,348 @@
+"""Low-overhead throughput telemetry of training runs.
+
+Every thread that takes part in training records into its own
+:class:`Recorder`, a fixed-size ring of (phase, duration) samples plus a few
+counters. The recording thread is the only writer of its ring and publishes a
+sample by advancing the ring's head after writing it, so recording takes no
+lock; a background thread of :class:`Telemetry` reads the new samples every
+``interval`` seconds and writes, per window:
+
+* env steps and gradient updates per second,
+* the share of wall time spent in every phase,
+* the p50 and p99 duration of every phase, e.g. of replay sampling,
+* the estimated share of wall time spent recording telemetry.
+
+Metrics are appended to a CSV file, or written as a Prometheus textfile when
+the path ends in ``.prom``. A recorded span costs well under a microsecond,
+which is below 1% of the millisecond-scale env steps and updates it times.
+
+:class:`TelemetryCallback` instruments Stable-Baselines3 training; the native
+loop of :mod:`src.train` records its phases directly.
+"""
+
+import csv
+from pathlib import Path
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+class _Span:
+    """Reusable context manager recording the duration of one phase."""
+
+    __slots__ = ("_phase", "_recorder", "_start")
+
+    def __init__(self, recorder: "Recorder", phase: str) -> None:
+        """Initialize the span of a phase."""
+        self._recorder = recorder
+        self._phase = phase
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        """Starts timing."""
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Records the time since :meth:`__enter__`."""
+        self._recorder.record(self._phase, time.perf_counter() - self._start)
+
+
+class Recorder:
+    """Single-writer ring of phase durations and counters of one thread.
+
+    Attributes:
+        capacity: Number of samples the ring holds; samples that are not read
+            before the ring wraps around are dropped.
+        counters: Running totals, e.g. of env steps.
+    """
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        """Initialize an empty ring."""
+        self.capacity = capacity
+        self.counters: dict[str, int] = {}
+        self._phases: list[str] = [""] * capacity
+        self._durations: list[float] = [0.0] * capacity
+        self._head = 0
+        self._spans: dict[str, _Span] = {}
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Appends the duration of a phase."""
+        i = self._head % self.capacity
+        self._phases[i] = phase
+        self._durations[i] = seconds
+        self._head += 1  # publishes the sample to the reader
+
+    def span(self, phase: str) -> _Span:
+        """Returns a context manager timing a phase.
+
+        Spans are cached per phase, so one phase must not be nested in itself.
+        """
+        span = self._spans.get(phase)
+        if span is None:
+            span = self._spans[phase] = _Span(self, phase)
+        return span
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Adds to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def read(self, start: int) -> tuple[int, list[str], list[float], int]:
+        """Returns the samples recorded since ``start``.
+
+        Returns:
+            The new head to pass next time, the phases and durations of the
+            samples, and the number of samples that were overwritten unread.
+        """
+        head = self._head
+        dropped = max(0, head - start - self.capacity)
+        start += dropped
+        a, b = start % self.capacity, head % self.capacity
+        if head - start == 0:
+            return head, [], [], dropped
+        if a < b:
+            return head, self._phases[a:b], self._durations[a:b], dropped
+        phases = self._phases[a:] + self._phases[:b]
+        return head, phases, self._durations[a:] + self._durations[:b], dropped
+
+
+def _span_cost(samples: int = 2000) -> float:
+    """Returns the measured cost in seconds of recording one span."""
+    span = Recorder(samples).span("calibration")
+    start = time.perf_counter()
+    for _ in range(samples):
+        with span:
+            pass
+    return (time.perf_counter() - start) / samples
+
+
+class Telemetry:
+    """Collects the recorders of a training run and flushes their metrics.
+
+    Attributes:
+        path: Metrics file, None to only keep the latest window in memory.
+        interval: Seconds between flushes of the background thread.
+        latest: Metrics of the most recent window.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        interval: float = 10.0,
+        capacity: int = 1 << 16,
+    ) -> None:
+        """Initialize the telemetry; call :meth:`start` to flush periodically."""
+        self.path = Path(path) if path is not None else None
+        self.interval = interval
+        self.capacity = capacity
+        self.latest: dict[str, Any] = {}
+        self._recorders: list[Recorder] = []
+        self._heads: list[int] = []
+        self._counters: dict[str, int] = {}
+        self._phase_totals: dict[str, float] = {}
+        self._lock = threading.Lock()  # guards registration and flushing
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._span_cost = _span_cost()
+        self._last_flush = time.perf_counter()
+
+    def recorder(self) -> Recorder:
+        """Returns a new recorder for the calling thread."""
+        recorder = Recorder(self.capacity)
+        with self._lock:
+            self._recorders.append(recorder)
+            self._heads.append(0)
+        return recorder
+
+    def start(self) -> "Telemetry":
+        """Starts flushing every ``interval`` seconds in a background thread."""
+        self._last_flush = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stops the background thread and flushes the last window."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        """Flushes until :meth:`close` is called."""
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> dict[str, Any]:
+        """Aggregates the samples since the last flush and writes them out.
+
+        Returns:
+            The metrics of the window, also kept in :attr:`latest`.
+        """
+        with self._lock:
+            now = time.perf_counter()
+            wall = max(now - self._last_flush, 1e-9)
+            self._last_flush = now
+            durations: dict[str, list[float]] = {}
+            samples = dropped = 0
+            counters: dict[str, int] = {}
+            for i, recorder in enumerate(self._recorders):
+                self._heads[i], phases, seconds, lost = recorder.read(self._heads[i])
+                samples += len(phases) + lost
+                dropped += lost
+                for phase, duration in zip(phases, seconds, strict=True):
+                    durations.setdefault(phase, []).append(duration)
+                for name, total in recorder.counters.copy().items():
+                    counters[name] = counters.get(name, 0) + total
+
+            metrics: dict[str, Any] = {"time": time.time(), "window_s": wall}
+            for name, total in counters.items():
+                metrics[f"{name}_per_s"] = (total - self._counters.get(name, 0)) / wall
+            self._counters = counters
+            phases_metrics = {}
+            for phase, values in sorted(durations.items()):
+                total = float(np.sum(values))
+                self._phase_totals[phase] = self._phase_totals.get(phase, 0.0) + total
+                p50, p99 = np.percentile(values, (50, 99)).tolist()
+                phases_metrics[phase] = {
+                    "count": len(values),
+                    "share": total / wall,
+                    "p50_ms": p50 * 1e3,
+                    "p99_ms": p99 * 1e3,
+                    "seconds_total": self._phase_totals[phase],
+                }
+            metrics["phases"] = phases_metrics
+            metrics["dropped"] = dropped
+            metrics["overhead_share"] = samples * self._span_cost / wall
+            self.latest = metrics
+            if self.path is not None:
+                self._write(metrics)
+            return metrics
+
+    def _write(self, metrics: dict[str, Any]) -> None:
+        """Writes the metrics of a window to :attr:`path`."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.suffix == ".prom":
+            tmp = self.path.with_suffix(".prom.tmp")
+            tmp.write_text(format_prometheus(metrics))
+            tmp.replace(self.path)  # the textfile collector must never see halves
+            return
+        new = not self.path.exists()
+        with self.path.open("a", newline="") as file:
+            writer = csv.writer(file)
+            if new:
+                writer.writerow(["time", "metric", "phase", "value"])
+            for name, value in metrics.items():
+                if name not in ("time", "phases"):
+                    writer.writerow([f"{metrics['time']:.3f}", name, "", value])
+            for phase, values in metrics["phases"].items():
+                for name, value in values.items():
+                    writer.writerow([f"{metrics['time']:.3f}", name, phase, value])
+
+
+def format_prometheus(metrics: dict[str, Any], prefix: str = "flappy_train") -> str:
+    """Formats the metrics of a window in the Prometheus text format."""
+    lines = []
+    for name, value in metrics.items():
+        if name in ("time", "phases"):
+            continue
+        lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+    phase_metrics = {
+        "count": "gauge",
+        "share": "gauge",
+        "p50_ms": "gauge",
+        "p99_ms": "gauge",
+        "seconds_total": "counter",
+    }
+    for name, kind in phase_metrics.items():
+        lines.append(f"# TYPE {prefix}_phase_{name} {kind}")
+        for phase, values in metrics["phases"].items():
+            lines.append(f'{prefix}_phase_{name}{{phase="{phase}"}} {values[name]}')
+    return "\n".join(lines) + "\n"
+
+
+class _TimedSample:
+    """Replay buffer ``sample`` method timed by a span.
+
+    Pickles as the plain method, so buffers can still be saved while timed.
+    """
+
+    def __init__(self, method: Any, span: _Span) -> None:
+        """Initialize the timed method."""
+        self.method = method
+        self.span = span
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        """Samples and records the latency."""
+        with self.span:
+            return self.method(*args, **kwargs)
+
+    def __reduce__(self) -> tuple:
+        """Pickles as the bound method of the buffer."""
+        return getattr, (self.method.__self__, self.method.__name__)
+
+
+class TelemetryCallback(BaseCallback):
+    """Records the throughput of Stable-Baselines3 off-policy training.
+
+    SB3 alternates between collecting a rollout and training on the replay
+    buffer, so the callback times the ``rollout`` phase between the rollout
+    callbacks and the ``train`` phase between two rollouts, and times every
+    replay ``sample`` call. Nothing is done per env step.
+
+    Attributes:
+        telemetry: Telemetry the metrics are flushed by.
+    """
+
+    def __init__(
+        self, path: str | Path | None = None, interval: float = 10.0, verbose: int = 0
+    ) -> None:
+        """Initialize the callback writing metrics to ``path``."""
+        super().__init__(verbose)
+        self.telemetry = Telemetry(path, interval)
+        self._recorder = self.telemetry.recorder()
+        self._rollout_start = self._rollout_end = 0.0
+        self._steps = self._updates = 0
+
+    def _on_training_start(self) -> None:
+        """Starts flushing and times the sampling of the replay buffer."""
+        buffer = self.model.replay_buffer
+        if buffer is not None:
+            buffer.sample = _TimedSample(buffer.sample, self._recorder.span("sample"))
+        self._steps = self.num_timesteps
+        self._updates = getattr(self.model, "_n_updates", 0)
+        self.telemetry.start()
+
+    def _on_rollout_start(self) -> None:
+        """Ends the train phase and counts the updates it ran."""
+        now = time.perf_counter()
+        if self._rollout_end:
+            self._recorder.record("train", now - self._rollout_end)
+        updates = getattr(self.model, "_n_updates", 0)
+        self._recorder.count("updates", updates - self._updates)
+        self._updates = updates
+        self._rollout_start = now
+
+    def _on_step(self) -> bool:
+        """Does nothing; steps are counted per rollout."""
+        return True
+
+    def _on_rollout_end(self) -> None:
+        """Ends the rollout phase and counts its env steps."""
+        self._rollout_end = time.perf_counter()
+        self._recorder.record("rollout", self._rollout_end - self._rollout_start)
+        self._recorder.count("env_steps", self.num_timesteps - self._steps)
+        self._steps = self.num_timesteps
+
+    def _on_training_end(self) -> None:
+        """Restores the replay buffer and flushes the last window."""
+        buffer = self.model.replay_buffer
+        if buffer is not None and isinstance(
+            buffer.__dict__.get("sample"), _TimedSample
+        ):
+            del buffer.sample
+        self.telemetry.close()
@@ -0,0 +1,385 @@
+"""Native DQN training loop for the network in :mod:`src.model`.
+
+A batch of headless environments is stepped in the main thread with one
+batched forward pass per step for epsilon-greedy action selection, while a
+learner thread samples minibatches from a :class:`~src.replay.FrameReplayBuffer`
+and runs the gradient updates. PyTorch releases the GIL inside its kernels, so
+rasterizing and stepping the environments overlaps with the updates. The
+learner keeps to one update per ``train_freq`` transitions; the actor waits
+when it gets too far ahead. With ``--metrics`` the time spent in every phase
+is recorded by :mod:`src.telemetry` and flushed to a metrics file.
+
+Run with ``python src/train.py --num-envs 8 --steps 200000``.
+"""
+
+import argparse
+from collections import deque
+import copy
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+import threading
+import time
+from typing import Any
+
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+import torch
+import torch.nn.functional as F  # noqa: N812
+
+from src.flappy_env import FlappyBirdEnv
+from src.model import DQN
+from src.observation import FrameStack, materialize_batch, preprocess
+from src.replay import FrameReplayBuffer
+from src.telemetry import Recorder, Telemetry
+
+
+@dataclass
+class TrainConfig:
+    """Hyperparameters of the native training loop."""
+
+    num_envs: int = 8
+    total_steps: int = 200_000
+    n_stack: int = 4
+    scale: int = 4
+    buffer_size: int = 100_000
+    batch_size: int = 32
+    learning_starts: int = 1_000
+    train_freq: int = 4
+    max_lag: int = 256
+    gamma: float = 0.99
+    learning_rate: float = 1e-4
+    target_update_interval: int = 1_000
+    actor_sync_interval: int = 10
+    exploration_fraction: float = 0.1
+    exploration_final_eps: float = 0.05
+    torch_threads: int | None = None
+    seed: int | None = None
+    log_interval: float = 10.0
+    metrics_path: str | None = None
+
+
+@dataclass
+class TrainStats:
+    """Progress counters of a training run."""
+
+    steps: int = 0
+    updates: int = 0
+    episodes: int = 0
+    elapsed: float = 0.0
+    scores: deque[int] = field(default_factory=lambda: deque(maxlen=100))
+
+    @property
+    def steps_per_s(self) -> float:
+        """Returns the environment transitions collected per second."""
+        return self.steps / max(self.elapsed, 1e-9)
+
+    @property
+    def updates_per_s(self) -> float:
+        """Returns the gradient updates per second."""
+        return self.updates / max(self.elapsed, 1e-9)
+
+    @property
+    def mean_score(self) -> float:
+        """Returns the mean score of the last 100 episodes."""
+        return float(np.mean(self.scores)) if self.scores else 0.0
+
+
+def make_network(config: TrainConfig, env: FlappyBirdEnv) -> DQN:
+    """Returns a DQN sized for the preprocessed frame stacks of an env."""
+    height, width, _ = env.observation_space.shape
+    input_shape = (
+        config.n_stack,
+        -(-height // config.scale),
+        -(-width // config.scale),
+    )
+    return DQN(input_shape, int(env.action_space.n))
+
+
+def save_checkpoint(path: str | Path, net: DQN, config: TrainConfig) -> None:
+    """Saves the network weights with what is needed to rebuild and feed it."""
+    torch.save(
+        {
+            "state_dict": net.state_dict(),
+            "input_shape": net.input_shape,
+            "num_actions": net.num_actions,
+            "config": asdict(config),
+        },
+        path,
+    )
+
+
+def td_update(
+    net: DQN,
+    target: DQN,
+    optimizer: torch.optim.Optimizer,
+    batch: ReplayBufferSamples,
+    gamma: float,
+) -> float:
+    """Runs one DQN gradient step with a Huber loss on a minibatch.
+
+    Returns:
+        The loss before the step.
+    """
+    obs = batch.observations.float().div_(255)
+    next_obs = batch.next_observations.float().div_(255)
+    with torch.no_grad():
+        next_q = target(next_obs).max(dim=1, keepdim=True).values
+        target_q = batch.rewards + gamma * (1 - batch.dones) * next_q
+    q = net(obs).gather(1, batch.actions.long())
+    loss = F.smooth_l1_loss(q, target_q)
+    optimizer.zero_grad(set_to_none=True)
+    loss.backward()
+    torch.nn.utils.clip_grad_norm_(net.parameters(), 10.0)
+    optimizer.step()
+    return loss.item()
+
+
+def load_checkpoint(path: str | Path) -> tuple[DQN, dict[str, Any]]:
+    """Loads a network saved by :func:`save_checkpoint` with its config dict."""
+    saved = torch.load(path, map_location="cpu")
+    net = DQN(tuple(saved["input_shape"]), saved["num_actions"])
+    net.load_state_dict(saved["state_dict"])
+    return net, saved["config"]
+
+
+class Trainer:
+    """Trains a :class:`~src.model.DQN` on a batch of Flappy Bird envs.
+
+    Attributes:
+        config: Hyperparameters.
+        envs: Headless environments stepped in lockstep.
+        net: Online network trained by the learner thread.
+        target: Target network.
+        actor: Copy of the online network used for action selection.
+        buffer: Replay buffer of preprocessed frame stacks.
+        stats: Progress counters.
+        telemetry: Phase timings of the actor and the learner.
+    """
+
+    def __init__(self, config: TrainConfig) -> None:
+        """Initialize the environments, networks and replay buffer."""
+        self.config = config
+        if config.torch_threads:
+            torch.set_num_threads(config.torch_threads)
+        self.envs = [FlappyBirdEnv(render_mode=None) for _ in range(config.num_envs)]
+        self.rng = np.random.default_rng(config.seed)
+
+        self.net = make_network(config, self.envs[0])
+        self.target = copy.deepcopy(self.net)
+        self.actor = copy.deepcopy(self.net)
+        self.optimizer = torch.optim.Adam(
+            self.net.parameters(), lr=config.learning_rate
+        )
+
+        _, height, width = self.net.input_shape
+        self.stack = FrameStack(config.num_envs, config.n_stack, (height, width))
+        self.buffer = FrameReplayBuffer(
+            config.buffer_size,
+            spaces.Box(0, 255, self.net.input_shape, np.uint8),
+            self.envs[0].action_space,
+            device="cpu",
+            n_envs=config.num_envs,
+            n_stack=config.n_stack,
+        )
+        self._rgb = np.empty(
+            (config.num_envs, *self.envs[0].observation_space.shape), dtype=np.uint8
+        )
+        self.stats = TrainStats()
+        self.telemetry = Telemetry(config.metrics_path, config.log_interval)
+
+        self._buffer_lock = threading.Lock()
+        self._actor_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._stop = False
+        self._error: BaseException | None = None
+
+    def epsilon(self) -> float:
+        """Returns the exploration rate at the current step."""
+        config = self.config
+        progress = self.stats.steps / (config.exploration_fraction * config.total_steps)
+        return max(config.exploration_final_eps, 1.0 - progress * 0.95)
+
+    def act(self, obs: np.ndarray) -> np.ndarray:
+        """Selects epsilon-greedy actions for all envs with one forward pass."""
+        with self._actor_lock, torch.no_grad():
+            q_values = self.actor(torch.from_numpy(obs).float().div_(255))
+        actions = q_values.argmax(dim=1).numpy()
+        explore = self.rng.random(len(actions)) < self.epsilon()
+        actions[explore] = self.rng.integers(0, 2, explore.sum())
+        return actions
+
+    def train(self) -> TrainStats:
+        """Runs the training loop until ``total_steps`` transitions are collected.
+
+        Returns:
+            The final progress counters.
+        """
+        start = time.perf_counter()
+        learner = threading.Thread(target=self._learn_loop, daemon=True)
+        self.telemetry.start()
+        learner.start()
+        try:
+            self._collect(start)
+        finally:
+            with self._progress:
+                self._stop = True
+                self._progress.notify_all()
+            learner.join()
+            self.telemetry.close()
+            self.stats.elapsed = time.perf_counter() - start
+        if self._error is not None:
+            raise RuntimeError("learner thread failed") from self._error
+        return self.stats
+
+    def _collect(self, start: float) -> None:
+        """Steps the environments and fills the replay buffer."""
+        config, stats = self.config, self.stats
+        recorder = self.telemetry.recorder()
+        act, step = recorder.span("act"), recorder.span("env_step")
+        prep, store = recorder.span("preprocess"), recorder.span("store")
+        wait = recorder.span("actor_wait")
+        seeds = self.rng.integers(0, 2**31, size=config.num_envs)
+        first = [
+            env.reset(seed=int(seed))[0]
+            for env, seed in zip(self.envs, seeds, strict=True)
+        ]
+        self.stack.push(preprocess(materialize_batch(first, self._rgb), config.scale))
+        obs = self.stack.frames.copy()
+        next_log = start + config.log_interval
+
+        while stats.steps < config.total_steps and self._error is None:
+            with act:
+                actions = self.act(obs)
+            with step:
+                results = [
+                    env.step(a) for env, a in zip(self.envs, actions, strict=True)
+                ]
+                frames = materialize_batch([r[0] for r in results], self._rgb)
+            with prep:
+                next_obs = self.stack.push(preprocess(frames, config.scale))
+            rewards = np.array([r[1] for r in results], dtype=np.float32)
+            dones = np.array([r[2] for r in results])
+            infos = [r[4] for r in results]
+            with store, self._buffer_lock:
+                self.buffer.add(obs, next_obs, actions, rewards, dones, infos)
+            recorder.count("env_steps", config.num_envs)
+
+            for i in np.flatnonzero(dones):
+                stats.episodes += 1
+                stats.scores.append(infos[i]["score"])
+                reset_obs, _ = self.envs[i].reset()
+                self.stack.reset(
+                    i, preprocess(reset_obs.materialize()[None], config.scale)[0]
+                )
+            obs = self.stack.frames.copy()
+
+            with wait, self._progress:
+                stats.steps += config.num_envs
+                self._progress.notify_all()
+                # keep the replay ratio: wait for the learner once it lags
+                self._progress.wait_for(
+                    lambda: (
+                        self._error is not None
+                        or stats.steps < config.learning_starts
+                        or stats.steps - stats.updates * config.train_freq
+                        <= config.max_lag * config.train_freq
+                    )
+                )
+
+            if (now := time.perf_counter()) >= next_log:
+                stats.elapsed = now - start
+                next_log = now + config.log_interval
+                print(
+                    f"steps {stats.steps} | {stats.steps_per_s:.0f} steps/s | "
+                    f"{stats.updates_per_s:.1f} updates/s | eps {self.epsilon():.2f} "
+                    f"| mean score {stats.mean_score:.1f}"
+                )
+
+    def _learn_loop(self) -> None:
+        """Runs gradient updates as long as transitions keep coming in."""
+        config, stats = self.config, self.stats
+        recorder = self.telemetry.recorder()
+        idle, sync = recorder.span("learner_wait"), recorder.span("sync")
+
+        def ready() -> bool:
+            return self._stop or (
+                stats.steps >= config.learning_starts
+                and stats.updates * config.train_freq < stats.steps
+            )
+
+        try:
+            while True:
+                with idle, self._progress:
+                    self._progress.wait_for(ready)
+                    if self._stop:
+                        return
+                self._update(recorder)
+                with self._progress:
+                    stats.updates += 1
+                    self._progress.notify_all()
+                recorder.count("updates")
+                with sync:
+                    if stats.updates % config.target_update_interval == 0:
+                        self.target.load_state_dict(self.net.state_dict())
+                    if stats.updates % config.actor_sync_interval == 0:
+                        with self._actor_lock:
+                            self.actor.load_state_dict(self.net.state_dict())
+        except BaseException as error:  # noqa: BLE001 - re-raised in train()
+            with self._progress:
+                self._error = error
+                self._progress.notify_all()
+
+    def _update(self, recorder: Recorder) -> None:
+        """Runs one gradient step on a sampled minibatch."""
+        with recorder.span("sample"), self._buffer_lock:
+            batch = self.buffer.sample(self.config.batch_size)
+        with recorder.span("update"):
+            td_update(self.net, self.target, self.optimizer, batch, self.config.gamma)
+
+    def close(self) -> None:
+        """Closes the environments."""
+        for env in self.envs:
+            env.close()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Train model.DQN on Flappy Bird")
+    parser.add_argument("--num-envs", type=int, default=TrainConfig.num_envs)
+    parser.add_argument("--steps", type=int, default=TrainConfig.total_steps)
+    parser.add_argument("--torch-threads", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="dqn_native.pt", help="Checkpoint path.")
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Telemetry file, CSV or a Prometheus textfile if it ends in .prom.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Trains a network and saves the checkpoint."""
+    args = parse_args()
+    config = TrainConfig(
+        num_envs=args.num_envs,
+        total_steps=args.steps,
+        torch_threads=args.torch_threads,
+        seed=args.seed,
+        metrics_path=args.metrics,
+    )
+    trainer = Trainer(config)
+    try:
+        stats = trainer.train()
+    finally:
+        trainer.close()
+    save_checkpoint(args.out, trainer.net, config)
+    print(
+        f"{stats.steps} steps, {stats.updates} updates in {stats.elapsed:.0f}s: "
+        f"{stats.steps_per_s:.0f} steps/s, {stats.updates_per_s:.1f} updates/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 """Package containing utility functions and classes."""
 
+from src.utils.frame_pacer import FramePacer, interpolate_commands
 from src.utils.game_config import GameConfig
 from src.utils.images import Images
 from src.utils.sounds import Sounds
-from src.utils.utils import clamp, get_hit_mask, pixel_collision
+from src.utils.utils import (
+    clamp,
+    get_hit_mask,
+    get_hit_mask_array,
+    pixel_collision,
+)
 from src.utils.window import Window
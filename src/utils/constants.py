@@ -33,3 +33,8 @@ PIPES = (
     "assets/sprites/pipe-green.png",
     "assets/sprites/pipe-red.png",
 )
+
+# background, player and pipe sprites that evaluations play with, so results
+# do not depend on the sprites an environment happened to draw: day
+# background, red bird, green pipes
+EVAL_SPRITES = (0, 0, 0)
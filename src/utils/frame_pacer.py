@@ -0,0 +1,175 @@
+"""Frame pacing for the asyncio game loop."""
+
+import asyncio
+from collections.abc import AsyncIterator, Sequence
+import time
+
+import numpy as np
+import pygame
+
+# (image, x, y, rotation), as in src.entities.DrawCommand
+Command = tuple[pygame.Surface, float, float, float]
+
+
+class FramePacer:
+    """Schedules display frames and fixed-rate simulation steps.
+
+    Each display frame runs as many fixed simulation steps as wall time has
+    advanced, so the game runs at ``sim_fps`` however fast frames are drawn,
+    and reports how far the display is between the last two steps for
+    interpolated rendering. Waiting for the next frame is an
+    ``asyncio.sleep`` to its deadline, which keeps the event loop responsive
+    where ``pygame.time.Clock.tick`` would block it.
+
+    Frame times are kept in a histogram of ``bin_ms`` wide bins.
+
+    Attributes:
+        sim_fps: Simulation steps per second.
+        display_fps: Frames drawn per second, None for as fast as possible.
+        max_steps: Most steps run in one frame; the rest of a long stall is
+            skipped instead of fast-forwarded.
+        histogram: Number of frames per frame time bin, the last bin counts
+            all frames longer than the others.
+        bin_ms: Width of the histogram bins in milliseconds.
+        dropped: Frames that took more than 1.5 frame intervals.
+        skipped_steps: Simulation steps skipped after stalls.
+    """
+
+    def __init__(
+        self,
+        sim_fps: int = 30,
+        display_fps: int | None = 60,
+        max_steps: int = 5,
+        bin_ms: float = 0.5,
+        max_ms: float = 200.0,
+    ) -> None:
+        """Initialize the pacer."""
+        self.sim_fps = sim_fps
+        self.display_fps = display_fps
+        self.max_steps = max_steps
+        self.bin_ms = bin_ms
+        self.histogram = np.zeros(int(max_ms / bin_ms) + 1, dtype=np.int64)
+        self.dropped = 0
+        self.skipped_steps = 0
+        self._accumulator = 0.0
+        self._last = 0.0
+
+    @property
+    def step_time(self) -> float:
+        """Returns the seconds per simulation step."""
+        return 1 / self.sim_fps
+
+    @property
+    def frames(self) -> int:
+        """Returns the number of frames recorded."""
+        return int(self.histogram.sum())
+
+    async def run(self) -> AsyncIterator[tuple[int, float]]:
+        """Yields once per display frame until the caller stops iterating.
+
+        Yields:
+            The number of simulation steps to run this frame, and the
+            fraction in [0, 1) of a step that the display is past the last
+            one, to interpolate the drawn positions with.
+        """
+        self._last = deadline = time.perf_counter()
+        self._accumulator = 0.0
+        yield 0, 0.0
+        while True:
+            # deadlines advance by whole intervals, so sleeping past one does
+            # not delay the following frames
+            deadline += 1 / self.display_fps if self.display_fps else 0.0
+            await asyncio.sleep(max(deadline - time.perf_counter(), 0.0))
+            now = time.perf_counter()
+            if now - deadline > self.step_time:
+                deadline = now  # stalled, start over instead of catching up
+            elapsed, self._last = now - self._last, now
+            self.record(elapsed)
+
+            self._accumulator += elapsed
+            steps = int(self._accumulator // self.step_time)
+            if steps > self.max_steps:
+                self.skipped_steps += steps - self.max_steps
+                self._accumulator = self.step_time * self.max_steps
+                steps = self.max_steps
+            self._accumulator -= steps * self.step_time
+            yield steps, self._accumulator / self.step_time
+
+    def record(self, seconds: float) -> None:
+        """Adds the duration of a frame to the histogram."""
+        index = min(int(seconds * 1e3 / self.bin_ms), len(self.histogram) - 1)
+        self.histogram[index] += 1
+        target = 1 / self.display_fps if self.display_fps else self.step_time
+        if seconds > 1.5 * target:
+            self.dropped += 1
+
+    def percentile(self, q: float) -> float:
+        """Returns the ``q``-th percentile of the frame times in milliseconds.
+
+        Reported as the upper edge of the bin the percentile falls into.
+        """
+        cumulative = np.cumsum(self.histogram)
+        if not cumulative[-1]:
+            return 0.0
+        index = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+        return (index + 1) * self.bin_ms
+
+    def stats(self) -> dict[str, float]:
+        """Returns the frame count, p50 and p99 frame times, and drops."""
+        return {
+            "frames": self.frames,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "dropped": self.dropped,
+            "skipped_steps": self.skipped_steps,
+        }
+
+    def summary(self) -> str:
+        """Returns the frame statistics as one line of text."""
+        stats = self.stats()
+        return (
+            f"{stats['frames']} frames | p50 {stats['p50_ms']:.1f} ms | "
+            f"p99 {stats['p99_ms']:.1f} ms | {stats['dropped']} dropped | "
+            f"{stats['skipped_steps']} steps skipped"
+        )
+
+    def render_overlay(self, screen: pygame.Surface) -> None:
+        """Draws :meth:`summary` onto the top of the screen."""
+        font = pygame.font.SysFont("Arial", 11, True)
+        text = font.render(self.summary(), True, (255, 255, 255), (0, 0, 0))
+        screen.blit(text, (2, 2))
+
+
+def interpolate_commands(
+    previous: Sequence[Command],
+    current: Sequence[Command],
+    alpha: float,
+    max_jump: float = 32.0,
+) -> tuple[Command, ...]:
+    """Returns draw commands between those of two simulation steps.
+
+    Positions are blended by ``alpha``. Rotations are not, since a flap snaps
+    the bird's rotation. Commands of differently sized sprites, and positions
+    moving further than ``max_jump`` pixels, e.g. the floor wrapping around,
+    are drawn as in ``current``.
+
+    Args:
+        previous: Draw commands of the earlier step.
+        current: Draw commands of the later step.
+        alpha: Fraction of the way from ``previous`` to ``current``.
+        max_jump: Largest per-step movement that is interpolated.
+    """
+    if len(previous) != len(current):
+        return tuple(current)
+    commands = []
+    for before, after in zip(previous, current, strict=True):
+        image, x, y, rot = after
+        dx, dy = x - before[1], y - before[2]
+        if (
+            image.get_size() == before[0].get_size()
+            and abs(dx) <= max_jump
+            and abs(dy) <= max_jump
+        ):
+            x, y = before[1] + alpha * dx, before[2] + alpha * dy
+        commands.append((image, x, y, rot))
+    return tuple(commands)
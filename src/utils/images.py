@@ -18,6 +18,7 @@ class Images:
         background: Background sprite.
         player: Tuple of player sprites.
         pipe: Tuple of pipe sprites.
+        variant: Indices of the loaded background, player and pipe sprites.
     """
 
     numbers: list[pygame.Surface]
@@ -27,6 +28,7 @@ class Images:
     background: pygame.Surface
     player: tuple[pygame.Surface]
     pipe: tuple[pygame.Surface]
+    variant: tuple[int, int, int]
 
     def __init__(self) -> None:
         """Initialize game images and load sprites."""
@@ -47,26 +49,35 @@ class Images:
         self.base = pygame.image.load("assets/sprites/base.png").convert_alpha()
         self.randomize()
 
-    def randomize(self) -> None:
-        """Randomize the game sprites."""
+    def randomize(self, rng: random.Random | None = None) -> None:
+        """Randomize the game sprites.
+
+        Args:
+            rng: Random generator to pick the sprites with.
+        """
+        rng = rng or random
         # select random background sprites
-        rand_bg = random.randint(0, len(BACKGROUNDS) - 1)
+        rand_bg = rng.randint(0, len(BACKGROUNDS) - 1)
         # select random player sprites
-        rand_player = random.randint(0, len(PLAYERS) - 1)
+        rand_player = rng.randint(0, len(PLAYERS) - 1)
         # select random pipe sprites
-        rand_pipe = random.randint(0, len(PIPES) - 1)
+        rand_pipe = rng.randint(0, len(PIPES) - 1)
+        self.load_variant(rand_bg, rand_player, rand_pipe)
 
-        self.background = pygame.image.load(BACKGROUNDS[rand_bg]).convert()
+    def load_variant(self, background: int, player: int, pipe: int) -> None:
+        """Load the background, player and pipe sprites with the given indices."""
+        self.variant = (background, player, pipe)
+        self.background = pygame.image.load(BACKGROUNDS[background]).convert()
         self.player = (
-            pygame.image.load(PLAYERS[rand_player][0]).convert_alpha(),
-            pygame.image.load(PLAYERS[rand_player][1]).convert_alpha(),
-            pygame.image.load(PLAYERS[rand_player][2]).convert_alpha(),
+            pygame.image.load(PLAYERS[player][0]).convert_alpha(),
+            pygame.image.load(PLAYERS[player][1]).convert_alpha(),
+            pygame.image.load(PLAYERS[player][2]).convert_alpha(),
         )
         self.pipe = (
             pygame.transform.flip(
-                pygame.image.load(PIPES[rand_pipe]).convert_alpha(),
+                pygame.image.load(PIPES[pipe]).convert_alpha(),
                 False,
                 True,
             ),
-            pygame.image.load(PIPES[rand_pipe]).convert_alpha(),
+            pygame.image.load(PIPES[pipe]).convert_alpha(),
         )
@@ -1,34 +1,141 @@
 """Utility functions for game operations."""
 
-from collections.abc import Callable
-from functools import wraps
-from typing import Any
-
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import partial, wraps
+import threading
+from typing import Any, NamedTuple
+import weakref
+
+import numpy as np
 import pygame
 
 HitMaskType = list[list[bool]]
 
+_MISSING = object()
+
+
+class _WeakId:
+    """Marks the id of a weakly held argument in a cache key."""
+
 
 def clamp(n: float, minn: float, maxn: float) -> float:
     """Clamps a number between two values."""
     return max(min(maxn, n), minn)
 
 
-def memoize(func: Callable) -> Callable:
-    """Memoization decorator for functions taking one or more arguments."""
-    cache = {}
+class CacheInfo(NamedTuple):
+    """Statistics of a memoized function.
+
+    Attributes:
+        hits: Calls answered from the cache.
+        misses: Calls that ran the function.
+        evictions: Entries dropped to stay within ``maxsize``.
+        collected: Entries dropped because a weakly held argument died.
+        size: Entries currently cached.
+        maxsize: Bound of the cache, None if unbounded.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    collected: int
+    size: int
+    maxsize: int | None
+
+
+def memoize(
+    func: Callable | None = None, *, maxsize: int | None = 256, weak: bool = False
+) -> Callable:
+    """Memoization decorator for functions taking one or more arguments.
+
+    The cache keeps the ``maxsize`` most recently used results. With
+    ``weak=True``, arguments that support weak references, such as
+    :class:`pygame.Surface`, are keyed by identity and not kept alive; their
+    entries are dropped as soon as they are garbage collected.
+
+    Like :func:`functools.lru_cache`, the decorated function has
+    ``cache_info()`` and ``cache_clear()``.
+
+    Args:
+        func: Function to memoize, when used as a bare ``@memoize``.
+        maxsize: Maximum number of cached results, None for no bound.
+        weak: Hold weakly referenceable arguments by weak reference.
+    """
+    if func is None:
+        return partial(memoize, maxsize=maxsize, weak=weak)
+
+    cache: OrderedDict[Hashable, Any] = OrderedDict()
+    # ids of weakly held arguments, with the keys they appear in
+    watched: dict[int, set[Hashable]] = {}
+    stats = {"hits": 0, "misses": 0, "evictions": 0, "collected": 0}
+    lock = threading.RLock()
+
+    def forget(obj_id: int) -> None:
+        """Drops the entries of a weakly held argument that died."""
+        with lock:
+            for key in watched.pop(obj_id, ()):
+                if cache.pop(key, _MISSING) is not _MISSING:
+                    stats["collected"] += 1
+
+    def make_key(args: tuple, kwargs: dict[str, Any]) -> tuple[Hashable, list]:
+        """Returns the cache key and the weakly held arguments in it."""
+        if not weak:
+            return (args, frozenset(kwargs.items())), []
+        held, parts = [], []
+        for arg in (*args, *kwargs.values()):
+            try:
+                weakref.ref(arg)
+            except TypeError:
+                parts.append(arg)
+            else:
+                held.append(arg)
+                parts.append((_WeakId, id(arg)))
+        return (tuple(parts), tuple(kwargs)), held
 
     @wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
-        key = (args, frozenset(kwargs.items()))
-        if key not in cache:
-            cache[key] = func(*args, **kwargs)
-        return cache[key]
-
+        key, held = make_key(args, kwargs)
+        with lock:
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                cache.move_to_end(key)
+                stats["hits"] += 1
+                return value
+            stats["misses"] += 1
+        value = func(*args, **kwargs)
+        with lock:
+            cache[key] = value
+            for arg in held:
+                keys = watched.get(id(arg))
+                if keys is None:
+                    keys = watched[id(arg)] = set()
+                    weakref.finalize(arg, forget, id(arg))
+                keys.add(key)
+            if maxsize is not None and len(cache) > maxsize:
+                cache.popitem(last=False)
+                stats["evictions"] += 1
+        return value
+
+    def cache_info() -> CacheInfo:
+        """Returns the statistics of the cache."""
+        with lock:
+            return CacheInfo(size=len(cache), maxsize=maxsize, **stats)
+
+    def cache_clear() -> None:
+        """Empties the cache and resets its statistics."""
+        with lock:
+            cache.clear()
+            for keys in watched.values():
+                keys.clear()
+            stats.update(dict.fromkeys(stats, 0))
+
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
     return wrapper
 
 
-@memoize
+@memoize(maxsize=512, weak=True)
 def get_hit_mask(image: pygame.Surface) -> HitMaskType:
     """Returns a hit mask using an image's alpha."""
     return [
@@ -37,6 +144,12 @@ def get_hit_mask(image: pygame.Surface) -> HitMaskType:
     ]
 
 
+@memoize(maxsize=512, weak=True)
+def get_hit_mask_array(image: pygame.Surface) -> np.ndarray:
+    """Returns the hit mask of an image as a (width, height) bool array."""
+    return np.array(get_hit_mask(image), dtype=bool)
+
+
 def pixel_collision(
     rect1: pygame.Rect,
     rect2: pygame.Rect,
@@ -51,11 +164,12 @@ def pixel_collision(
         hitmask1: The first object's hitmask.
         hitmask2: The second object's hitmask.
     """
-    rect = rect1.clip(rect2)
-
-    if rect.width == 0 or rect.height == 0:
+    # cheap in-place rejection before clip() allocates the overlap rect
+    if not rect1.colliderect(rect2):
         return False
 
+    rect = rect1.clip(rect2)
+
     x1, y1 = rect.x - rect1.x, rect.y - rect1.y
     x2, y2 = rect.x - rect2.x, rect.y - rect2.y
 
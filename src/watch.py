@@ -0,0 +1,182 @@
+"""Watching an agent play with simulation and display on separate threads.
+
+In :meth:`FlappyBirdEnv.render` the simulation, the policy and
+``pygame.display.update`` share one loop, so a slow decision stutters the
+display and a display waiting for vsync stalls the policy. :class:`Watcher`
+instead steps the environment and the policy on a simulation thread, at the
+game's frame rate times a playback speed or as fast as possible, and
+publishes the draw commands of every frame as the latest snapshot. The main
+thread handles the window: at the display rate it draws whichever snapshot
+is newest, so frames simulated in between are dropped instead of queued, and
+the display never waits for the policy.
+
+Watch with ``python src/main.py watch --policy planner --speed 2``; ``+``
+and ``-`` double and halve the speed while watching, ``0`` runs the
+simulation unthrottled.
+"""
+
+from collections.abc import Callable
+import threading
+import time
+from typing import Any, NamedTuple
+
+import pygame
+from pygame.locals import (
+    K_0,
+    K_EQUALS,
+    K_ESCAPE,
+    K_KP_MINUS,
+    K_KP_PLUS,
+    K_MINUS,
+    K_PLUS,
+    KEYDOWN,
+    QUIT,
+)
+
+from src.entities import DrawCommand
+from src.flappy_env import FlappyBirdEnv
+from src.observation import Rasterizer
+
+# simulation thread falls this far behind before it stops catching up
+_MAX_LAG = 0.25
+
+
+class Snapshot(NamedTuple):
+    """Frame handed from the simulation thread to the display."""
+
+    frame: int
+    episode: int
+    score: int
+    commands: tuple[DrawCommand, ...]
+
+
+class Watcher:
+    """Plays a policy on a simulation thread and shows it on the main thread.
+
+    Attributes:
+        env: Environment the policy plays in.
+        policy: Object with ``act(obs)`` and ``reset()``, e.g. a
+            :class:`~src.inference.NumpyPolicy` or :class:`~src.planner.Planner`.
+        speed: Playback speed as a multiple of the game's frame rate, 0 to
+            simulate as fast as possible. May be changed while watching.
+        display_fps: Rate at which the window is redrawn.
+        episodes: Episodes to play, 0 for no limit.
+        scores: Final score of every finished episode.
+        stats: Frames simulated and displayed, and snapshots dropped because a
+            newer one arrived before the display got to them.
+    """
+
+    def __init__(
+        self,
+        env: FlappyBirdEnv,
+        policy: Any,
+        speed: float = 1.0,
+        display_fps: int = 60,
+        episodes: int = 0,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the watcher; :meth:`run` starts playing."""
+        self.env = env
+        self.policy = policy
+        self.speed = speed
+        self.display_fps = display_fps
+        self.episodes = episodes
+        self.seed = seed
+        self.scores: list[int] = []
+        self.stats = {"simulated": 0, "displayed": 0, "dropped": 0}
+        self._latest: Snapshot | None = None
+        self._stop = threading.Event()
+        self._error: BaseException | None = None
+
+    def _simulate(self) -> None:
+        """Steps the policy and the environment until stopped."""
+        env, policy = self.env, self.policy
+        try:
+            obs, _ = env.reset(seed=self.seed)
+            policy.reset()
+            frame, deadline = 0, time.perf_counter()
+            while not self._stop.is_set():
+                obs, _, done, _, info = env.step(policy.act(obs))
+                frame += 1
+                # a single reference assignment, so the display never sees a
+                # half-written snapshot and needs no lock
+                self._latest = Snapshot(
+                    frame, len(self.scores), info["score"], env.draw_commands()
+                )
+                self.stats["simulated"] = frame
+                if done:
+                    self.scores.append(info["score"])
+                    print(f"episode {len(self.scores)}: score {info['score']}")
+                    if len(self.scores) == self.episodes:
+                        break
+                    obs, _ = env.reset()
+                    policy.reset()
+
+                speed = self.speed
+                if speed > 0:
+                    deadline += 1 / (env.config.fps * speed)
+                    delay = deadline - time.perf_counter()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    elif delay < -_MAX_LAG:
+                        deadline = time.perf_counter()
+                else:
+                    deadline = time.perf_counter()
+        except BaseException as error:  # noqa: BLE001 - re-raised in run()
+            self._error = error
+        finally:
+            self._stop.set()
+
+    def _handle_events(self) -> bool:
+        """Applies speed keys; returns False once the window is closed."""
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                return False
+            if event.type != KEYDOWN:
+                continue
+            if event.key in (K_PLUS, K_EQUALS, K_KP_PLUS):
+                self.speed = self.speed * 2 if self.speed else 1.0
+            elif event.key in (K_MINUS, K_KP_MINUS):
+                self.speed = self.speed / 2 if self.speed else 1.0
+            elif event.key == K_0:
+                self.speed = 0.0
+        return True
+
+    def run(self, on_frame: Callable[[Snapshot], None] | None = None) -> list[int]:
+        """Plays until the episodes are done or the window is closed.
+
+        Must be called from the main thread, which owns the window.
+
+        Args:
+            on_frame: Called with every snapshot that is displayed.
+
+        Returns:
+            The final scores of the finished episodes.
+        """
+        config = self.env.config
+        painter = Rasterizer(config.window.width, config.window.height)
+        painter.surface = config.screen
+        clock = pygame.time.Clock()
+        shown = 0
+        self._latest = None
+        self._stop.clear()
+        simulation = threading.Thread(target=self._simulate, daemon=True)
+        simulation.start()
+        try:
+            while not self._stop.is_set() and self._handle_events():
+                snapshot = self._latest
+                if snapshot is not None and snapshot.frame != shown:
+                    self.stats["dropped"] += snapshot.frame - shown - 1
+                    self.stats["displayed"] += 1
+                    shown = snapshot.frame
+                    painter.draw(snapshot.commands)
+                    pygame.display.update()
+                    if on_frame is not None:
+                        on_frame(snapshot)
+                clock.tick(self.display_fps)
+        finally:
+            self._stop.set()
+            simulation.join()
+        if self._error is not None:
+            raise self._error
+        return self.scores